@@ -1,17 +1,65 @@
+from urllib.parse import urlsplit
+
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class LLMProviderConfig(BaseModel):
+    """Fournisseur compatible OpenAI (`/chat/completions`)."""
+
+    api_base: str
+    model: str
+    api_key: str | None = None
+    name: str | None = None
+
+    @property
+    def label(self) -> str:
+        return self.name or urlsplit(self.api_base).netloc or self.api_base
+
+
 class Settings(BaseSettings):
     app_name: str = "OVERSEER Agent"
     api_prefix: str = "/api"
     secret_key: str = "CHANGE_ME"
     access_token_expire_minutes: int = 60 * 24
+    auth_cache_max_entries: int = 1024
+    auth_cache_ttl_seconds: float = 30.0
+    password_hash_rounds: int = 29000
+    password_hash_workers: int = 2
     mongodb_uri: str | None = None
     mongodb_db: str = "overseer"
+    id_block_size: int = 20
+    ics_import_chunk_size: int = 500
+    ics_background_threshold_bytes: int = 2 * 1024 * 1024
+    read_cache_max_entries: int = 4096
+    read_cache_max_bytes: int = 32 * 1024 * 1024
+    read_cache_ttl_seconds: float = 300.0
     openai_api_key: str | None = None
     llm_api_base: str = "https://api.openai.com/v1"
     llm_model: str = "gpt-4o-mini"
+    llm_fallback_providers: list[LLMProviderConfig] = []
+    llm_hedging: bool = True
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_samples: int = 20
+    llm_hedge_default_delay_seconds: float = 2.0
+    llm_http2: bool = False
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry_seconds: float = 60.0
+    llm_cache_memory_entries: int = 512
+    llm_cache_ttl_seconds: float = 7 * 24 * 3600
+    llm_max_concurrency: int = 8
+    llm_user_rate_per_minute: float = 20.0
+    llm_user_burst: int = 5
+    llm_max_retries: int = 2
+    llm_retry_base_delay_seconds: float = 0.5
+    llm_retry_max_delay_seconds: float = 8.0
+    llm_breaker_threshold: int = 5
+    llm_breaker_cooldown_seconds: float = 30.0
+    llm_prompt_max_tokens: int = 3000
+    agent_chat_window_messages: int = 8
+    agent_retrieval_top_k: int = 5
+    agent_retrieval_max_tokens: int = 300
     allowed_origins: list[str] = [
         "https://overseer-ai-dashboard.vercel.app",
         "https://overseer-ai-dashboard.onrender.com",
@@ -25,3 +73,5 @@ class Settings(BaseSettings):
 class TokenPayload(BaseModel):
     sub: str
     exp: int
+    # `token_version` of the user at login: bumped on password change to revoke older tokens.
+    ver: int = 0
@@ -4,6 +4,9 @@ from typing import AsyncGenerator, Optional
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 from .config import Settings
+from .indexes import ensure_indexes
+from .security import shutdown_hash_pool
+from .services.llm_client import close_shared_client, open_shared_client
 
 settings = Settings()
 
@@ -27,10 +30,14 @@ async def lifespan(app):  # type: ignore[override]
     if settings.mongodb_uri is None:
         raise RuntimeError("MONGODB_URI must be set (Mongo backend)")
     _mongo_client = AsyncIOMotorClient(settings.mongodb_uri)
+    await ensure_indexes(get_mongo_db())
+    await open_shared_client(settings)
     try:
         yield
     finally:
+        await close_shared_client()
         _mongo_client.close()
+        shutdown_hash_pool()
 
 
 async def get_mongo_session() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
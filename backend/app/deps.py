@@ -1,14 +1,68 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from .config import Settings
 from .db import get_mongo_session
 from .security import decode_token
+from .services.llm_governor import LLMRateLimitError, llm_governor
+from .single_flight import SingleFlight
 
 settings = Settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/auth/login")
 
 
+class UserCache:
+    """Verified token -> user document, bounded LRU with a short TTL.
+
+    Entries never outlive their token. Concurrent misses on the same token
+    share one `users` lookup. `invalidate(email)` must be called after any
+    write to a user document (password change, deletion); other workers see
+    the write once their entry expires.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lookups = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[dict[str, Any], float]] = OrderedDict()
+        self._flights = SingleFlight()
+
+    async def get(self, session, token: str, email: str, expires_at: int) -> Optional[dict[str, Any]]:
+        key = (getattr(session, "name", ""), token)
+        cached = self._entries.get(key)
+        if cached is not None:
+            if cached[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                return cached[0]
+            del self._entries[key]
+        user = await self._flights.do(key, lambda: self._load(session, email))
+        if user is not None:
+            ttl = min(self.ttl_seconds, expires_at - time.time())
+            self._entries[key] = (user, time.monotonic() + ttl)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    async def _load(self, session, email: str) -> Optional[dict[str, Any]]:
+        self.lookups += 1
+        return await session["users"].find_one({"email": email})
+
+    def invalidate(self, email: str) -> None:
+        for key in [k for k, (user, _) in self._entries.items() if user.get("email") == email]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+user_cache = UserCache(max_entries=settings.auth_cache_max_entries, ttl_seconds=settings.auth_cache_ttl_seconds)
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
     session=Depends(get_mongo_session),
@@ -16,11 +70,25 @@ async def get_current_user(
     payload = decode_token(token)
     if not payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token invalide")
-    user = await session["users"].find_one({"email": payload.sub})
+    user = await user_cache.get(session, token, payload.sub, payload.exp)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Utilisateur introuvable")
+    if payload.ver != user.get("token_version", 0):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token révoqué")
     return user
 
 
+async def enforce_llm_quota(user=Depends(get_current_user)):
+    """Per-user token bucket for endpoints that call the LLM."""
+    try:
+        llm_governor.admit(user["id"])
+    except LLMRateLimitError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        ) from exc
+
+
 async def get_db(session=Depends(get_mongo_session)):
     return session
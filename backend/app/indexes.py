@@ -0,0 +1,205 @@
+"""Declarative MongoDB index registry.
+
+`ensure_indexes` is applied from the application lifespan; `create_index`
+is idempotent so running it at every startup is cheap. The module also
+ships a check command that runs `explain()` on every router query shape
+and fails if one of them falls back to a collection scan:
+
+    python -m app.indexes check
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Any, Iterable, NamedTuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: list[tuple[str, int]]
+    unique: bool = False
+    expire_after_seconds: int | None = None
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+
+OWNER_SCOPED_COLLECTIONS = (
+    "tasks",
+    "events",
+    "projects",
+    "study_subjects",
+    "study_plans",
+    "study_sessions",
+    "study_cards",
+    "agent_logs",
+    "import_jobs",
+    "conversations",
+)
+
+INDEXES: list[IndexSpec] = [
+    *[IndexSpec(name, [("owner_id", ASCENDING), ("id", ASCENDING)], unique=True) for name in OWNER_SCOPED_COLLECTIONS],
+    IndexSpec("users", [("email", ASCENDING)], unique=True),
+    IndexSpec("user_preferences", [("owner_id", ASCENDING)], unique=True),
+    IndexSpec("event_stats", [("owner_id", ASCENDING)], unique=True),
+    IndexSpec("collection_versions", [("owner_id", ASCENDING), ("collection", ASCENDING)], unique=True),
+    IndexSpec("tasks", [("owner_id", ASCENDING), ("status", ASCENDING)]),
+    IndexSpec("events", [("owner_id", ASCENDING), ("start", ASCENDING), ("id", ASCENDING)]),
+    IndexSpec("events", [("owner_id", ASCENDING), ("recurrence", ASCENDING), ("start", ASCENDING)]),
+    IndexSpec("events", [("owner_id", ASCENDING), ("ics_uid", ASCENDING)]),
+    IndexSpec("study_plans", [("owner_id", ASCENDING), ("subject_id", ASCENDING)]),
+    IndexSpec("study_cards", [("owner_id", ASCENDING), ("due_at", ASCENDING), ("id", ASCENDING)]),
+    IndexSpec(
+        "study_sessions",
+        [("owner_id", ASCENDING), ("status", ASCENDING), ("scheduled_for", ASCENDING), ("id", ASCENDING)],
+    ),
+    IndexSpec("study_sessions", [("owner_id", ASCENDING), ("plan_id", ASCENDING)]),
+    IndexSpec("study_sessions", [("owner_id", ASCENDING), ("subject_id", ASCENDING)]),
+    IndexSpec("agent_logs", [("owner_id", ASCENDING), ("created_at", DESCENDING)]),
+    IndexSpec("conversations", [("owner_id", ASCENDING), ("updated_at", DESCENDING)]),
+    IndexSpec(
+        "conversation_messages",
+        [("owner_id", ASCENDING), ("conversation_id", ASCENDING), ("seq", ASCENDING)],
+        unique=True,
+    ),
+    IndexSpec("dev_comments", [("created_at", DESCENDING)]),
+    IndexSpec("dev_comments", [("category", ASCENDING), ("created_at", DESCENDING)]),
+    IndexSpec("llm_cache", [("expires_at", ASCENDING)], expire_after_seconds=0),
+]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase, specs: Iterable[IndexSpec] = INDEXES) -> list[str]:
+    """Create every registered index; already existing ones are left untouched.
+
+    A failing index (e.g. duplicates preventing a unique constraint) is logged
+    and skipped so that a single bad collection does not block startup.
+    """
+
+    created: list[str] = []
+    for spec in specs:
+        options: dict[str, Any] = {"name": spec.name, "unique": spec.unique}
+        if spec.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = spec.expire_after_seconds
+        try:
+            created.append(await db[spec.collection].create_index(spec.keys, **options))
+        except OperationFailure as exc:
+            logger.error("Index %s.%s non créé: %s", spec.collection, spec.name, exc)
+    return created
+
+
+class QueryShape(NamedTuple):
+    collection: str
+    filter: dict[str, Any]
+    sort: list[tuple[str, int]] | None = None
+
+
+def router_query_shapes(owner_id: int = 0, now: datetime | None = None) -> list[QueryShape]:
+    """Representative filters issued by the routers, one per distinct shape."""
+
+    now = now or datetime.now(timezone.utc)
+    shapes = [QueryShape(name, {"owner_id": owner_id, "id": 0}) for name in OWNER_SCOPED_COLLECTIONS]
+    shapes += [
+        QueryShape("users", {"email": "check@example.com"}),
+        QueryShape("user_preferences", {"owner_id": owner_id}),
+        QueryShape("event_stats", {"owner_id": owner_id}),
+        QueryShape("collection_versions", {"owner_id": owner_id, "collection": {"$in": ["tasks", "events"]}}),
+        QueryShape("tasks", {"owner_id": owner_id}),
+        QueryShape("tasks", {"owner_id": owner_id, "status": {"$ne": "terminee"}}),
+        QueryShape("events", {"owner_id": owner_id}),
+        QueryShape("events", {"owner_id": owner_id, "start": {"$gte": now}}),
+        QueryShape(
+            "events",
+            {"owner_id": owner_id, "start": {"$gte": now, "$lt": now}, "end": {"$gt": now}},
+            [("start", ASCENDING), ("id", ASCENDING)],
+        ),
+        QueryShape("events", {"owner_id": owner_id, "ics_uid": {"$in": ["uid@example.com"]}}),
+        QueryShape("projects", {"owner_id": owner_id}),
+        QueryShape("study_subjects", {"owner_id": owner_id}),
+        QueryShape("study_plans", {"owner_id": owner_id, "subject_id": 0}),
+        QueryShape("study_sessions", {"owner_id": owner_id, "plan_id": 0}),
+        QueryShape("study_sessions", {"owner_id": owner_id, "subject_id": 0}),
+        QueryShape(
+            "study_sessions",
+            {"owner_id": owner_id, "status": "planned", "scheduled_for": {"$lte": now}},
+            [("scheduled_for", ASCENDING), ("id", ASCENDING)],
+        ),
+        QueryShape("study_cards", {"owner_id": owner_id, "subject_id": 0}),
+        QueryShape("study_cards", {"owner_id": owner_id, "due_at": {"$lte": now}}, [("due_at", ASCENDING), ("id", ASCENDING)]),
+        QueryShape("agent_logs", {"owner_id": owner_id}, [("created_at", DESCENDING)]),
+        QueryShape("conversations", {"owner_id": owner_id}, [("updated_at", DESCENDING)]),
+        QueryShape(
+            "conversation_messages",
+            {"owner_id": owner_id, "conversation_id": 0, "seq": {"$gt": 0}},
+            [("seq", ASCENDING)],
+        ),
+        QueryShape("dev_comments", {}, [("created_at", DESCENDING)]),
+        QueryShape("dev_comments", {"category": "bug"}, [("created_at", DESCENDING)]),
+        QueryShape("llm_cache", {"_id": "fingerprint", "expires_at": {"$gt": now}}),
+    ]
+    return shapes
+
+
+def _plan_stages(plan: dict[str, Any]) -> Iterable[str]:
+    stage = plan.get("stage")
+    if stage:
+        yield stage
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages") or []:
+        yield from _plan_stages(child)
+
+
+async def find_collection_scans(db: AsyncIOMotorDatabase, shapes: Iterable[QueryShape]) -> list[QueryShape]:
+    """Return the query shapes whose winning plan contains a COLLSCAN stage."""
+
+    offenders: list[QueryShape] = []
+    for shape in shapes:
+        cursor = db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        explained = await cursor.explain()
+        winning = explained.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning):
+            offenders.append(shape)
+    return offenders
+
+
+async def _check() -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from .config import Settings
+
+    settings = Settings()
+    if settings.mongodb_uri is None:
+        print("MONGODB_URI must be set", file=sys.stderr)
+        return 2
+    client = AsyncIOMotorClient(settings.mongodb_uri)
+    try:
+        db = client[settings.mongodb_db]
+        await ensure_indexes(db)
+        offenders = await find_collection_scans(db, router_query_shapes())
+    finally:
+        client.close()
+    for shape in offenders:
+        print(f"COLLSCAN: {shape.collection} {shape.filter} sort={shape.sort}", file=sys.stderr)
+    if not offenders:
+        print("OK: aucune requête en COLLSCAN")
+    return 1 if offenders else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    if sys.argv[1:] != ["check"]:
+        print("usage: python -m app.indexes check", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(asyncio.run(_check()))
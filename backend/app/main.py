@@ -3,8 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import Settings
 from .db import lifespan
+from .pagination import NEXT_CURSOR_HEADER
 from .routers import agent, auth, events, projects, tasks
-from .routers import preferences, history, study, notifications, feedback, automation, commands
+from .routers import preferences, history, study, notifications, feedback, automation, commands, metrics
 
 settings = Settings()
 
@@ -17,6 +18,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
 app.include_router(auth.router, prefix=settings.api_prefix)
@@ -31,6 +33,7 @@ app.include_router(notifications.router, prefix=settings.api_prefix)
 app.include_router(feedback.router, prefix=settings.api_prefix)
 app.include_router(automation.router, prefix=settings.api_prefix)
 app.include_router(commands.router, prefix=settings.api_prefix)
+app.include_router(metrics.router, prefix=settings.api_prefix)
 
 
 @app.get("/")
@@ -1,20 +1,90 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any
+from weakref import WeakKeyDictionary
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo import ReturnDocument
 
+from .config import Settings
 
-async def get_next_id(db: AsyncIOMotorDatabase, name: str) -> int:
-    """Atomic counter for integer IDs per collection name."""
+settings = Settings()
+
+
+async def reserve_id_range(db: AsyncIOMotorDatabase, name: str, n: int) -> range:
+    """Reserve `n` consecutive IDs with a single atomic `$inc` on `counters`.
+
+    The increment is atomic server-side, so ranges reserved by different
+    processes (uvicorn workers) never overlap.
+    """
+    if n < 1:
+        return range(0)
     doc = await db["counters"].find_one_and_update(
         {"_id": name},
-        {"$inc": {"seq": 1}},
+        {"$inc": {"seq": n}},
         upsert=True,
         return_document=ReturnDocument.AFTER,
     )
-    return int(doc.get("seq", 1))
+    hi = int(doc.get("seq", n))
+    return range(hi - n + 1, hi + 1)
+
+
+class IdAllocator:
+    """Hi/lo allocator: hands out IDs from blocks reserved in one round trip.
+
+    Each process keeps an in-memory pool per (database, collection). IDs stay
+    unique across workers but are no longer contiguous: a block that is not
+    fully used before a restart leaves a gap. The per-key locks are created in
+    the running event loop, one set per loop.
+    """
+
+    def __init__(self, block_size: int = 1) -> None:
+        self.block_size = max(1, block_size)
+        self._pools: dict[tuple[str, str], range] = {}
+        self._locks: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str, str], asyncio.Lock]] = WeakKeyDictionary()
+
+    def _key(self, db: AsyncIOMotorDatabase, name: str) -> tuple[str, str]:
+        return (getattr(db, "name", ""), name)
+
+    async def next_id(self, db: AsyncIOMotorDatabase, name: str) -> int:
+        return (await self.next_ids(db, name, 1))[0]
+
+    async def next_ids(self, db: AsyncIOMotorDatabase, name: str, n: int) -> list[int]:
+        if n < 1:
+            return []
+        key = self._key(db, name)
+        locks = self._locks.setdefault(asyncio.get_running_loop(), {})
+        lock = locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            pool = self._pools.get(key, range(0))
+            ids = list(pool[:n])
+            missing = n - len(ids)
+            if missing:
+                block = await reserve_id_range(db, name, max(missing, self.block_size))
+                ids.extend(block[:missing])
+                pool = block[missing:]
+            else:
+                pool = pool[n:]
+            self._pools[key] = pool
+            return ids
+
+    def reset(self) -> None:
+        self._pools.clear()
+        self._locks.clear()
+
+
+id_allocator = IdAllocator(block_size=settings.id_block_size)
+
+
+async def get_next_id(db: AsyncIOMotorDatabase, name: str) -> int:
+    """Integer ID per collection name, served from the process-local pool."""
+    return await id_allocator.next_id(db, name)
+
+
+async def get_next_ids(db: AsyncIOMotorDatabase, name: str, n: int) -> list[int]:
+    """Bulk form of `get_next_id`: at most one round trip for `n` IDs."""
+    return await id_allocator.next_ids(db, name, n)
 
 
 def strip_mongo_id(document: dict[str, Any]) -> dict[str, Any]:
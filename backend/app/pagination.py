@@ -0,0 +1,130 @@
+"""Keyset pagination helpers shared by the list endpoints.
+
+Pages are ordered by `(sort_field, id)` and continued with an opaque token
+encoding the last item's key. The body of list endpoints stays a plain JSON
+array; the continuation token is returned in the `X-Next-Cursor` header.
+Without an explicit `limit`, pages hold `DEFAULT_PAGE_SIZE` documents so that
+no response grows with the size of the history.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException, Response, status
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorCursor
+
+MAX_PAGE_SIZE = 500
+DEFAULT_PAGE_SIZE = MAX_PAGE_SIZE
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, doc_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        key = ["dt", sort_value.isoformat()]
+    else:
+        key = ["v", sort_value]
+    raw = json.dumps([*key, doc_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        kind, value, doc_id = json.loads(raw)
+        if kind == "dt":
+            value = datetime.fromisoformat(value)
+        elif kind != "v":
+            raise ValueError(kind)
+        return value, int(doc_id)
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide") from exc
+
+
+def keyset_filter(sort_field: str, sort_value: Any, doc_id: int) -> dict[str, Any]:
+    """Filter selecting the documents strictly after `(sort_value, doc_id)`."""
+    if sort_field == "id":
+        return {"id": {"$gt": doc_id}}
+    if sort_value is None:
+        # Mongo sorts nulls first: continue within nulls, then everything else.
+        return {"$or": [{sort_field: None, "id": {"$gt": doc_id}}, {sort_field: {"$ne": None}}]}
+    return {
+        "$or": [
+            {sort_field: {"$gt": sort_value}},
+            {sort_field: sort_value, "id": {"$gt": doc_id}},
+        ]
+    }
+
+
+def sort_spec(sort_field: str) -> list[tuple[str, int]]:
+    return [("id", 1)] if sort_field == "id" else [(sort_field, 1), ("id", 1)]
+
+
+def date_range(start: datetime | None, end: datetime | None) -> dict[str, datetime] | None:
+    """Half-open `[start, end)` condition, or None when unbounded."""
+    cond: dict[str, datetime] = {}
+    if start is not None:
+        cond["$gte"] = start
+    if end is not None:
+        cond["$lt"] = end
+    return cond or None
+
+
+def build_query(owner_id: int, **filters: Any) -> dict[str, Any]:
+    """Owner-scoped query; filters left to None are not pushed down."""
+    query: dict[str, Any] = {"owner_id": owner_id}
+    query.update({field: value for field, value in filters.items() if value is not None})
+    return query
+
+
+def keyset_cursor(
+    collection: AsyncIOMotorCollection,
+    query: dict[str, Any],
+    *,
+    sort_field: str = "id",
+    cursor: str | None = None,
+) -> AsyncIOMotorCursor:
+    """Sorted Motor cursor starting right after the position encoded in `cursor`."""
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort_field, *decode_cursor(cursor))]}
+    return collection.find(query).sort(sort_spec(sort_field))
+
+
+async def fetch_page(
+    collection: AsyncIOMotorCollection,
+    query: dict[str, Any],
+    *,
+    sort_field: str = "id",
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> tuple[list[dict[str, Any]], str | None]:
+    """Return one page of documents and the token of the next page (if any).
+
+    Without `limit`, the page holds `DEFAULT_PAGE_SIZE` documents.
+    """
+    find = keyset_cursor(collection, query, sort_field=sort_field, cursor=cursor)
+    limit = limit or DEFAULT_PAGE_SIZE
+    docs = await find.limit(limit + 1).to_list(None)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last.get(sort_field), last["id"])
+
+
+def ensure_unpaged(limit: int | None, cursor: str | None) -> None:
+    """NDJSON streams run to the end of the result: they have no page to continue."""
+    if limit is not None or cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit et cursor ne s'appliquent pas à une réponse en flux",
+        )
+
+
+def set_next_cursor(response: Response, token: str | None) -> None:
+    if token:
+        response.headers[NEXT_CURSOR_HEADER] = token
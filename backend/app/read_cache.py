@@ -0,0 +1,192 @@
+"""In-process cache of computed read results, per user.
+
+Aggregating endpoints (feedback, study progress, history, due cards) are
+cached under `(database, owner_id, endpoint, params)` in a bounded LRU. Each
+entry lists the collections it was computed from; the write handlers call
+`invalidate(session, owner_id, *collections)` right after a write, so a read
+following a write of the same process never sees stale data and repeated
+reads do not touch Mongo at all. Entries also expire after a TTL, which
+bounds staleness for writes made by other workers and for results that
+depend on the current time.
+
+The cache is bounded both in entries and in (approximate) bytes: the size of
+an entry is the length of its JSON serialization, computed once on insert.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from pydantic_core import to_json
+
+from .config import Settings
+
+Key = tuple[str, int, str, Hashable]
+
+
+def approximate_size(value: Any) -> int:
+    try:
+        return len(to_json(value))
+    except Exception:  # not JSON serializable: shallow size is still a bound
+        return sys.getsizeof(value)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "depends_on")
+
+    def __init__(self, value: Any, size: int, expires_at: float, depends_on: frozenset[str]) -> None:
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.depends_on = depends_on
+
+
+class ReadCache:
+    """Bounded LRU (entries and bytes) with per-entry TTL and per-user invalidation."""
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 300.0,
+        sizeof: Callable[[Any], int] = approximate_size,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._sizeof = sizeof
+        self._clock = clock
+        self._entries: OrderedDict[Key, _Entry] = OrderedDict()
+        self._by_user: dict[tuple[str, int], set[Key]] = {}
+        self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _user(session, owner_id: int) -> tuple[str, int]:
+        return (getattr(session, "name", ""), owner_id)
+
+    def _key(self, session, owner_id: int, endpoint: str, params: Hashable) -> Key:
+        return (*self._user(session, owner_id), endpoint, params)
+
+    def get(self, session, owner_id: int, endpoint: str, params: Hashable = ()) -> tuple[bool, Any]:
+        """`(True, value)` on a fresh hit, `(False, None)` otherwise."""
+        key = self._key(session, owner_id, endpoint, params)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= self._clock():
+            self._drop(key)
+            self.stats.expirations += 1
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return True, entry.value
+
+    def put(
+        self,
+        session,
+        owner_id: int,
+        endpoint: str,
+        params: Hashable,
+        value: Any,
+        *,
+        depends_on: Iterable[str],
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        key = self._key(session, owner_id, endpoint, params)
+        self._drop(key)
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = _Entry(value, size, self._clock() + ttl, frozenset(depends_on))
+        self._by_user.setdefault(key[:2], set()).add(key)
+        self.size_bytes += size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats.evictions += 1
+
+    async def get_or_load(
+        self,
+        session,
+        owner_id: int,
+        endpoint: str,
+        params: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        *,
+        depends_on: Iterable[str],
+        ttl_seconds: Optional[float] = None,
+    ) -> Any:
+        found, value = self.get(session, owner_id, endpoint, params)
+        if found:
+            return value
+        value = await loader()
+        self.put(session, owner_id, endpoint, params, value, depends_on=depends_on, ttl_seconds=ttl_seconds)
+        return value
+
+    def invalidate(self, session, owner_id: int, *collections: str) -> None:
+        """Drop the user's entries computed from `collections` (all of them if none given)."""
+        keys = self._by_user.get(self._user(session, owner_id))
+        if not keys:
+            return
+        changed = set(collections)
+        for key in list(keys):
+            if not changed or not changed.isdisjoint(self._entries[key].depends_on):
+                self._drop(key)
+                self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_user.clear()
+        self.size_bytes = 0
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            **asdict(self.stats),
+            "hit_ratio": round(self.stats.hit_ratio, 3),
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+        }
+
+    def _drop(self, key: Key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size_bytes -= entry.size
+        keys = self._by_user.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[:2]]
+
+
+_settings = Settings()
+read_cache = ReadCache(
+    max_entries=_settings.read_cache_max_entries,
+    max_bytes=_settings.read_cache_max_bytes,
+    ttl_seconds=_settings.read_cache_ttl_seconds,
+)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from ..mongo_helpers import get_next_id, strip_mongo_id
+
+TITLE_LENGTH = 80
+
+
+class ConversationRepository:
+    """Agent conversations (`conversations`) and their messages (`conversation_messages`).
+
+    Messages are numbered per conversation (`seq`, from 1). The conversation
+    carries a rolling `summary` of every message up to `summarized_through`;
+    only later messages have to be read to rebuild the chat context.
+    """
+
+    def __init__(self, session) -> None:
+        self.session = session
+
+    async def create(self, owner_id: int, title: str) -> dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        doc = {
+            "id": await get_next_id(self.session, "conversations"),
+            "owner_id": owner_id,
+            "title": title.strip()[:TITLE_LENGTH] or "Conversation",
+            "summary": "",
+            "summarized_through": 0,
+            "last_seq": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.session["conversations"].insert_one(doc)
+        return strip_mongo_id(doc)
+
+    async def get(self, owner_id: int, conversation_id: int) -> Optional[dict[str, Any]]:
+        return await self.session["conversations"].find_one(
+            {"owner_id": owner_id, "id": conversation_id}, {"_id": 0}
+        )
+
+    async def list_recent(self, owner_id: int, limit: int = 50) -> list[dict[str, Any]]:
+        cursor = (
+            self.session["conversations"]
+            .find({"owner_id": owner_id}, {"_id": 0})
+            .sort([("updated_at", DESCENDING)])
+            .limit(limit)
+        )
+        return await cursor.to_list(length=limit)
+
+    async def append(self, conversation: dict[str, Any], role: str, content: str) -> dict[str, Any]:
+        now = datetime.now(timezone.utc)
+        updated = await self.session["conversations"].find_one_and_update(
+            {"owner_id": conversation["owner_id"], "id": conversation["id"]},
+            {"$inc": {"last_seq": 1}, "$set": {"updated_at": now}},
+            projection={"_id": 0, "last_seq": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        message = {
+            "owner_id": conversation["owner_id"],
+            "conversation_id": conversation["id"],
+            "seq": updated["last_seq"],
+            "role": role,
+            "content": content,
+            "created_at": now,
+        }
+        await self.session["conversation_messages"].insert_one(message)
+        return strip_mongo_id(message)
+
+    async def messages_after(self, conversation: dict[str, Any], seq: int = 0) -> list[dict[str, Any]]:
+        cursor = self.session["conversation_messages"].find(
+            {"owner_id": conversation["owner_id"], "conversation_id": conversation["id"], "seq": {"$gt": seq}},
+            {"_id": 0},
+        ).sort([("seq", ASCENDING)])
+        return await cursor.to_list(length=None)
+
+    async def save_summary(self, conversation: dict[str, Any], summary: str, through: int) -> bool:
+        """Advance the checkpoint, unless a concurrent call already moved it."""
+        result = await self.session["conversations"].update_one(
+            {
+                "owner_id": conversation["owner_id"],
+                "id": conversation["id"],
+                "summarized_through": conversation["summarized_through"],
+            },
+            {"$set": {"summary": summary, "summarized_through": through}},
+        )
+        if result.modified_count:
+            conversation.update(summary=summary, summarized_through=through)
+        return bool(result.modified_count)
+
+    async def delete(self, owner_id: int, conversation_id: int) -> bool:
+        result = await self.session["conversations"].delete_one({"owner_id": owner_id, "id": conversation_id})
+        if result.deleted_count:
+            await self.session["conversation_messages"].delete_many(
+                {"owner_id": owner_id, "conversation_id": conversation_id}
+            )
+        return bool(result.deleted_count)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Iterable
+
+from ..utils import naive_utc
+
+
+def event_duration_seconds(event: dict[str, Any]) -> float | None:
+    start, end = event.get("start"), event.get("end")
+    if not isinstance(start, datetime) or not isinstance(end, datetime):
+        return None
+    return (naive_utc(end) - naive_utc(start)).total_seconds()
+
+
+class EventRepository:
+    """Time-window access to the `events` collection (Mongo).
+
+    Overlap queries (`start < to` and `end > from`) cannot be bounded by the
+    `(owner_id, start)` index on their own: an event may start long before the
+    window. The repository keeps, per owner, the longest duration ever stored
+    in `event_stats` and uses it as a lower bound on `start`, so the index
+    range scanned is `[from - max_duration, to)`.
+    """
+
+    def __init__(self, session) -> None:
+        self.session = session
+
+    async def record_durations(self, owner_id: int, events: Iterable[dict[str, Any]]) -> None:
+        durations = [d for d in map(event_duration_seconds, events) if d is not None]
+        if not durations:
+            return
+        longest = {"$max": {"max_duration_seconds": max(0.0, max(durations))}}
+        result = await self.session["event_stats"].update_one({"owner_id": owner_id}, longest)
+        if not result.matched_count:
+            # First write since the hint was introduced: older events may be longer.
+            await self._rebuild_stats(owner_id)
+            await self.session["event_stats"].update_one({"owner_id": owner_id}, longest, upsert=True)
+
+    async def max_duration(self, owner_id: int) -> timedelta:
+        stats = await self.session["event_stats"].find_one({"owner_id": owner_id})
+        if stats is None:
+            stats = await self._rebuild_stats(owner_id)
+        return timedelta(seconds=stats.get("max_duration_seconds") or 0)
+
+    async def _rebuild_stats(self, owner_id: int) -> dict[str, Any]:
+        """Compute the hint once for events stored before it was tracked."""
+        pipeline = [
+            {"$match": {"owner_id": owner_id}},
+            {"$group": {"_id": None, "max_ms": {"$max": {"$subtract": ["$end", "$start"]}}}},
+        ]
+        rows = await self.session["events"].aggregate(pipeline).to_list(1)
+        seconds = max(0.0, (rows[0].get("max_ms") or 0) / 1000) if rows else 0.0
+        stats = {"owner_id": owner_id, "max_duration_seconds": seconds}
+        await self.session["event_stats"].update_one(
+            {"owner_id": owner_id},
+            {"$max": {"max_duration_seconds": seconds}},
+            upsert=True,
+        )
+        return stats
+
+    async def window_filter(
+        self,
+        owner_id: int,
+        start: datetime | None,
+        end: datetime | None,
+    ) -> dict[str, Any] | None:
+        """Conditions selecting events overlapping `[start, end)`, or None when unbounded."""
+        cond: dict[str, Any] = {}
+        if start is not None:
+            cond["start"] = {"$gte": start - await self.max_duration(owner_id)}
+            cond["end"] = {"$gt": start}
+        if end is not None:
+            cond.setdefault("start", {})["$lt"] = end
+        return cond or None
@@ -1,13 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, time, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 
 from ..config import Settings
-from ..deps import get_current_user, get_db
-from ..schemas import AgentChatRequest, AgentChatResponse, AgentPlanRequest, AgentPlanResponse
-from ..services.agent import generate_chat_reply, log_agent_decision, summarize_chat
+from ..deps import enforce_llm_quota, get_current_user, get_db
+from ..mongo_helpers import get_next_ids
+from ..read_cache import read_cache
+from ..repositories.conversations import ConversationRepository
+from ..repositories.events import EventRepository
+from ..schemas import (
+    AgentChatRequest,
+    AgentChatResponse,
+    AgentPlanRequest,
+    AgentPlanResponse,
+    ConversationDetail,
+    ConversationRead,
+    EventRead,
+)
+from ..services.agent import (
+    conversation_context,
+    generate_chat_reply,
+    is_failed_reply,
+    log_agent_decision,
+    stream_chat_reply,
+    summarize_chat,
+    summarize_conversation,
+    workspace_context,
+)
+from ..services.planner import PlanResult, build_plan
+from ..services.retrieval import retrieval_index
+from ..streaming import sse_response, wants_sse
+from ..utils import naive_utc
+from ..versioning import bump_version
 
 settings = Settings()
 router = APIRouter(prefix="/agent", tags=["agent"])
 
+PLANNER_SOURCE = "agent_plan"
+
 
 @router.post("/plan", response_model=AgentPlanResponse)
 async def plan_day(
@@ -15,26 +45,153 @@ async def plan_day(
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
-    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Planification non disponible (Mongo uniquement)")
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    day_start = datetime.combine(naive_utc(payload.date or now).date(), time.min)
+    window_end = day_start + timedelta(days=7 if payload.mode == "week" else 1)
+    window_start = max(day_start, now) if now < window_end else day_start
+
+    plan = await build_plan(session, user["id"], window_start, window_end)
+
+    # A new plan replaces the proposals previously generated for the window.
+    previous = await session["events"].find(
+        {
+            "owner_id": user["id"],
+            "kind": "propose",
+            "generated_by": PLANNER_SOURCE,
+            "start": {"$gte": window_start, "$lt": window_end},
+        },
+        {"_id": 0, "id": 1},
+    ).to_list(None)
+    replaced_ids = [doc["id"] for doc in previous]
+    if replaced_ids:
+        await session["events"].delete_many({"owner_id": user["id"], "id": {"$in": replaced_ids}})
+    ids = await get_next_ids(session, "events", len(plan.blocks))
+    docs = [
+        {
+            **EventRead(
+                id=event_id,
+                title=block.title,
+                start=block.start,
+                end=block.end,
+                kind="propose",
+                category=block.category or "general",
+                task_id=block.task_id,
+            ).model_dump(),
+            "owner_id": user["id"],
+            "version": 1,
+            "generated_by": PLANNER_SOURCE,
+        }
+        for event_id, block in zip(ids, plan.blocks)
+    ]
+    if docs:
+        await session["events"].insert_many(docs)
+        await EventRepository(session).record_durations(user["id"], docs)
+    if docs or replaced_ids:
+        await bump_version(session, user["id"], "events")
+        read_cache.invalidate(session, user["id"], "events")
+        for event_id in replaced_ids:
+            retrieval_index.discard(session, user["id"], "events", event_id)
+        retrieval_index.record_many(session, user["id"], "events", docs)
+
+    rationale = _plan_rationale(plan, payload.reason)
+    await log_agent_decision(session, user, f"plan-{payload.mode}", rationale, docs)
+    return AgentPlanResponse(
+        message=f"{len(docs)} créneau(x) proposé(s)",
+        events=[EventRead(**doc) for doc in docs],
+        rationale=rationale,
+    )
 
 
-@router.post("/chat", response_model=AgentChatResponse)
+def _plan_rationale(plan: PlanResult, reason: str | None) -> str:
+    planned = len({block.task_id for block in plan.blocks})
+    parts = [f"{planned} tâche(s) planifiée(s) par priorité et échéance autour des événements fixes"]
+    if plan.late:
+        parts.append(f"{len(plan.late)} en retard sur leur échéance")
+    if plan.unplaced:
+        parts.append(f"{len(plan.unplaced)} sans créneau disponible")
+    if plan.blocked:
+        parts.append(f"{len(plan.blocked)} en attente de dépendances")
+    if reason:
+        parts.append(f"motif : {reason}")
+    return " ; ".join(parts) + "."
+
+
+@router.post("/chat", response_model=AgentChatResponse, dependencies=[Depends(enforce_llm_quota)])
 async def chat(
     payload: AgentChatRequest,
+    request: Request,
+    stream: bool = Query(False),
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
-    reply = await generate_chat_reply(payload.message, user)
+    repo = ConversationRepository(session)
+    if payload.conversation_id is None:
+        conversation = await repo.create(user["id"], payload.message)
+    else:
+        conversation = await _get_conversation(repo, user, payload.conversation_id)
+    context = await conversation_context(repo, conversation)
+    context.workspace = workspace_context(session, user["id"], payload.message)
+    await repo.append(conversation, "user", payload.message)
+
+    if wants_sse(request, stream):
+
+        async def log_reply(reply: str) -> None:
+            if not is_failed_reply(reply):
+                await repo.append(conversation, "assistant", reply)
+            await log_agent_decision(session, user, "chat", reply, [])
+
+        return sse_response(
+            stream_chat_reply(payload.message, user, context),
+            "reply",
+            on_complete=log_reply,
+            headers={"X-Conversation-Id": str(conversation["id"])},
+        )
+
+    reply = await generate_chat_reply(payload.message, user, context)
+    # Une erreur du LLM est montrée à l'utilisateur mais n'entre pas dans l'historique.
+    if not is_failed_reply(reply):
+        await repo.append(conversation, "assistant", reply)
     await log_agent_decision(session, user, "chat", reply, [])
-    return AgentChatResponse(reply=reply)
+    return AgentChatResponse(reply=reply, conversation_id=conversation["id"])
 
 
-@router.post("/chat-summary", response_model=dict)
+@router.post("/chat-summary", response_model=dict, dependencies=[Depends(enforce_llm_quota)])
 async def chat_summary(
     payload: AgentChatRequest,
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
-    summary = await summarize_chat(payload.history or [])
+    if payload.conversation_id is not None:
+        repo = ConversationRepository(session)
+        conversation = await _get_conversation(repo, user, payload.conversation_id)
+        summary = await summarize_conversation(repo, conversation)
+    else:
+        summary = await summarize_chat(payload.history or [])
     await log_agent_decision(session, user, "chat-summary", summary, [])
     return {"summary": summary}
+
+
+async def _get_conversation(repo: ConversationRepository, user, conversation_id: int) -> dict:
+    conversation = await repo.get(user["id"], conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation introuvable")
+    return conversation
+
+
+@router.get("/conversations", response_model=list[ConversationRead])
+async def list_conversations(session=Depends(get_db), user=Depends(get_current_user)):
+    return await ConversationRepository(session).list_recent(user["id"])
+
+
+@router.get("/conversations/{conversation_id}", response_model=ConversationDetail)
+async def get_conversation(conversation_id: int, session=Depends(get_db), user=Depends(get_current_user)):
+    repo = ConversationRepository(session)
+    conversation = await _get_conversation(repo, user, conversation_id)
+    return {**conversation, "messages": await repo.messages_after(conversation)}
+
+
+@router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_conversation(conversation_id: int, session=Depends(get_db), user=Depends(get_current_user)):
+    if not await ConversationRepository(session).delete(user["id"], conversation_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conversation introuvable")
+    return None
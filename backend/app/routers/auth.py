@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from ..deps import get_current_user, get_db
+from ..deps import get_current_user, get_db, user_cache
 from ..mongo_helpers import get_next_id, strip_mongo_id
-from ..schemas import Token, UserCreate, UserRead
-from ..security import create_access_token, hash_password, verify_password
+from ..schemas import PasswordChange, Token, UserCreate, UserRead
+from ..security import create_access_token, hash_password, verify_and_update, verify_password
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,7 +18,7 @@ async def register(payload: UserCreate, session=Depends(get_db)):
     user_doc = {
         "id": await get_next_id(session, "users"),
         "email": payload.email,
-        "hashed_password": hash_password(payload.password),
+        "hashed_password": await hash_password(payload.password),
     }
     await session["users"].insert_one(user_doc)
     return UserRead(**strip_mongo_id(user_doc))
@@ -27,12 +27,31 @@ async def register(payload: UserCreate, session=Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), session=Depends(get_db)):
     user = await session["users"].find_one({"email": form_data.username})
-    if not user or not verify_password(form_data.password, user.get("hashed_password", "")):
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identifiants invalides")
-    token = create_access_token(subject=user["email"])
+    valid, new_hash = await verify_and_update(form_data.password, user.get("hashed_password", ""))
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Identifiants invalides")
+    if new_hash is not None:
+        await session["users"].update_one({"id": user["id"]}, {"$set": {"hashed_password": new_hash}})
+        user_cache.invalidate(user["email"])
+    token = create_access_token(subject=user["email"], version=user.get("token_version", 0))
     return Token(access_token=token)
 
 
 @router.get("/me", response_model=UserRead)
 async def me(user=Depends(get_current_user)):
     return UserRead(id=user["id"], email=user["email"])
+
+
+@router.post("/password", status_code=status.HTTP_204_NO_CONTENT)
+async def change_password(payload: PasswordChange, session=Depends(get_db), user=Depends(get_current_user)):
+    if not await verify_password(payload.current_password, user.get("hashed_password", "")):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Mot de passe actuel incorrect")
+    # Bumping the token version revokes every token issued before the change.
+    await session["users"].update_one(
+        {"id": user["id"]},
+        {"$set": {"hashed_password": await hash_password(payload.new_password)}, "$inc": {"token_version": 1}},
+    )
+    user_cache.invalidate(user["email"])
+    return None
@@ -5,7 +5,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import get_next_id
+from ..read_cache import read_cache
 from ..schemas import AutomationRequest, AutomationResponse, AutomationRollbackRequest, AutomationRollbackResponse
+from ..versioning import bump_version
 
 router = APIRouter(prefix="/automation", tags=["automation"])
 
@@ -39,6 +41,8 @@ async def trigger_automation(
         "created_at": datetime.now(timezone.utc),
     }
     await session["agent_logs"].insert_one(doc)
+    await bump_version(session, user["id"], "agent_logs")
+    read_cache.invalidate(session, user["id"], "agent_logs")
 
     return AutomationResponse(id=str(doc["id"]), action=payload.action, status="ok", detail=detail, created_at=doc["created_at"])
 
@@ -59,5 +63,7 @@ async def rollback_automation(
         "created_at": datetime.now(timezone.utc),
     }
     await session["agent_logs"].insert_one(doc)
+    await bump_version(session, user["id"], "agent_logs")
+    read_cache.invalidate(session, user["id"], "agent_logs")
     detail = "Rollback enregistré" if payload.id else "Rollback enregistré (sans identifiant)"
     return AutomationRollbackResponse(status="ok", detail=detail, created_at=doc["created_at"])
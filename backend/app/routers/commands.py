@@ -5,8 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import get_next_id
+from ..read_cache import read_cache
 from ..schemas import CommandRequest, CommandResponse
 from ..utils import build_command_repr
+from ..versioning import bump_version
 
 router = APIRouter(prefix="/commands", tags=["commands"])
 
@@ -33,5 +35,7 @@ async def run_command(
         await session["agent_logs"].insert_one(doc)
     except Exception as exc:  # pragma: no cover - defensive
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Impossible d'enregistrer la commande") from exc
+    await bump_version(session, user["id"], "agent_logs")
+    read_cache.invalidate(session, user["id"], "agent_logs")
 
     return CommandResponse(status="ok", output=f"Commande enregistrée: {cmd_repr}", created_at=doc["created_at"])
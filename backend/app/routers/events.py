@@ -1,46 +1,211 @@
-from datetime import datetime, time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
 
-from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile, status
-from icalendar import Calendar, Event as IcsEvent
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from icalendar import Event as IcsEvent
 from pymongo import ReturnDocument
 from ..config import Settings
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import get_next_id, strip_mongo_id
-from ..schemas import EventCreate, EventRead, EventUpdate
+from ..pagination import MAX_PAGE_SIZE, build_query, ensure_unpaged, fetch_page, keyset_cursor, set_next_cursor
+from ..read_cache import read_cache
+from ..repositories.events import EventRepository
+from ..schemas import (
+    EventConflict,
+    EventCreate,
+    EventOccurrenceRead,
+    EventRead,
+    EventUpdate,
+    EventWriteResponse,
+    FreeBusyResponse,
+    IcsImportJobRead,
+    TimeInterval,
+)
+from ..services.availability import find_slots, load_free_busy
+from ..services.conflicts import conflict_index
+from ..services.retrieval import retrieval_index
+from ..services.ics_import import InvalidIcsError, import_ics_stream, start_import_job
+from ..services.recurrence import load_occurrences
+from ..streaming import STREAM_BATCH_SIZE, ndjson_response, wants_stream
+from ..versioning import bump_version, collection_validator
 
 router = APIRouter(prefix="/events", tags=["events"])
 settings = Settings()
 
+MAX_OCCURRENCE_WINDOW = timedelta(days=366)
+ICS_HEADER = b"BEGIN:VCALENDAR\r\nPRODID:-//OVERSEER//Agenda//FR\r\nVERSION:2.0\r\n"
+ICS_FOOTER = b"END:VCALENDAR\r\n"
+
 
 @router.get("/", response_model=list[EventRead])
-async def list_events(session=Depends(get_db), user=Depends(get_current_user)):
-    events = await session["events"].find({"owner_id": user["id"]}).to_list(None)
+async def list_events(
+    request: Request,
+    response: Response,
+    window_start: datetime | None = Query(None, alias="from", description="Début de la fenêtre (chevauchement)"),
+    window_end: datetime | None = Query(None, alias="to", description="Fin de la fenêtre (exclue)"),
+    category: str | None = Query(None),
+    kind: str | None = Query(None),
+    task_id: int | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    validator = await collection_validator(request, session, user["id"], ("events",))
+    if validator.matches(request):
+        return validator.not_modified()
+    query = build_query(user["id"], category=category, kind=kind, task_id=task_id)
+    query.update(await EventRepository(session).window_filter(user["id"], window_start, window_end) or {})
+    if wants_stream(request, stream):
+        ensure_unpaged(limit, cursor)
+        find = keyset_cursor(session["events"], query, sort_field="start")
+        return ndjson_response(find, EventRead, headers=validator.headers)
+    events, next_cursor = await fetch_page(
+        session["events"], query, sort_field="start", limit=limit, cursor=cursor
+    )
+    set_next_cursor(response, next_cursor)
+    validator.apply(response)
     return [EventRead(**strip_mongo_id(e)) for e in events]
 
 
-@router.post("/", response_model=EventRead)
-async def create_event(payload: EventCreate, session=Depends(get_db), user=Depends(get_current_user)):
-    doc = {**payload.model_dump(), "owner_id": user["id"], "id": await get_next_id(session, "events")}
+@router.get("/occurrences", response_model=list[EventOccurrenceRead])
+async def list_occurrences(
+    window_start: datetime = Query(..., alias="from"),
+    window_end: datetime = Query(..., alias="to"),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """Events of the window with recurring series expanded into occurrences."""
+    if window_end <= window_start or window_end - window_start > MAX_OCCURRENCE_WINDOW:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fenêtre invalide (366 jours max)")
+
+    occurrences = await load_occurrences(session, user["id"], window_start, window_end)
+    return [EventOccurrenceRead(**o) for o in occurrences]
+
+
+def _availability_window(window_start: datetime | None, window_end: datetime | None) -> tuple[datetime, datetime]:
+    window_start = window_start or datetime.now(timezone.utc)
+    window_end = window_end or window_start + timedelta(days=7)
+    if window_end <= window_start or window_end - window_start > MAX_OCCURRENCE_WINDOW:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fenêtre invalide (366 jours max)")
+    return window_start, window_end
+
+
+@router.get("/freebusy", response_model=FreeBusyResponse)
+async def freebusy(
+    window_start: datetime | None = Query(None, alias="from"),
+    window_end: datetime | None = Query(None, alias="to"),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """Busy intervals (fixed events) and free intervals within productive hours."""
+    window_start, window_end = _availability_window(window_start, window_end)
+    busy, free = await load_free_busy(session, user["id"], window_start, window_end)
+    return FreeBusyResponse(
+        start=window_start,
+        end=window_end,
+        busy=[TimeInterval(start=s, end=e) for s, e in busy],
+        free=[TimeInterval(start=s, end=e) for s, e in free],
+    )
+
+
+@router.get("/slots", response_model=list[TimeInterval])
+async def find_free_slots(
+    duration: int = Query(..., ge=1, le=24 * 60, description="Durée en minutes"),
+    window_start: datetime | None = Query(None, alias="from"),
+    window_end: datetime | None = Query(None, alias="to"),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """Free intervals able to hold `duration` minutes (next 7 days by default)."""
+    window_start, window_end = _availability_window(window_start, window_end)
+    _, free = await load_free_busy(session, user["id"], window_start, window_end)
+    return [TimeInterval(start=s, end=e) for s, e in find_slots(free, timedelta(minutes=duration), limit)]
+
+
+async def _check_conflicts(
+    session,
+    owner_id: int,
+    start: datetime,
+    end: datetime,
+    reject: bool,
+    exclude_id: int | None = None,
+) -> list[EventConflict]:
+    conflicts = [
+        EventConflict(**c) for c in await conflict_index.find_conflicts(session, owner_id, start, end, exclude_id)
+    ]
+    if conflicts and reject:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Conflit avec des événements existants", "conflicts": jsonable_encoder(conflicts)},
+        )
+    return conflicts
+
+
+@router.post("/", response_model=EventWriteResponse)
+async def create_event(
+    payload: EventCreate,
+    check_conflicts: bool = Query(False),
+    reject_conflicts: bool = Query(False),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    conflicts = None
+    if check_conflicts or reject_conflicts:
+        conflicts = await _check_conflicts(session, user["id"], payload.start, payload.end, reject_conflicts)
+
+    doc = {**payload.model_dump(), "owner_id": user["id"], "id": await get_next_id(session, "events"), "version": 1}
     await session["events"].insert_one(doc)
-    return EventRead(**strip_mongo_id(doc))
+    await EventRepository(session).record_durations(user["id"], [doc])
+    await bump_version(session, user["id"], "events")
+    read_cache.invalidate(session, user["id"], "events")
+    conflict_index.record(session, user["id"], doc)
+    retrieval_index.record(session, user["id"], "events", doc)
+    return EventWriteResponse(**strip_mongo_id(doc), conflicts=conflicts)
 
 
-@router.patch("/{event_id}", response_model=EventRead)
+@router.patch("/{event_id}", response_model=EventWriteResponse)
 async def update_event(
     event_id: int,
     payload: EventUpdate,
+    check_conflicts: bool = Query(False),
+    reject_conflicts: bool = Query(False),
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
     update = payload.model_dump(exclude_unset=True)
+    conflicts = None
+    if check_conflicts or reject_conflicts:
+        current = await session["events"].find_one({"id": event_id, "owner_id": user["id"]})
+        if not current:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Événement introuvable")
+        conflicts = await _check_conflicts(
+            session,
+            user["id"],
+            update.get("start") or current["start"],
+            update.get("end") or current["end"],
+            reject_conflicts,
+            exclude_id=event_id,
+        )
+
     event = await session["events"].find_one_and_update(
         {"id": event_id, "owner_id": user["id"]},
-        {"$set": update},
+        {"$set": update, "$inc": {"version": 1}},
         return_document=ReturnDocument.AFTER,
     )
     if not event:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Événement introuvable")
-    return EventRead(**strip_mongo_id(event))
+    if "start" in update or "end" in update:
+        await EventRepository(session).record_durations(user["id"], [event])
+    await bump_version(session, user["id"], "events")
+    read_cache.invalidate(session, user["id"], "events")
+    conflict_index.record(session, user["id"], strip_mongo_id(event))
+    retrieval_index.record(session, user["id"], "events", event)
+    return EventWriteResponse(**event, conflicts=conflicts)
 
 
 @router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -48,87 +213,72 @@ async def delete_event(event_id: int, session=Depends(get_db), user=Depends(get_
     result = await session["events"].delete_one({"id": event_id, "owner_id": user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Événement introuvable")
+    await bump_version(session, user["id"], "events")
+    read_cache.invalidate(session, user["id"], "events")
+    conflict_index.discard(session, user["id"], event_id)
+    retrieval_index.discard(session, user["id"], "events", event_id)
     return None
 
 
-def _as_datetime(value) -> datetime:
-    """Normalize icalendar date/datetime to naive datetime."""
-    if isinstance(value, datetime):
-        return value.replace(tzinfo=None)
-    if hasattr(value, "dt"):
-        inner = value.dt
-        if isinstance(inner, datetime):
-            return inner.replace(tzinfo=None)
-        if hasattr(inner, "year") and hasattr(inner, "month") and hasattr(inner, "day"):
-            return datetime.combine(inner, time.min)
-    raise ValueError("Date ICS invalide")
-
-
 @router.post("/import/ics")
 async def import_ics(
+    response: Response,
     file: UploadFile = File(...),
+    background: bool | None = Query(None),
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
-    content = await file.read()
+    if background or (background is None and (file.size or 0) > settings.ics_background_threshold_bytes):
+        job = await start_import_job(session, user["id"], file.file, file.size, settings.ics_import_chunk_size)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"job_id": job["id"], "status": job["status"]}
+
     try:
-        cal = Calendar.from_ical(content)
-    except Exception as exc:  # pragma: no cover - ical parse errors
+        stats = await import_ics_stream(session, user["id"], file.file, chunk_size=settings.ics_import_chunk_size)
+    except InvalidIcsError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fichier ICS invalide") from exc
-
-    to_create: list[dict] = []
-    for component in cal.walk():
-        if component.name != "VEVENT":
-            continue
-        summary = component.get("SUMMARY", "Événement")
-        dtstart = component.get("DTSTART")
-        dtend = component.get("DTEND")
-        if not dtstart or not dtend:
-            continue
-        try:
-            start_dt = _as_datetime(dtstart)
-            end_dt = _as_datetime(dtend)
-        except ValueError:
-            continue
-        categories = component.get("CATEGORIES")
-        category = None
-        if categories:
-            if isinstance(categories, list):
-                category = str(categories[0])
-            else:
-                category = str(categories)
-        evt = {
-            "id": await get_next_id(session, "events"),
-            "title": str(summary),
-            "start": start_dt,
-            "end": end_dt,
-            "kind": "fixe",
-            "category": category or "general",
-            "owner_id": user["id"],
-        }
-        to_create.append(evt)
-
-    if not to_create:
+    if not stats.total:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Aucun événement importé")
+    return {"imported": stats.imported, "updated": stats.updated, "unchanged": stats.unchanged, "invalid": stats.invalid}
+
+
+@router.get("/import/jobs/{job_id}", response_model=IcsImportJobRead)
+async def import_job_status(job_id: int, session=Depends(get_db), user=Depends(get_current_user)):
+    job = await session["import_jobs"].find_one({"id": job_id, "owner_id": user["id"]})
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import introuvable")
+    return IcsImportJobRead(**strip_mongo_id(job))
+
+
+def _vevent_ical(evt: dict) -> bytes:
+    vevent = IcsEvent()
+    vevent.add("uid", evt.get("ics_uid") or f"{evt['id']}@overseer")
+    vevent.add("summary", evt.get("title"))
+    vevent.add("dtstart", evt.get("start"))
+    vevent.add("dtend", evt.get("end"))
+    if evt.get("category"):
+        vevent.add("categories", evt.get("category"))
+    return vevent.to_ical()
+
 
-    if to_create:
-        await session["events"].insert_many(to_create)
-    return {"imported": len(to_create)}
+async def _iter_ics(cursor) -> AsyncIterator[bytes]:
+    yield ICS_HEADER
+    chunk: list[bytes] = []
+    async for evt in cursor.batch_size(STREAM_BATCH_SIZE):
+        chunk.append(_vevent_ical(evt))
+        if len(chunk) >= STREAM_BATCH_SIZE:
+            yield b"".join(chunk)
+            chunk = []
+    yield b"".join(chunk) + ICS_FOOTER
 
 
 @router.get("/export/ics")
-async def export_ics(session=Depends(get_db), user=Depends(get_current_user)):
-    events = await session["events"].find({"owner_id": user["id"]}).to_list(None)
-    cal = Calendar()
-    cal.add("prodid", "-//OVERSEER//Agenda//FR")
-    cal.add("version", "2.0")
-    for evt in events:
-        vevent = IcsEvent()
-        vevent.add("summary", evt.get("title"))
-        vevent.add("dtstart", evt.get("start"))
-        vevent.add("dtend", evt.get("end"))
-        if evt.get("category"):
-            vevent.add("categories", evt.get("category"))
-        cal.add_component(vevent)
-    payload = cal.to_ical()
-    return Response(content=payload, media_type="text/calendar")
+async def export_ics(request: Request, session=Depends(get_db), user=Depends(get_current_user)):
+    validator = await collection_validator(request, session, user["id"], ("events",), "ics")
+    if validator.matches(request):
+        return validator.not_modified()
+    cursor = session["events"].find(
+        {"owner_id": user["id"]},
+        {"_id": 0, "id": 1, "ics_uid": 1, "title": 1, "start": 1, "end": 1, "category": 1},
+    ).sort("id", 1)
+    return StreamingResponse(_iter_ics(cursor), media_type="text/calendar", headers=validator.headers)
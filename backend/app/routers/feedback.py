@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from ..config import Settings
 from ..deps import get_current_user, get_db
+from ..read_cache import read_cache
 from ..schemas import (
     FeedbackCommentCreate,
     FeedbackCommentRead,
@@ -60,9 +61,19 @@ async def feedback_loop(
     if anchor.tzinfo:
         anchor = anchor.astimezone(timezone.utc).replace(tzinfo=None)
     start, end = _period_bounds(anchor, scope)
+    return await read_cache.get_or_load(
+        session,
+        user["id"],
+        "feedback",
+        (scope, start),
+        lambda: _feedback_stats(session, user["id"], scope, start, end),
+        depends_on=("tasks", "events"),
+    )
+
 
-    tasks = await session["tasks"].find({"owner_id": user["id"]}).to_list(None)
-    events = await session["events"].find({"owner_id": user["id"], "start": {"$gte": start, "$lt": end}}).to_list(None)
+async def _feedback_stats(session, owner_id: int, scope: str, start: datetime, end: datetime) -> FeedbackStats:
+    tasks = await session["tasks"].find({"owner_id": owner_id}).to_list(None)
+    events = await session["events"].find({"owner_id": owner_id, "start": {"$gte": start, "$lt": end}}).to_list(None)
 
     planned_events = [e for e in events if e.get("kind") == "propose"]
     actual_events = [e for e in events if e.get("kind") != "propose"]
@@ -1,21 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import strip_mongo_id
+from ..read_cache import read_cache
 from ..repositories.history import HistoryRepository
 from ..schemas import EventRead, HistoryResponse, ProjectRead, TaskRead
+from ..versioning import collection_validator
 
 router = APIRouter(prefix="/history", tags=["history"])
 
+HISTORY_COLLECTIONS = ("tasks", "events", "projects", "agent_logs")
+# Recent events are a sliding window: validators also expire every minute.
+HISTORY_FRESHNESS_SECONDS = 60
+
 
 @router.get("", response_model=HistoryResponse)
-async def get_history(session=Depends(get_db), user=Depends(get_current_user)):
+async def get_history(
+    request: Request,
+    response: Response,
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # The versions lookup always runs, so writes from other workers are seen;
+    # the body is cached under the resulting ETag, which embeds the versions.
+    now = datetime.now(timezone.utc).timestamp()
+    bucket = int(now) // HISTORY_FRESHNESS_SECONDS
+    validator = await collection_validator(request, session, user["id"], HISTORY_COLLECTIONS, bucket)
+    if validator.matches(request):
+        return validator.not_modified()
+    validator.apply(response)
+    found, history = read_cache.get(session, user["id"], "history", validator.etag)
+    if found:
+        return history
+    history = await _load_history(session, user["id"])
+    read_cache.put(
+        session,
+        user["id"],
+        "history",
+        validator.etag,
+        history,
+        depends_on=HISTORY_COLLECTIONS,
+        ttl_seconds=(bucket + 1) * HISTORY_FRESHNESS_SECONDS - now,
+    )
+    return history
+
+
+async def _load_history(session, owner_id: int) -> HistoryResponse:
     repo = HistoryRepository(session)
 
-    tasks = await repo.get_open_tasks(owner_id=user["id"])
-    events = await repo.get_recent_events(owner_id=user["id"])
-    projects = await repo.get_projects(owner_id=user["id"])
-    logs = await repo.get_agent_logs(owner_id=user["id"])
+    tasks = await repo.get_open_tasks(owner_id=owner_id)
+    events = await repo.get_recent_events(owner_id=owner_id)
+    projects = await repo.get_projects(owner_id=owner_id)
+    logs = await repo.get_agent_logs(owner_id=owner_id)
 
     task_reads = [TaskRead(**strip_mongo_id(dict(t))) for t in tasks]
     event_reads = [EventRead(**strip_mongo_id(dict(e))) for e in events]
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+
+from ..deps import get_current_user
+from ..read_cache import read_cache
+from ..services.llm_cache import llm_response_cache
+from ..services.llm_client import llm_flights
+from ..services.llm_governor import llm_governor
+from ..services.llm_hedging import provider_latencies
+from ..services.prompt_budget import prompt_builder
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("", response_model=dict)
+async def get_metrics(user=Depends(get_current_user)):
+    """Process-local counters (each worker reports its own)."""
+    return {
+        "read_cache": read_cache.snapshot(),
+        "llm_cache": llm_response_cache.snapshot(),
+        "llm_flights": llm_flights.snapshot(),
+        "llm_governor": llm_governor.snapshot(),
+        "llm_providers": provider_latencies.snapshot(),
+        "prompts": prompt_builder.snapshot(),
+    }
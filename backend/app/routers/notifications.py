@@ -4,7 +4,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import get_next_id
+from ..read_cache import read_cache
 from ..schemas import NotificationSignals
+from ..versioning import bump_version
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
 
@@ -24,4 +26,6 @@ async def push_notifications(
         "created_at": datetime.now(timezone.utc),
     }
     await session["agent_logs"].insert_one(doc)
+    await bump_version(session, user["id"], "agent_logs")
+    read_cache.invalidate(session, user["id"], "agent_logs")
     return None
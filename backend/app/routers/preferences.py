@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 
 from ..config import Settings
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import strip_mongo_id
 from ..schemas import UserPreferenceRead, UserPreferenceUpdate
+from ..versioning import bump_version, collection_validator
 
 router = APIRouter(prefix="/user", tags=["preferences"])
 settings = Settings()
@@ -21,9 +22,15 @@ def to_read(pref: dict) -> UserPreferenceRead:
 
 @router.get("/preferences", response_model=UserPreferenceRead)
 async def get_preferences(
+    request: Request,
+    response: Response,
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
+    validator = await collection_validator(request, session, user["id"], ("user_preferences",))
+    if validator.matches(request):
+        return validator.not_modified()
+    validator.apply(response)
     pref = await session["user_preferences"].find_one({"owner_id": user["id"]})
     if not pref:
         pref = {"owner_id": user["id"], "id": user["id"]}
@@ -46,4 +53,5 @@ async def update_preferences(
     )
     if not pref:
         pref = {"owner_id": user["id"], **update}
+    await bump_version(session, user["id"], "user_preferences")
     return to_read(strip_mongo_id(pref))
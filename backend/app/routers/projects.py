@@ -1,18 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pymongo import ReturnDocument
 
 from ..config import Settings
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import get_next_id, strip_mongo_id
+from ..pagination import MAX_PAGE_SIZE, build_query, date_range, ensure_unpaged, fetch_page, keyset_cursor, set_next_cursor
+from ..read_cache import read_cache
 from ..schemas import ProjectCreate, ProjectRead, ProjectUpdate, ProjectMilestonesUpdate
+from ..services.retrieval import retrieval_index
+from ..streaming import ndjson_response, wants_stream
+from ..versioning import bump_version, collection_validator
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 settings = Settings()
 
 
 @router.get("/", response_model=list[ProjectRead])
-async def list_projects(session=Depends(get_db), user=Depends(get_current_user)):
-    projects = await session["projects"].find({"owner_id": user["id"]}).to_list(None)
+async def list_projects(
+    request: Request,
+    response: Response,
+    due_from: datetime | None = Query(None),
+    due_to: datetime | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    query = build_query(user["id"], due_date=date_range(due_from, due_to))
+    validator = await collection_validator(request, session, user["id"], ("projects",))
+    if validator.matches(request):
+        return validator.not_modified()
+    if wants_stream(request, stream):
+        ensure_unpaged(limit, cursor)
+        find = keyset_cursor(session["projects"], query)
+        return ndjson_response(find, ProjectRead, headers=validator.headers)
+    projects, next_cursor = await fetch_page(session["projects"], query, limit=limit, cursor=cursor)
+    set_next_cursor(response, next_cursor)
+    validator.apply(response)
     return [ProjectRead(**strip_mongo_id(p)) for p in projects]
 
 
@@ -24,6 +51,9 @@ async def create_project(
 ):
     doc = {**payload.model_dump(), "owner_id": user["id"], "id": await get_next_id(session, "projects")}
     await session["projects"].insert_one(doc)
+    await bump_version(session, user["id"], "projects")
+    read_cache.invalidate(session, user["id"], "projects")
+    retrieval_index.record(session, user["id"], "projects", doc)
     return ProjectRead(**strip_mongo_id(doc))
 
 
@@ -42,6 +72,9 @@ async def update_project(
     )
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Projet introuvable")
+    await bump_version(session, user["id"], "projects")
+    read_cache.invalidate(session, user["id"], "projects")
+    retrieval_index.record(session, user["id"], "projects", project)
     return ProjectRead(**strip_mongo_id(project))
 
 
@@ -50,6 +83,9 @@ async def delete_project(project_id: int, session=Depends(get_db), user=Depends(
     result = await session["projects"].delete_one({"id": project_id, "owner_id": user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Projet introuvable")
+    await bump_version(session, user["id"], "projects")
+    read_cache.invalidate(session, user["id"], "projects")
+    retrieval_index.discard(session, user["id"], "projects", project_id)
     return None
 
 
@@ -67,4 +103,7 @@ async def update_project_milestones(
     )
     if not project:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Projet introuvable")
+    await bump_version(session, user["id"], "projects")
+    read_cache.invalidate(session, user["id"], "projects")
+    retrieval_index.record(session, user["id"], "projects", project)
     return ProjectRead(**strip_mongo_id(project))
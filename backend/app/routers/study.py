@@ -1,11 +1,13 @@
 from datetime import datetime, timezone, timedelta
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pymongo import ReturnDocument
 
-from ..deps import get_current_user, get_db
-from ..mongo_helpers import get_next_id, strip_mongo_id
+from ..deps import enforce_llm_quota, get_current_user, get_db
+from ..mongo_helpers import get_next_id, get_next_ids, strip_mongo_id
+from ..pagination import MAX_PAGE_SIZE, build_query, ensure_unpaged, fetch_page, keyset_cursor, set_next_cursor
+from ..read_cache import read_cache
 from ..schemas import (
     StudyAssistRequest,
     StudyAssistResponse,
@@ -21,10 +23,15 @@ from ..schemas import (
     StudySubjectRead,
     StudySubjectUpdate,
 )
-from ..services.learning import generate_revision_sessions, pedagogic_assist, sm2_update
+from ..services.learning import generate_revision_sessions, pedagogic_assist, sm2_update, stream_pedagogic_assist
+from ..services.retrieval import retrieval_index
+from ..streaming import ndjson_response, sse_response, wants_sse, wants_stream
 
 router = APIRouter(prefix="/study", tags=["study"])
 
+# Cards become due as time passes: cached pages of due cards are short-lived.
+DUE_CARDS_TTL_SECONDS = 60
+
 
 @router.post("/subjects", response_model=StudySubjectRead)
 async def create_subject(
@@ -43,9 +50,22 @@ async def create_subject(
 
 @router.get("/subjects", response_model=List[StudySubjectRead])
 async def list_subjects(
-    session=Depends(get_db), user=Depends(get_current_user)
+    request: Request,
+    response: Response,
+    ue_code: str | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
 ):
-    subjects = await session["study_subjects"].find({"owner_id": user["id"]}).to_list(None)
+    query = build_query(user["id"], ue_code=ue_code)
+    if wants_stream(request, stream):
+        ensure_unpaged(limit, cursor)
+        find = keyset_cursor(session["study_subjects"], query)
+        return ndjson_response(find, StudySubjectRead)
+    subjects, next_cursor = await fetch_page(session["study_subjects"], query, limit=limit, cursor=cursor)
+    set_next_cursor(response, next_cursor)
     return [StudySubjectRead(**strip_mongo_id(s)) for s in subjects]
 
 
@@ -80,6 +100,8 @@ async def delete_subject(
     await session["study_sessions"].delete_many({"owner_id": user["id"], "subject_id": subject_id})
     await session["study_cards"].delete_many({"owner_id": user["id"], "subject_id": subject_id})
     await session["study_plans"].delete_many({"owner_id": user["id"], "subject_id": subject_id})
+    read_cache.invalidate(session, user["id"], "study_sessions", "study_cards")
+    retrieval_index.invalidate(session, user["id"])
     return None
 
 
@@ -112,11 +134,12 @@ async def generate_plan(
         sessions_per_day=payload.sessions_per_day,
     )
 
+    session_ids = await get_next_ids(session, "study_sessions", len(sessions_data))
     sessions_docs: list[dict] = []
-    for item in sessions_data:
+    for item, session_id in zip(sessions_data, session_ids):
         sessions_docs.append(
             {
-                "id": await get_next_id(session, "study_sessions"),
+                "id": session_id,
                 "subject_id": payload.subject_id,
                 "plan_id": plan_id,
                 "kind": item["kind"],
@@ -133,6 +156,7 @@ async def generate_plan(
 
     if sessions_docs:
         await session["study_sessions"].insert_many(sessions_docs)
+        read_cache.invalidate(session, user["id"], "study_sessions")
 
     sessions_reads = [StudySessionRead(**strip_mongo_id(doc)) for doc in sessions_docs]
     return StudyPlanRead(
@@ -208,6 +232,7 @@ async def delete_plan(
     user=Depends(get_current_user),
 ):
     await session["study_sessions"].delete_many({"owner_id": user["id"], "plan_id": plan_id})
+    read_cache.invalidate(session, user["id"], "study_sessions")
     deleted = await session["study_plans"].delete_one({"id": plan_id, "owner_id": user["id"]})
     if deleted.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plan introuvable")
@@ -229,21 +254,38 @@ async def update_session(
     )
     if not s:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Séance introuvable")
+    read_cache.invalidate(db, user["id"], "study_sessions")
     return StudySessionRead(**strip_mongo_id(s))
 
 
 @router.get("/sessions/due", response_model=List[StudySessionRead])
 async def list_due_sessions(
-    db=Depends(get_db), user=Depends(get_current_user)
+    request: Request,
+    response: Response,
+    subject_id: int | None = Query(None),
+    plan_id: int | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    db=Depends(get_db),
+    user=Depends(get_current_user),
 ):
     now = datetime.now(timezone.utc)
-    sessions = await db["study_sessions"].find(
-        {
-            "owner_id": user["id"],
-            "status": "planned",
-            "scheduled_for": {"$lte": now},
-        }
-    ).to_list(None)
+    query = build_query(
+        user["id"],
+        status="planned",
+        scheduled_for={"$lte": now},
+        subject_id=subject_id,
+        plan_id=plan_id,
+    )
+    if wants_stream(request, stream):
+        ensure_unpaged(limit, cursor)
+        find = keyset_cursor(db["study_sessions"], query, sort_field="scheduled_for")
+        return ndjson_response(find, StudySessionRead)
+    sessions, next_cursor = await fetch_page(
+        db["study_sessions"], query, sort_field="scheduled_for", limit=limit, cursor=cursor
+    )
+    set_next_cursor(response, next_cursor)
 
     return [StudySessionRead(**strip_mongo_id(s)) for s in sessions]
 
@@ -272,18 +314,46 @@ async def create_card(
         "owner_id": user["id"],
     }
     await session["study_cards"].insert_one(card_doc)
+    read_cache.invalidate(session, user["id"], "study_cards")
+    retrieval_index.record(session, user["id"], "study_cards", card_doc)
     return StudyCardRead(**strip_mongo_id(card_doc))
 
 
 @router.get("/cards/due", response_model=List[StudyCardRead])
 async def list_due_cards(
-    session=Depends(get_db), user=Depends(get_current_user)
+    request: Request,
+    response: Response,
+    subject_id: int | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
 ):
     now = datetime.now(timezone.utc)
-    cards = await session["study_cards"].find(
-        {"owner_id": user["id"], "due_at": {"$lte": now}}
-    ).to_list(None)
-    return [StudyCardRead(**strip_mongo_id(c)) for c in cards]
+    query = build_query(user["id"], due_at={"$lte": now}, subject_id=subject_id)
+    if wants_stream(request, stream):
+        ensure_unpaged(limit, cursor)
+        find = keyset_cursor(session["study_cards"], query, sort_field="due_at")
+        return ndjson_response(find, StudyCardRead)
+
+    async def load_page():
+        cards, next_cursor = await fetch_page(
+            session["study_cards"], query, sort_field="due_at", limit=limit, cursor=cursor
+        )
+        return [StudyCardRead(**strip_mongo_id(c)) for c in cards], next_cursor
+
+    cards, next_cursor = await read_cache.get_or_load(
+        session,
+        user["id"],
+        "due_cards",
+        (subject_id, limit, cursor),
+        load_page,
+        depends_on=("study_cards",),
+        ttl_seconds=DUE_CARDS_TTL_SECONDS,
+    )
+    set_next_cursor(response, next_cursor)
+    return cards
 
 
 @router.post("/cards/{card_id}/review", response_model=StudyCardRead)
@@ -313,22 +383,30 @@ async def review_card(
         },
         return_document=ReturnDocument.AFTER,
     )
+    read_cache.invalidate(session, user["id"], "study_cards")
     return StudyCardRead(**strip_mongo_id(updated))
 
 
-@router.post("/assist", response_model=StudyAssistResponse)
+@router.post("/assist", response_model=StudyAssistResponse, dependencies=[Depends(enforce_llm_quota)])
 async def study_assist(
     payload: StudyAssistRequest,
+    request: Request,
+    stream: bool = Query(False),
+    session=Depends(get_db),
     user=Depends(get_current_user),
 ):
-    output = await pedagogic_assist(
+    params = dict(
         subject=payload.subject,
         topic=payload.topic,
         content=payload.content,
         mode=payload.mode,
         difficulty=payload.difficulty,
         items=payload.items,
+        session=session,
     )
+    if wants_sse(request, stream):
+        return sse_response(stream_pedagogic_assist(**params), "output")
+    output = await pedagogic_assist(**params)
     return StudyAssistResponse(output=output)
 
 
@@ -338,9 +416,23 @@ async def subject_progress(
     session=Depends(get_db),
     user=Depends(get_current_user),
 ):
-    sessions = await session["study_sessions"].find({"owner_id": user["id"], "subject_id": subject_id}).to_list(None)
-    if not sessions:
+    progress = await read_cache.get_or_load(
+        session,
+        user["id"],
+        "subject_progress",
+        subject_id,
+        lambda: _subject_progress(session, user["id"], subject_id),
+        depends_on=("study_sessions",),
+    )
+    if progress is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Aucune donnée")
+    return progress
+
+
+async def _subject_progress(session, owner_id: int, subject_id: int) -> dict | None:
+    sessions = await session["study_sessions"].find({"owner_id": owner_id, "subject_id": subject_id}).to_list(None)
+    if not sessions:
+        return None
 
     done = len([s for s in sessions if s.get("status") == "done"])
     planned = len([s for s in sessions if s.get("status") == "planned"])
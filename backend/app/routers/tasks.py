@@ -1,19 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from pymongo import ReturnDocument
 
 from ..deps import get_current_user, get_db
 from ..mongo_helpers import get_next_id, strip_mongo_id
-from ..schemas import TaskCreate, TaskRead, TaskUpdate
+from ..pagination import MAX_PAGE_SIZE, build_query, date_range, ensure_unpaged, fetch_page, keyset_cursor, set_next_cursor
+from ..read_cache import read_cache
+from ..schemas import TaskCreate, TaskGraphResponse, TaskRead, TaskUpdate
+from ..services.task_graph import task_graphs
+from ..services.retrieval import retrieval_index
+from ..streaming import ndjson_response, wants_stream
+from ..versioning import bump_version, collection_validator
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
 @router.get("/", response_model=list[TaskRead])
-async def list_tasks(session=Depends(get_db), user=Depends(get_current_user)):
-    tasks = await session["tasks"].find({"owner_id": user["id"]}).to_list(None)
+async def list_tasks(
+    request: Request,
+    response: Response,
+    status_filter: str | None = Query(None, alias="status"),
+    project_id: int | None = Query(None),
+    category: str | None = Query(None),
+    priority: str | None = Query(None),
+    deadline_from: datetime | None = Query(None),
+    deadline_to: datetime | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    stream: bool = Query(False),
+    session=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    query = build_query(
+        user["id"],
+        status=status_filter,
+        project_id=project_id,
+        category=category,
+        priority=priority,
+        deadline=date_range(deadline_from, deadline_to),
+    )
+    validator = await collection_validator(request, session, user["id"], ("tasks",))
+    if validator.matches(request):
+        return validator.not_modified()
+    if wants_stream(request, stream):
+        ensure_unpaged(limit, cursor)
+        find = keyset_cursor(session["tasks"], query)
+        return ndjson_response(find, TaskRead, headers=validator.headers)
+    tasks, next_cursor = await fetch_page(session["tasks"], query, limit=limit, cursor=cursor)
+    set_next_cursor(response, next_cursor)
+    validator.apply(response)
     return [TaskRead(**strip_mongo_id(t)) for t in tasks]
 
 
+@router.get("/graph", response_model=TaskGraphResponse)
+async def task_graph(session=Depends(get_db), user=Depends(get_current_user)):
+    graph = await task_graphs.get(session, user["id"])
+    return TaskGraphResponse(**vars(graph.view()))
+
+
 @router.post("/", response_model=TaskRead)
 async def create_task(payload: TaskCreate, session=Depends(get_db), user=Depends(get_current_user)):
     doc = {
@@ -23,6 +68,10 @@ async def create_task(payload: TaskCreate, session=Depends(get_db), user=Depends
         "status": "a_faire",
     }
     await session["tasks"].insert_one(doc)
+    await bump_version(session, user["id"], "tasks")
+    read_cache.invalidate(session, user["id"], "tasks")
+    task_graphs.record(session, user["id"], doc)
+    retrieval_index.record(session, user["id"], "tasks", doc)
     return TaskRead(**strip_mongo_id(doc))
 
 
@@ -41,6 +90,10 @@ async def update_task(
     )
     if not result:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tâche introuvable")
+    await bump_version(session, user["id"], "tasks")
+    read_cache.invalidate(session, user["id"], "tasks")
+    task_graphs.record(session, user["id"], result)
+    retrieval_index.record(session, user["id"], "tasks", result)
     return TaskRead(**strip_mongo_id(result))
 
 
@@ -49,4 +102,8 @@ async def delete_task(task_id: int, session=Depends(get_db), user=Depends(get_cu
     result = await session["tasks"].delete_one({"id": task_id, "owner_id": user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tâche introuvable")
+    await bump_version(session, user["id"], "tasks")
+    read_cache.invalidate(session, user["id"], "tasks")
+    task_graphs.discard(session, user["id"], task_id)
+    retrieval_index.discard(session, user["id"], "tasks", task_id)
     return None
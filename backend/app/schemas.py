@@ -54,6 +54,11 @@ class UserRead(BaseModel):
     email: EmailStr
 
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -93,6 +98,27 @@ class TaskUpdate(BaseModel):
     project_id: Optional[int] = None
 
 
+class TaskGraphResponse(BaseModel):
+    order: list[int]
+    cycles: list[list[int]]
+    critical_path: list[int]
+    critical_path_minutes: int
+    unblocked: list[int]
+
+
+class EventOccurrenceOverride(BaseModel):
+    original_start: datetime
+    title: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    description: Optional[str] = None
+    note: Optional[str] = None
+    location: Optional[str] = None
+    color: Optional[str] = None
+    important: Optional[bool] = None
+    category: Optional[str] = None
+
+
 class EventCreate(BaseModel):
     title: str
     start: datetime
@@ -112,12 +138,30 @@ class EventCreate(BaseModel):
     recurrence_interval: Optional[int] = None
     recurrence_until: Optional[datetime] = None
     recurrence_custom: Optional[str] = None
+    recurrence_exceptions: Optional[list[datetime]] = None
+    recurrence_overrides: Optional[list[EventOccurrenceOverride]] = None
 
 
 class EventRead(EventCreate):
     id: int
 
 
+class EventConflict(BaseModel):
+    id: int
+    title: Optional[str] = None
+    start: datetime
+    end: datetime
+
+
+class EventWriteResponse(EventRead):
+    conflicts: Optional[list[EventConflict]] = None
+
+
+class EventOccurrenceRead(EventRead):
+    recurrence_id: datetime
+    is_override: bool = False
+
+
 class EventUpdate(BaseModel):
     title: Optional[str] = None
     start: Optional[datetime] = None
@@ -137,6 +181,20 @@ class EventUpdate(BaseModel):
     recurrence_interval: Optional[int] = None
     recurrence_until: Optional[datetime] = None
     recurrence_custom: Optional[str] = None
+    recurrence_exceptions: Optional[list[datetime]] = None
+    recurrence_overrides: Optional[list[EventOccurrenceOverride]] = None
+
+
+class TimeInterval(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class FreeBusyResponse(BaseModel):
+    start: datetime
+    end: datetime
+    busy: list[TimeInterval]
+    free: list[TimeInterval]
 
 
 class ProjectCreate(BaseModel):
@@ -179,6 +237,20 @@ class ProjectMilestonesUpdate(BaseModel):
     milestones_dates: list[ProjectMilestone]
 
 
+class IcsImportJobRead(BaseModel):
+    id: int
+    status: str  # pending | running | done | failed
+    total_bytes: int
+    processed_bytes: int
+    imported: int
+    updated: int
+    unchanged: int
+    invalid: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
 class AgentPlanRequest(BaseModel):
     date: Optional[datetime] = None
     mode: str = "day"  # day | week
@@ -194,10 +266,33 @@ class AgentPlanResponse(BaseModel):
 class AgentChatRequest(BaseModel):
     message: str
     history: Optional[list[dict[str, str]]] = None
+    conversation_id: Optional[int] = None
 
 
 class AgentChatResponse(BaseModel):
     reply: str
+    conversation_id: Optional[int] = None
+
+
+class ConversationMessageRead(BaseModel):
+    seq: int
+    role: str
+    content: str
+    created_at: datetime
+
+
+class ConversationRead(BaseModel):
+    id: int
+    title: str
+    summary: str = ""
+    summarized_through: int = 0
+    last_seq: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+
+class ConversationDetail(ConversationRead):
+    messages: list[ConversationMessageRead] = []
 
 
 class UserPreferenceRead(BaseModel):
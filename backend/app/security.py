@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 from jose import JWTError, jwt
@@ -5,23 +7,59 @@ from passlib.context import CryptContext
 
 from .config import Settings, TokenPayload
 
-# Use pbkdf2_sha256 to avoid bcrypt backend/version issues and password length limits.
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 settings = Settings()
+# Use pbkdf2_sha256 to avoid bcrypt backend/version issues and password length limits.
+# Rounds are pinned (min = max = default): hashes made under another policy are
+# flagged by `verify_and_update` and rehashed at the next successful login.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__min_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__max_rounds=settings.password_hash_rounds,
+)
+
+# Hashing is CPU bound (hashlib releases the GIL): it runs in a small dedicated
+# pool so that a burst of logins neither blocks the event loop nor starves the
+# default executor used by other `to_thread` work.
+_hash_pool: ThreadPoolExecutor | None = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+    return _hash_pool
+
+
+def shutdown_hash_pool() -> None:
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+
+async def _run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_pool(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
 
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await _run(pwd_context.verify, plain, hashed)
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def verify_and_update(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """`(valid, new_hash)`; `new_hash` is set when `hashed` predates the current policy."""
+    return await _run(pwd_context.verify_and_update, plain, hashed)
 
 
-def create_access_token(subject: str, expires_minutes: int | None = None) -> str:
+def create_access_token(subject: str, expires_minutes: int | None = None, *, version: int = 0) -> str:
     expire_delta = expires_minutes or settings.access_token_expire_minutes
     expire = datetime.now(timezone.utc) + timedelta(minutes=expire_delta)
-    to_encode = {"sub": subject, "exp": expire}
+    to_encode = {"sub": subject, "exp": expire, "ver": version}
     return jwt.encode(to_encode, settings.secret_key, algorithm="HS256")
 
 
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+from contextlib import aclosing
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Iterable
+from typing import AsyncIterator, Iterable, Mapping, Optional, Sequence
 
 from ..config import Settings
 from ..mongo_helpers import get_next_id
-from .llm_client import LLMClient
+from ..read_cache import read_cache
+from ..repositories.conversations import ConversationRepository
+from ..versioning import bump_version
+from .llm_client import EMPTY_REPLY_PREFIX, LLMClient
+from .prompt_budget import prompt_builder
+from .retrieval import retrieval_index
 
 settings = Settings()
 llm_client = LLMClient(settings)
@@ -38,6 +45,9 @@ async def log_agent_decision(session, user, action: str, rationale: str, events:
         "created_at": datetime.now(timezone.utc),
     }
     await session["agent_logs"].insert_one(doc)
+    if owner_id is not None:
+        await bump_version(session, owner_id, "agent_logs")
+        read_cache.invalidate(session, owner_id, "agent_logs")
 
 
 def extract_choice_text(data: dict, allow_reasoning: bool = True) -> str:
@@ -46,23 +56,74 @@ def extract_choice_text(data: dict, allow_reasoning: bool = True) -> str:
     return LLMClient._extract_choice_text(data, allow_reasoning=allow_reasoning)
 
 
-async def generate_chat_reply(message: str, user) -> str:
-    if not settings.openai_api_key:
-        return "LLM non configuré — réponse simplifiée générée."
+CHAT_FALLBACK = "LLM non configuré — réponse simplifiée générée."
+CHAT_ERROR_PREFIX = "Impossible de répondre via le LLM"
+WORKSPACE_HEADER = "Éléments de l'espace de travail de l'utilisateur liés à la demande :"
 
+
+def is_failed_reply(reply: str) -> bool:
+    """Message d'erreur affiché à la place d'une réponse : ni conservé, ni renvoyé au LLM, ni résumé."""
+    return reply.startswith(EMPTY_REPLY_PREFIX) or f"{CHAT_ERROR_PREFIX}: " in reply
+
+
+def _exchanges(messages: Sequence[Mapping[str, str]]) -> list[Mapping[str, str]]:
+    """`messages` sans les réponses en échec (conversations enregistrées avant leur exclusion)."""
+    return [m for m in messages if not (m.get("role") == "assistant" and is_failed_reply(m.get("content", "")))]
+
+
+@dataclass
+class ChatContext:
+    """Ce qui accompagne le message : résumé glissant, derniers échanges, extraits de l'espace de travail."""
+
+    summary: str = ""
+    history: list[dict[str, str]] = field(default_factory=list)
+    workspace: list[str] = field(default_factory=list)
+
+
+def _chat_messages(message: str, context: Optional[ChatContext] = None) -> list[dict[str, str]]:
     prompt = (
         "Tu es un assistant personnel concis. Réponds en français en 3 phrases max, "
         "ton neutre et utile."
     )
-    messages = [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": message},
-    ]
+    context = context or ChatContext()
+    return prompt_builder.build(
+        "chat",
+        prompt,
+        message,
+        summary=f"Résumé de la conversation jusqu'ici : {context.summary}" if context.summary else "",
+        retrieved=context.workspace,
+        retrieved_header=WORKSPACE_HEADER,
+        retrieved_budget=settings.agent_retrieval_max_tokens,
+        history=context.history,
+    ).messages
+
+
+async def generate_chat_reply(message: str, user, context: Optional[ChatContext] = None) -> str:
+    if not llm_client.providers():
+        return CHAT_FALLBACK
 
     try:
-        return await llm_client.chat(messages, max_tokens=512, allow_reasoning=False)
+        return await llm_client.chat(_chat_messages(message, context), max_tokens=512, allow_reasoning=False)
     except Exception as exc:
-        return f"Impossible de répondre via le LLM: {exc}"
+        return f"{CHAT_ERROR_PREFIX}: {exc}"
+
+
+async def stream_chat_reply(message: str, user, context: Optional[ChatContext] = None) -> AsyncIterator[str]:
+    """Variante de `generate_chat_reply` qui produit la réponse fragment par fragment."""
+    if not llm_client.providers():
+        yield CHAT_FALLBACK
+        return
+
+    started = False
+    try:
+        async with aclosing(llm_client.stream_chat(_chat_messages(message, context), max_tokens=512)) as deltas:
+            async for delta in deltas:
+                started = True
+                yield delta
+    except Exception as exc:
+        # Après une réponse partielle, l'erreur vient à la ligne.
+        separator = "\n\n" if started else ""
+        yield f"{separator}{CHAT_ERROR_PREFIX}: {exc}"
 
 
 async def summarize_chat(messages: list[dict[str, str]]) -> str:
@@ -70,7 +131,7 @@ async def summarize_chat(messages: list[dict[str, str]]) -> str:
         return "Aucune conversation."
 
     # Best-effort local summary when no LLM key
-    if not settings.openai_api_key:
+    if not llm_client.providers():
         last_user = [m["content"] for m in messages if m.get("role") == "user"]
         joined = " | ".join(last_user[-5:])
         return f"Derniers échanges: {joined}" if joined else "Aucune conversation."
@@ -79,15 +140,85 @@ async def summarize_chat(messages: list[dict[str, str]]) -> str:
         "Tu es un assistant qui résume une conversation en français en 4 phrases max. "
         "Mentionne les intentions clés et décisions."
     )
-    chat_messages = [
-        {"role": "system", "content": prompt},
-        *[
-            {"role": m.get("role", "user"), "content": m.get("content", "")}
-            for m in messages[-20:]
-        ],
-    ]
+    # Les échanges les plus récents qui tiennent dans le budget de tokens.
+    chat_messages = prompt_builder.build("summary", prompt, history=_exchanges(messages)).messages
 
     try:
         return await llm_client.chat(chat_messages, max_tokens=200, allow_reasoning=False)
     except Exception as exc:
         return f"Impossible de résumer la conversation: {exc}"
+
+
+SUMMARY_MAX_CHARS = 1000
+
+
+async def _update_summary(previous: str, messages: Sequence[Mapping[str, str]]) -> Optional[str]:
+    """Intègre `messages` au résumé `previous` ; None si le LLM a échoué."""
+    if not llm_client.providers():
+        parts = ([previous] if previous else []) + [m["content"] for m in messages if m.get("role") == "user"]
+        return " | ".join(parts)[-SUMMARY_MAX_CHARS:]
+
+    prompt = (
+        "Tu tiens à jour le résumé d'une conversation, en français, en 6 phrases max. "
+        "Intègre les nouveaux échanges au résumé actuel en gardant intentions clés, décisions et faits utiles."
+    )
+    exchanges = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    chat_messages = prompt_builder.build(
+        "rolling_summary", prompt, f"Résumé actuel :\n{previous or '(vide)'}\n\nNouveaux échanges :\n{exchanges}"
+    ).messages
+    try:
+        return await llm_client.chat(chat_messages, max_tokens=250, allow_reasoning=False)
+    except Exception:
+        return None
+
+
+async def _fold_into_summary(repo: ConversationRepository, conversation: dict, pending: list[dict], keep: int) -> list[dict]:
+    """Résume tous les messages de `pending` sauf les `keep` derniers ; renvoie ceux qui restent à part."""
+    split = max(0, len(pending) - keep)
+    folded, rest = pending[:split], pending[split:]
+    if not folded:
+        return pending
+    exchanges = _exchanges(folded)
+    summary = await _update_summary(conversation["summary"], exchanges) if exchanges else conversation["summary"]
+    if summary is None or not await repo.save_summary(conversation, summary, folded[-1]["seq"]):
+        return pending
+    return rest
+
+
+async def conversation_context(repo: ConversationRepository, conversation: dict) -> ChatContext:
+    """Résumé glissant + derniers messages, à placer avant le nouveau message.
+
+    Seuls les messages postérieurs au dernier point de résumé sont lus. Quand
+    ils dépassent deux fenêtres, les plus anciens sont intégrés au résumé (un
+    appel LLM sur ces seuls messages) et la fenêtre la plus récente reste telle
+    quelle : le prompt reste borné quelle que soit la longueur de l'échange.
+    `prompt_builder` ne garde ensuite que ce qui tient dans le budget de tokens.
+    """
+    window = settings.agent_chat_window_messages
+    pending = await repo.messages_after(conversation, conversation["summarized_through"])
+    if len(pending) > 2 * window:
+        pending = await _fold_into_summary(repo, conversation, pending, keep=window)
+
+    return ChatContext(
+        summary=conversation["summary"],
+        history=[{"role": m["role"], "content": m["content"]} for m in _exchanges(pending[-2 * window:])],
+    )
+
+
+def workspace_context(session, owner_id: int, message: str) -> list[str]:
+    """Extraits des tâches, événements, projets et fiches les plus proches du message (BM25 local), meilleurs d'abord.
+
+    Tant que l'index de l'utilisateur se construit (en arrière-plan, lancé ici au premier appel), aucun extrait.
+    """
+    if not llm_client.providers():
+        return []
+    hits = retrieval_index.search(session, owner_id, message, k=settings.agent_retrieval_top_k)
+    return [f"- {hit.snippet}" for hit in hits]
+
+
+async def summarize_conversation(repo: ConversationRepository, conversation: dict) -> str:
+    """Résumé à jour : seuls les messages postérieurs au dernier point de résumé sont envoyés."""
+    pending = await repo.messages_after(conversation, conversation["summarized_through"])
+    if pending:
+        await _fold_into_summary(repo, conversation, pending, keep=0)
+    return conversation["summary"] or "Aucune conversation."
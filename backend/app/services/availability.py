@@ -0,0 +1,163 @@
+"""Free/busy computation from the user's fixed events and preferences.
+
+Busy intervals are sorted and merged once (O(n log n)); free intervals are
+then obtained with a single linear sweep over the working hours of the
+window (`productive_hours`, minus `days_off`). Times are naive UTC, like the
+datetimes stored in Mongo; `productive_hours` are interpreted on that clock.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Any, Iterable, Optional, Sequence
+
+from ..utils import naive_utc
+from .recurrence import load_occurrences
+
+Interval = tuple[datetime, datetime]
+
+WEEKDAY_NAMES = {
+    "lundi": 0,
+    "mardi": 1,
+    "mercredi": 2,
+    "jeudi": 3,
+    "vendredi": 4,
+    "samedi": 5,
+    "dimanche": 6,
+    "monday": 0,
+    "tuesday": 1,
+    "wednesday": 2,
+    "thursday": 3,
+    "friday": 4,
+    "saturday": 5,
+    "sunday": 6,
+}
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> list[Interval]:
+    """Sort and merge overlapping or touching intervals."""
+    merged: list[Interval] = []
+    for start, end in sorted(i for i in intervals if i[1] > i[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def parse_days_off(days_off: Optional[Sequence[str]]) -> tuple[set[int], set[date]]:
+    """Split `days_off` into weekdays ("lundi", "sunday", "sam"...) and ISO dates."""
+    weekdays: set[int] = set()
+    dates: set[date] = set()
+    for raw in days_off or []:
+        value = raw.strip().lower()
+        if not value:
+            continue
+        try:
+            dates.add(date.fromisoformat(value))
+            continue
+        except ValueError:
+            pass
+        for name, weekday in WEEKDAY_NAMES.items():
+            if len(value) >= 3 and name.startswith(value):
+                weekdays.add(weekday)
+                break
+    return weekdays, dates
+
+
+def _parse_clock(value: Optional[str], default: time) -> time:
+    try:
+        return time.fromisoformat(value) if value else default
+    except ValueError:
+        return default
+
+
+def parse_productive_hours(productive_hours: Optional[Sequence[dict[str, Any]]]) -> list[tuple[time, Optional[time]]]:
+    """Daily `(start, end)` ranges; `end=None` means midnight. Empty means all day."""
+    ranges: list[tuple[time, Optional[time]]] = []
+    for item in productive_hours or []:
+        start = _parse_clock(item.get("start"), time.min)
+        end = _parse_clock(item.get("end"), time.min)
+        ranges.append((start, None if end == time.min else end))
+    return ranges or [(time.min, None)]
+
+
+def working_intervals(
+    window_start: datetime,
+    window_end: datetime,
+    productive_hours: Optional[Sequence[dict[str, Any]]] = None,
+    days_off: Optional[Sequence[str]] = None,
+) -> list[Interval]:
+    """Productive-hours intervals of the window, skipping days off."""
+    off_weekdays, off_dates = parse_days_off(days_off)
+    ranges = parse_productive_hours(productive_hours)
+    intervals: list[Interval] = []
+    day = window_start.date()
+    while day <= window_end.date():
+        if day.weekday() not in off_weekdays and day not in off_dates:
+            for start_clock, end_clock in ranges:
+                start = datetime.combine(day, start_clock)
+                end = datetime.combine(day + timedelta(days=1), time.min) if end_clock is None else datetime.combine(day, end_clock)
+                start, end = max(start, window_start), min(end, window_end)
+                if end > start:
+                    intervals.append((start, end))
+        day += timedelta(days=1)
+    return merge_intervals(intervals)
+
+
+def subtract_intervals(available: Sequence[Interval], busy: Sequence[Interval]) -> list[Interval]:
+    """`available` minus `busy`; both sorted and merged. Linear two-pointer sweep."""
+    free: list[Interval] = []
+    j = 0
+    for start, end in available:
+        cursor = start
+        while j < len(busy) and busy[j][1] <= cursor:
+            j += 1
+        k = j
+        while k < len(busy) and busy[k][0] < end:
+            if busy[k][0] > cursor:
+                free.append((cursor, busy[k][0]))
+            cursor = max(cursor, busy[k][1])
+            k += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
+def free_intervals(
+    window_start: datetime,
+    window_end: datetime,
+    busy: Iterable[Interval],
+    productive_hours: Optional[Sequence[dict[str, Any]]] = None,
+    days_off: Optional[Sequence[str]] = None,
+) -> list[Interval]:
+    available = working_intervals(window_start, window_end, productive_hours, days_off)
+    return subtract_intervals(available, merge_intervals(busy))
+
+
+def find_slots(free: Iterable[Interval], duration: timedelta, limit: Optional[int] = None) -> list[Interval]:
+    """Free intervals long enough to hold `duration`, in chronological order."""
+    slots = [(start, end) for start, end in free if end - start >= duration]
+    return slots[:limit] if limit else slots
+
+
+async def load_busy_intervals(session, owner_id: int, window_start: datetime, window_end: datetime) -> list[Interval]:
+    """Merged busy intervals: fixed events and recurring occurrences, not AI proposals."""
+    occurrences = await load_occurrences(
+        session, owner_id, window_start, window_end, extra_filter={"kind": {"$ne": "propose"}}
+    )
+    return merge_intervals((max(o["start"], window_start), min(o["end"], window_end)) for o in occurrences)
+
+
+async def load_free_busy(
+    session,
+    owner_id: int,
+    window_start: datetime,
+    window_end: datetime,
+) -> tuple[list[Interval], list[Interval]]:
+    window_start, window_end = naive_utc(window_start), naive_utc(window_end)
+    prefs = await session["user_preferences"].find_one({"owner_id": owner_id}) or {}
+    busy = await load_busy_intervals(session, owner_id, window_start, window_end)
+    free = free_intervals(window_start, window_end, busy, prefs.get("productive_hours"), prefs.get("days_off"))
+    return busy, free
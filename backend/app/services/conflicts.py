@@ -0,0 +1,279 @@
+"""Agenda conflict detection backed by per-user interval trees.
+
+Each user's one-off events are kept in an augmented treap (balanced in
+expectation) ordered by `(start, id)`, where every node stores the maximum
+`end` of its subtree: an overlap query prunes whole subtrees and costs
+O(log n + k). Recurring series are few per user and are expanded on demand
+over the queried interval only.
+
+Trees are built lazily from the `events` collection on first use, updated
+incrementally by the write handlers of this process, and rebuilt after
+`ttl_seconds` so that writes made by other workers are eventually seen.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Optional
+
+from ..mongo_helpers import strip_mongo_id
+from ..utils import naive_utc
+from .recurrence import RECURRENCE_FREQUENCIES, series_cache
+
+
+class _Node:
+    __slots__ = ("start", "end", "event_id", "priority", "max_end", "left", "right")
+
+    def __init__(self, start: datetime, end: datetime, event_id: int) -> None:
+        self.start = start
+        self.end = end
+        self.event_id = event_id
+        self.priority = random.random()
+        self.max_end = end
+        self.left: Optional[_Node] = None
+        self.right: Optional[_Node] = None
+
+    def update(self) -> None:
+        max_end = self.end
+        if self.left is not None and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+
+def _rotate_right(node: _Node) -> _Node:
+    pivot = node.left
+    node.left, pivot.right = pivot.right, node
+    node.update()
+    pivot.update()
+    return pivot
+
+
+def _rotate_left(node: _Node) -> _Node:
+    pivot = node.right
+    node.right, pivot.left = pivot.left, node
+    node.update()
+    pivot.update()
+    return pivot
+
+
+def _insert(node: Optional[_Node], new: _Node) -> _Node:
+    if node is None:
+        return new
+    if (new.start, new.event_id) < (node.start, node.event_id):
+        node.left = _insert(node.left, new)
+        if node.left.priority > node.priority:
+            return _rotate_right(node)
+    else:
+        node.right = _insert(node.right, new)
+        if node.right.priority > node.priority:
+            return _rotate_left(node)
+    node.update()
+    return node
+
+
+def _delete(node: Optional[_Node], key: tuple[datetime, int]) -> Optional[_Node]:
+    if node is None:
+        return None
+    node_key = (node.start, node.event_id)
+    if key < node_key:
+        node.left = _delete(node.left, key)
+    elif key > node_key:
+        node.right = _delete(node.right, key)
+    else:
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        if node.left.priority > node.right.priority:
+            node = _rotate_right(node)
+            node.right = _delete(node.right, key)
+        else:
+            node = _rotate_left(node)
+            node.left = _delete(node.left, key)
+    node.update()
+    return node
+
+
+def _update_subtree(root: _Node) -> None:
+    """Recompute `max_end` bottom-up (iterative post-order)."""
+    stack: list[tuple[_Node, bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if children_done:
+            node.update()
+            continue
+        stack.append((node, True))
+        for child in (node.left, node.right):
+            if child is not None:
+                stack.append((child, False))
+
+
+class IntervalTree:
+    """Set of `[start, end)` intervals identified by event id."""
+
+    def __init__(self) -> None:
+        self._root: Optional[_Node] = None
+        self._keys: dict[int, tuple[datetime, datetime]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, event_id: int) -> bool:
+        return event_id in self._keys
+
+    @classmethod
+    def build(cls, intervals: Iterable[tuple[datetime, datetime, int]]) -> "IntervalTree":
+        """Bulk construction in O(n log n) (sort) + O(n) (Cartesian tree)."""
+        tree = cls()
+        spine: list[_Node] = []
+        for start, end, event_id in sorted(intervals, key=lambda i: (i[0], i[2])):
+            if event_id in tree._keys:
+                continue
+            node = _Node(start, end, event_id)
+            last: Optional[_Node] = None
+            while spine and spine[-1].priority < node.priority:
+                last = spine.pop()
+            node.left = last
+            if spine:
+                spine[-1].right = node
+            spine.append(node)
+            tree._keys[event_id] = (start, end)
+        if spine:
+            tree._root = spine[0]
+            _update_subtree(tree._root)
+        return tree
+
+    def insert(self, start: datetime, end: datetime, event_id: int) -> None:
+        self.remove(event_id)
+        self._root = _insert(self._root, _Node(start, end, event_id))
+        self._keys[event_id] = (start, end)
+
+    def remove(self, event_id: int) -> None:
+        bounds = self._keys.pop(event_id, None)
+        if bounds is not None:
+            self._root = _delete(self._root, (bounds[0], event_id))
+
+    def overlapping(self, start: datetime, end: datetime) -> list[int]:
+        """Ids of the intervals with `other.start < end` and `other.end > start`."""
+        found: list[int] = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.start < end:
+                if node.end > start:
+                    found.append(node.event_id)
+                stack.append(node.right)
+        return found
+
+
+class _UserIndex:
+    __slots__ = ("tree", "details", "series", "built_at")
+
+    def __init__(self) -> None:
+        self.tree = IntervalTree()
+        self.details: dict[int, dict[str, Any]] = {}
+        self.series: dict[int, dict[str, Any]] = {}
+        self.built_at = time.monotonic()
+
+    def add(self, event: dict[str, Any]) -> None:
+        self.remove(event["id"])
+        if event.get("kind") == "propose":
+            return
+        if event.get("recurrence") in RECURRENCE_FREQUENCIES:
+            self.series[event["id"]] = event
+            return
+        start, end = naive_utc(event["start"]), naive_utc(event["end"])
+        self.tree.insert(start, end, event["id"])
+        self.details[event["id"]] = {"id": event["id"], "title": event.get("title"), "start": start, "end": end}
+
+    def remove(self, event_id: int) -> None:
+        self.tree.remove(event_id)
+        self.details.pop(event_id, None)
+        self.series.pop(event_id, None)
+
+    def conflicts(self, start: datetime, end: datetime, exclude_id: Optional[int]) -> Iterator[dict[str, Any]]:
+        for event_id in self.tree.overlapping(start, end):
+            if event_id != exclude_id:
+                yield self.details[event_id]
+        for event_id, event in self.series.items():
+            if event_id == exclude_id:
+                continue
+            for occurrence in series_cache.get(event).occurrences(start, end):
+                if occurrence["end"] > start:
+                    yield {"id": event_id, "title": occurrence.get("title"), "start": occurrence["start"], "end": occurrence["end"]}
+
+
+class ConflictIndex:
+    """Per-user interval trees, bounded LRU over users."""
+
+    def __init__(self, max_users: int = 256, ttl_seconds: float = 300.0) -> None:
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._users: OrderedDict[tuple[str, int], _UserIndex] = OrderedDict()
+
+    @staticmethod
+    def _key(session, owner_id: int) -> tuple[str, int]:
+        return (getattr(session, "name", ""), owner_id)
+
+    async def _load(self, session, owner_id: int) -> _UserIndex:
+        key = self._key(session, owner_id)
+        index = self._users.get(key)
+        if index is not None and time.monotonic() - index.built_at < self.ttl_seconds:
+            self._users.move_to_end(key)
+            return index
+
+        index = _UserIndex()
+        cursor = session["events"].find({"owner_id": owner_id, "kind": {"$ne": "propose"}})
+        intervals: list[tuple[datetime, datetime, int]] = []
+        async for event in cursor:
+            event = strip_mongo_id(event)
+            if event.get("recurrence") in RECURRENCE_FREQUENCIES:
+                index.series[event["id"]] = event
+                continue
+            start, end = naive_utc(event["start"]), naive_utc(event["end"])
+            intervals.append((start, end, event["id"]))
+            index.details[event["id"]] = {"id": event["id"], "title": event.get("title"), "start": start, "end": end}
+        index.tree = IntervalTree.build(intervals)
+        self._users[key] = index
+        self._users.move_to_end(key)
+        if len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return index
+
+    async def find_conflicts(
+        self,
+        session,
+        owner_id: int,
+        start: datetime,
+        end: datetime,
+        exclude_id: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        index = await self._load(session, owner_id)
+        found = list(index.conflicts(naive_utc(start), naive_utc(end), exclude_id))
+        found.sort(key=lambda c: (c["start"], c["id"]))
+        return found
+
+    def record(self, session, owner_id: int, event: dict[str, Any]) -> None:
+        """Apply a created/updated event to an already built tree (no-op otherwise)."""
+        index = self._users.get(self._key(session, owner_id))
+        if index is not None:
+            index.add(event)
+
+    def discard(self, session, owner_id: int, event_id: int) -> None:
+        index = self._users.get(self._key(session, owner_id))
+        if index is not None:
+            index.remove(event_id)
+
+    def invalidate(self, session, owner_id: int) -> None:
+        self._users.pop(self._key(session, owner_id), None)
+
+
+conflict_index = ConflictIndex()
@@ -0,0 +1,302 @@
+"""Streaming ICS import.
+
+The upload is read line by line in a worker thread: VEVENT blocks are cut
+out of the stream and parsed one at a time, so neither the whole file nor a
+full `Calendar` object graph is ever held in memory, and the event loop is
+never blocked by parsing. Chunks of `chunk_size` events are written with one
+lookup, one `get_next_ids`, one `insert_many` and one `bulk_write`, while the
+thread already parses the next chunk.
+
+Events are matched on `(UID, RECURRENCE-ID)`: re-importing a feed updates
+the events whose `SEQUENCE` did not go backwards and whose content changed,
+and leaves the others untouched instead of duplicating them.
+
+Large uploads run as background jobs (`import_jobs` collection) whose
+progress is updated after every chunk.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import datetime, time, timezone
+from typing import Any, BinaryIO, Optional
+
+from icalendar import Event as IcsEvent
+from pymongo import UpdateOne
+
+from ..mongo_helpers import get_next_id, get_next_ids
+from ..read_cache import read_cache
+from ..repositories.events import EventRepository
+from ..versioning import bump_version
+from .conflicts import conflict_index
+from .retrieval import retrieval_index
+
+logger = logging.getLogger(__name__)
+
+COMPARED_FIELDS = ("title", "start", "end", "category", "description", "location")
+
+_background_jobs: set[asyncio.Task] = set()
+
+
+class InvalidIcsError(ValueError):
+    pass
+
+
+@dataclass
+class ImportStats:
+    imported: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    invalid: int = 0
+    processed_bytes: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.imported + self.updated + self.unchanged
+
+
+def as_datetime(value) -> datetime:
+    """Normalize icalendar date/datetime to naive datetime."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if hasattr(value, "dt"):
+        inner = value.dt
+        if isinstance(inner, datetime):
+            return inner.replace(tzinfo=None)
+        if hasattr(inner, "year") and hasattr(inner, "month") and hasattr(inner, "day"):
+            return datetime.combine(inner, time.min)
+    raise ValueError("Date ICS invalide")
+
+
+def vevent_to_doc(component) -> Optional[dict[str, Any]]:
+    """Event document (without owner/id) for a parsed VEVENT, or None if unusable."""
+    dtstart = component.get("DTSTART")
+    dtend = component.get("DTEND")
+    if not dtstart or not dtend:
+        return None
+    try:
+        start_dt = as_datetime(dtstart)
+        end_dt = as_datetime(dtend)
+        recurrence_id = as_datetime(component["RECURRENCE-ID"]) if component.get("RECURRENCE-ID") else None
+    except ValueError:
+        return None
+    categories = component.get("CATEGORIES")
+    category = None
+    if categories:
+        first = categories[0] if isinstance(categories, list) else categories
+        values = getattr(first, "cats", None)
+        category = str(values[0]) if values else str(first)
+    try:
+        sequence = int(component.get("SEQUENCE", 0))
+    except (TypeError, ValueError):
+        sequence = 0
+    uid = component.get("UID")
+    doc = {
+        "title": str(component.get("SUMMARY", "Événement")),
+        "start": start_dt,
+        "end": end_dt,
+        "kind": "fixe",
+        "category": category or "general",
+        "ics_uid": str(uid) if uid else None,
+        "ics_recurrence_id": recurrence_id,
+        "ics_sequence": sequence,
+    }
+    for field, prop in (("description", "DESCRIPTION"), ("location", "LOCATION")):
+        if component.get(prop):
+            doc[field] = str(component.get(prop))
+    return doc
+
+
+class VEventReader:
+    """Cuts VEVENT blocks out of a binary ICS stream (blocking; run it in a thread)."""
+
+    def __init__(self, fileobj: BinaryIO) -> None:
+        self._file = fileobj
+        self.bytes_read = 0
+        self.saw_calendar = False
+        self.done = False
+
+    def read_chunk(self, max_events: int) -> tuple[list[dict[str, Any]], int]:
+        """Next `max_events` VEVENTs as `(documents, invalid count)`."""
+        docs: list[dict[str, Any]] = []
+        invalid = 0
+        block: Optional[list[str]] = None
+        depth = 0
+        while len(docs) + invalid < max_events:
+            raw = self._file.readline()
+            if not raw:
+                self.done = True
+                break
+            self.bytes_read += len(raw)
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            upper = line.upper()
+            if block is None:
+                if upper == "BEGIN:VCALENDAR":
+                    self.saw_calendar = True
+                elif upper == "BEGIN:VEVENT":
+                    block, depth = [line], 1
+                continue
+            block.append(line)
+            if upper.startswith("BEGIN:"):
+                depth += 1
+            elif upper.startswith("END:"):
+                depth -= 1
+                if depth == 0:
+                    doc = self._parse("\r\n".join(block) + "\r\n")
+                    if doc is None:
+                        invalid += 1
+                    else:
+                        docs.append(doc)
+                    block = None
+        return docs, invalid
+
+    @staticmethod
+    def _parse(text: str) -> Optional[dict[str, Any]]:
+        try:
+            return vevent_to_doc(IcsEvent.from_ical(text))
+        except Exception:  # malformed block: skip it, keep the rest of the feed
+            return None
+
+
+def _match_key(doc: dict[str, Any]) -> tuple[str, Optional[datetime]]:
+    return doc["ics_uid"], doc.get("ics_recurrence_id")
+
+
+async def _apply_chunk(session, owner_id: int, docs: list[dict[str, Any]], stats: ImportStats) -> list[dict[str, Any]]:
+    """Insert new events and update changed ones; returns the written documents."""
+    # Within a chunk, the highest SEQUENCE of a (UID, RECURRENCE-ID) wins.
+    keyed: dict[tuple[str, Optional[datetime]], dict[str, Any]] = {}
+    anonymous: list[dict[str, Any]] = []
+    for doc in docs:
+        if not doc["ics_uid"]:
+            anonymous.append(doc)
+            continue
+        current = keyed.get(_match_key(doc))
+        if current is None or doc["ics_sequence"] >= current["ics_sequence"]:
+            if current is not None:
+                stats.unchanged += 1
+            keyed[_match_key(doc)] = doc
+        else:
+            stats.unchanged += 1
+
+    existing: dict[tuple[str, Optional[datetime]], dict[str, Any]] = {}
+    if keyed:
+        cursor = session["events"].find(
+            {"owner_id": owner_id, "ics_uid": {"$in": list({uid for uid, _ in keyed})}},
+            {"_id": 0, "id": 1, "ics_uid": 1, "ics_recurrence_id": 1, "ics_sequence": 1, **dict.fromkeys(COMPARED_FIELDS, 1)},
+        )
+        async for doc in cursor:
+            existing[_match_key(doc)] = doc
+
+    to_insert = list(anonymous)
+    updates: list[UpdateOne] = []
+    written: list[dict[str, Any]] = []
+    for key, doc in keyed.items():
+        current = existing.get(key)
+        if current is None:
+            to_insert.append(doc)
+        elif doc["ics_sequence"] < (current.get("ics_sequence") or 0) or all(
+            doc.get(f) == current.get(f) for f in COMPARED_FIELDS
+        ):
+            stats.unchanged += 1
+        else:
+            updates.append(UpdateOne({"owner_id": owner_id, "id": current["id"]}, {"$set": doc, "$inc": {"version": 1}}))
+            written.append(doc)
+
+    if to_insert:
+        ids = await get_next_ids(session, "events", len(to_insert))
+        for doc, event_id in zip(to_insert, ids):
+            doc.update({"owner_id": owner_id, "id": event_id, "version": 1})
+        await session["events"].insert_many(to_insert, ordered=False)
+        written.extend(to_insert)
+    if updates:
+        await session["events"].bulk_write(updates, ordered=False)
+    if to_insert or updates:
+        await bump_version(session, owner_id, "events")
+        read_cache.invalidate(session, owner_id, "events")
+    stats.imported += len(to_insert)
+    stats.updated += len(updates)
+    return written
+
+
+async def import_ics_stream(
+    session,
+    owner_id: int,
+    fileobj: BinaryIO,
+    *,
+    chunk_size: int = 500,
+    on_progress=None,
+) -> ImportStats:
+    """Import an ICS stream chunk by chunk; parsing overlaps with the Mongo writes."""
+    reader = VEventReader(fileobj)
+    stats = ImportStats()
+    repo = EventRepository(session)
+    pending = asyncio.ensure_future(asyncio.to_thread(reader.read_chunk, chunk_size))
+    try:
+        while pending is not None:
+            docs, invalid = await pending
+            pending = None if reader.done else asyncio.ensure_future(asyncio.to_thread(reader.read_chunk, chunk_size))
+            stats.invalid += invalid
+            written = await _apply_chunk(session, owner_id, docs, stats)
+            await repo.record_durations(owner_id, written)
+            stats.processed_bytes = reader.bytes_read
+            if on_progress is not None:
+                await on_progress(stats)
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if stats.imported or stats.updated:
+            conflict_index.invalidate(session, owner_id)
+            retrieval_index.invalidate(session, owner_id)
+    if not reader.saw_calendar:
+        raise InvalidIcsError("Fichier ICS invalide")
+    return stats
+
+
+async def start_import_job(session, owner_id: int, fileobj: BinaryIO, total_bytes: Optional[int], chunk_size: int) -> dict[str, Any]:
+    """Spool the upload to disk and import it in the background."""
+    with tempfile.NamedTemporaryFile(prefix="overseer-ics-", suffix=".ics", delete=False) as spool:
+        await asyncio.to_thread(shutil.copyfileobj, fileobj, spool)
+    job = {
+        "id": await get_next_id(session, "import_jobs"),
+        "owner_id": owner_id,
+        "status": "pending",
+        "total_bytes": total_bytes if total_bytes is not None else os.path.getsize(spool.name),
+        **asdict(ImportStats()),
+        "error": None,
+        "created_at": datetime.now(timezone.utc),
+        "finished_at": None,
+    }
+    await session["import_jobs"].insert_one(job)
+    task = asyncio.create_task(_run_job(session, owner_id, job["id"], spool.name, chunk_size))
+    _background_jobs.add(task)
+    task.add_done_callback(_background_jobs.discard)
+    return job
+
+
+async def _run_job(session, owner_id: int, job_id: int, path: str, chunk_size: int) -> None:
+    jobs = session["import_jobs"]
+    selector = {"owner_id": owner_id, "id": job_id}
+
+    async def on_progress(stats: ImportStats) -> None:
+        await jobs.update_one(selector, {"$set": {"status": "running", **asdict(stats)}})
+
+    try:
+        with open(path, "rb") as fileobj:
+            stats = await import_ics_stream(session, owner_id, fileobj, chunk_size=chunk_size, on_progress=on_progress)
+        update = {"status": "done" if stats.total else "failed", **asdict(stats)}
+        if not stats.total:
+            update["error"] = "Aucun événement importé"
+    except InvalidIcsError as exc:
+        update = {"status": "failed", "error": str(exc)}
+    except Exception:
+        logger.exception("ICS import job %s failed", job_id)
+        update = {"status": "failed", "error": "Import interrompu"}
+    finally:
+        os.unlink(path)
+    await jobs.update_one(selector, {"$set": {**update, "finished_at": datetime.now(timezone.utc)}})
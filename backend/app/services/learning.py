@@ -1,8 +1,11 @@
+from contextlib import aclosing
 from datetime import datetime, timedelta, timezone
-from typing import Iterable, Optional
+from typing import AsyncIterator, Iterable, Optional
 
 from ..config import Settings
+from .llm_cache import llm_response_cache, prompt_fingerprint
 from .llm_client import LLMClient
+from .prompt_budget import prompt_builder
 
 settings = Settings()
 llm_client = LLMClient(settings)
@@ -85,20 +88,21 @@ def sm2_update(interval: int, ease: float, streak: int, score: int) -> tuple[int
     return interval, ease, streak + 1
 
 
-async def pedagogic_assist(
+def _assist_fallback(subject: str, topic: Optional[str], mode: str, difficulty: str, items: int) -> str:
+    return (
+        f"Assistant non configuré (clé LLM manquante). Mode={mode}, sujet={subject}, "
+        f"topic={topic or 'n/a'}, items={items}, difficulty={difficulty}."
+    )
+
+
+def _assist_messages(
     subject: str,
     topic: Optional[str],
     content: Optional[str],
     mode: str,
     difficulty: str,
     items: int,
-) -> str:
-    if not settings.openai_api_key:
-        return (
-            f"Assistant non configuré (clé LLM manquante). Mode={mode}, sujet={subject}, "
-            f"topic={topic or 'n/a'}, items={items}, difficulty={difficulty}."
-        )
-
+) -> list[dict[str, str]]:
     prompt_map = {
         "resume": "Résume le cours de façon structurée en puces.",
         "explication": "Explique le concept de manière claire et concise en français.",
@@ -114,12 +118,68 @@ async def pedagogic_assist(
     if content:
         base += f"\nContexte:\n{content}"
 
-    messages = [
-        {"role": "system", "content": "Tu es un tuteur pédagogique concis. Réponds en français."},
-        {"role": "user", "content": base},
-    ]
+    # Un contexte trop long est coupé à la fin pour tenir dans le budget de tokens.
+    return prompt_builder.build("assist", "Tu es un tuteur pédagogique concis. Réponds en français.", base).messages
 
-    try:
+
+async def pedagogic_assist(
+    subject: str,
+    topic: Optional[str],
+    content: Optional[str],
+    mode: str,
+    difficulty: str,
+    items: int,
+    session=None,
+) -> str:
+    """With a `session`, answers go through the shared LLM response cache."""
+    if not llm_client.providers():
+        return _assist_fallback(subject, topic, mode, difficulty, items)
+
+    messages = _assist_messages(subject, topic, content, mode, difficulty, items)
+
+    async def call() -> str:
         return await llm_client.chat(messages, max_tokens=400, allow_reasoning=False)
+
+    try:
+        if session is None:
+            return await call()
+        fingerprint = prompt_fingerprint(settings, messages, max_tokens=400)
+        return await llm_response_cache.get_or_call(session, fingerprint, call)
     except Exception as exc:  # pragma: no cover - safety net
         return f"Impossible de générer l'aide pédagogique: {exc}"
+
+
+async def stream_pedagogic_assist(
+    subject: str,
+    topic: Optional[str],
+    content: Optional[str],
+    mode: str,
+    difficulty: str,
+    items: int,
+    session=None,
+) -> AsyncIterator[str]:
+    """Variante de `pedagogic_assist` qui produit la réponse fragment par fragment.
+
+    Une réponse en cache est envoyée d'un bloc ; une réponse complète est mise en cache.
+    """
+    if not llm_client.providers():
+        yield _assist_fallback(subject, topic, mode, difficulty, items)
+        return
+
+    messages = _assist_messages(subject, topic, content, mode, difficulty, items)
+    fingerprint = prompt_fingerprint(settings, messages, max_tokens=400)
+    try:
+        if session is not None:
+            cached = await llm_response_cache.get(session, fingerprint)
+            if cached is not None:
+                yield cached
+                return
+        parts: list[str] = []
+        async with aclosing(llm_client.stream_chat(messages, max_tokens=400)) as deltas:
+            async for delta in deltas:
+                parts.append(delta)
+                yield delta
+        if session is not None and parts:
+            await llm_response_cache.put(session, fingerprint, "".join(parts).strip())
+    except Exception as exc:
+        yield f"Impossible de générer l'aide pédagogique: {exc}"
@@ -0,0 +1,126 @@
+"""Two-tier cache of LLM answers for deterministic prompts.
+
+Answers are keyed by a fingerprint of the full request: the ordered list of
+providers and models that may answer it (`LLMClient.providers()`),
+`max_tokens` and the messages. Lookups try an in-process LRU first, then the
+`llm_cache` collection shared by every worker, whose documents carry an
+`expires_at` date removed by a TTL index. A Mongo hit is promoted to memory.
+
+Caching is opt-in per call site: only answers that do not depend on the user
+(e.g. `pedagogic_assist`) should go through it. Failed calls, empty answers
+and the "empty response" placeholder are not cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Mapping, Optional, Sequence
+
+from ..config import Settings
+from .llm_client import EMPTY_REPLY_PREFIX, LLMClient
+
+LLM_CACHE_COLLECTION = "llm_cache"
+
+
+def prompt_fingerprint(settings: Settings, messages: Sequence[Mapping[str, str]], **params: Any) -> str:
+    canonical = json.dumps(
+        {
+            # Any of them may answer (fallback, hedging): changing the chain changes the key.
+            "providers": [[p.api_base, p.model] for p in LLMClient(settings).providers()],
+            "messages": [{"role": m.get("role"), "content": (m.get("content") or "").strip()} for m in messages],
+            **params,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def cacheable(text: str) -> bool:
+    return bool(text.strip()) and not text.startswith(EMPTY_REPLY_PREFIX)
+
+
+@dataclass
+class LLMCacheStats:
+    memory_hits: int = 0
+    mongo_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+
+
+class LLMResponseCache:
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 7 * 24 * 3600) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = LLMCacheStats()
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    async def get(self, session, fingerprint: str) -> Optional[str]:
+        cached = self._memory.get(fingerprint)
+        if cached is not None:
+            if cached[1] > time.monotonic():
+                self._memory.move_to_end(fingerprint)
+                self.stats.memory_hits += 1
+                return cached[0]
+            del self._memory[fingerprint]
+
+        now = datetime.now(timezone.utc)
+        doc = await session[LLM_CACHE_COLLECTION].find_one({"_id": fingerprint, "expires_at": {"$gt": now}})
+        if doc is None:
+            self.stats.misses += 1
+            return None
+        self.stats.mongo_hits += 1
+        expires_at = doc["expires_at"].replace(tzinfo=timezone.utc)
+        self._remember(fingerprint, doc["text"], (expires_at - now).total_seconds())
+        return doc["text"]
+
+    async def put(self, session, fingerprint: str, text: str) -> None:
+        if not cacheable(text):
+            return
+        now = datetime.now(timezone.utc)
+        await session[LLM_CACHE_COLLECTION].update_one(
+            {"_id": fingerprint},
+            {"$set": {"text": text, "created_at": now, "expires_at": now + timedelta(seconds=self.ttl_seconds)}},
+            upsert=True,
+        )
+        self._remember(fingerprint, text, self.ttl_seconds)
+        self.stats.stores += 1
+
+    async def get_or_call(self, session, fingerprint: str, call: Callable[[], Awaitable[str]]) -> str:
+        cached = await self.get(session, fingerprint)
+        if cached is not None:
+            return cached
+        text = await call()
+        await self.put(session, fingerprint, text)
+        return text
+
+    def clear_memory(self) -> None:
+        self._memory.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        hits = self.stats.memory_hits + self.stats.mongo_hits
+        total = hits + self.stats.misses
+        return {
+            **asdict(self.stats),
+            "hit_ratio": round(hits / total, 3) if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _remember(self, fingerprint: str, text: str, ttl_seconds: float) -> None:
+        self._memory[fingerprint] = (text, time.monotonic() + ttl_seconds)
+        self._memory.move_to_end(fingerprint)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+_settings = Settings()
+llm_response_cache = LLMResponseCache(
+    max_entries=_settings.llm_cache_memory_entries,
+    ttl_seconds=_settings.llm_cache_ttl_seconds,
+)
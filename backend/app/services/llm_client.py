@@ -1,10 +1,63 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Mapping, Optional
+import json
+import logging
+import math
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional
 
 import httpx
 
-from app.config import Settings
+from app.config import LLMProviderConfig, Settings
+from app.services.llm_governor import LLMGovernor, llm_governor
+from app.services.llm_hedging import first_success, provider_latencies
+from app.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+# Début du texte renvoyé quand le fournisseur répond sans contenu exploitable.
+EMPTY_REPLY_PREFIX = "LLM réponse vide"
+
+# Client HTTP partagé (pool de connexions keep-alive), ouvert et fermé par le
+# lifespan de l'application. Hors lifespan (scripts, tests unitaires), chaque
+# appel retombe sur un client éphémère.
+_shared_client: Optional[httpx.AsyncClient] = None
+
+# Appels identiques simultanés (même URL, même payload) : une seule requête amont.
+llm_flights = SingleFlight()
+
+
+def build_http_client(settings: Settings, *, timeout: float = 15.0) -> httpx.AsyncClient:
+    http2 = settings.llm_http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("LLM_HTTP2 activé mais le paquet h2 est absent : repli sur HTTP/1.1")
+            http2 = False
+    return httpx.AsyncClient(
+        timeout=timeout,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry_seconds,
+        ),
+    )
+
+
+async def open_shared_client(settings: Optional[Settings] = None) -> httpx.AsyncClient:
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = build_http_client(settings or Settings())
+    return _shared_client
+
+
+async def close_shared_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        client, _shared_client = _shared_client, None
+        await client.aclose()
 
 
 class LLMClient:
@@ -21,21 +74,40 @@ class LLMClient:
         settings: Optional[Settings] = None,
         *,
         timeout: float = 15.0,
+        http_client: Optional[httpx.AsyncClient] = None,
+        governor: Optional[LLMGovernor] = None,
     ) -> None:
         self.settings = settings or Settings()
         self.timeout = timeout
+        self._http_client = http_client
+        self.governor = governor or llm_governor
+
+    def providers(self) -> List[LLMProviderConfig]:
+        """Fournisseurs dans l'ordre : `llm_api_base` s'il a une clé, puis les replis."""
+        s = self.settings
+        primary = [LLMProviderConfig(api_base=s.llm_api_base, model=s.llm_model, api_key=s.openai_api_key)]
+        return (primary if s.openai_api_key else []) + list(s.llm_fallback_providers)
 
-    def _build_headers(self) -> Dict[str, str]:
+    @staticmethod
+    def _build_headers(provider: LLMProviderConfig) -> Dict[str, str]:
         headers: Dict[str, str] = {}
-        if self.settings.openai_api_key:
-            headers["Authorization"] = f"Bearer {self.settings.openai_api_key}"
+        if provider.api_key:
+            headers["Authorization"] = f"Bearer {provider.api_key}"
 
-        if "openrouter.ai" in self.settings.llm_api_base:
+        if "openrouter.ai" in provider.api_base:
             headers["HTTP-Referer"] = "http://localhost"
             headers["X-Title"] = "OVERSEER"
         return headers
 
-    async def chat(  # pragma: no cover - thin async wrapper
+    def _hedge_delay(self, provider: LLMProviderConfig) -> float:
+        s = self.settings
+        if not s.llm_hedging:
+            return math.inf
+        return provider_latencies.hedge_delay(
+            provider.label, s.llm_hedge_percentile, s.llm_hedge_min_samples, s.llm_hedge_default_delay_seconds
+        )
+
+    async def chat(
         self,
         messages: List[Mapping[str, str]],
         *,
@@ -46,28 +118,139 @@ class LLMClient:
 
         Cette méthode ne connaît pas la sémantique métier des prompts,
         elle délègue simplement à l'API et renvoie le contenu texte.
+        Des appels identiques simultanés partagent une seule requête, soumise
+        au gouverneur (concurrence globale, reprises, disjoncteur). Avec
+        plusieurs fournisseurs, le suivant est sollicité en parallèle si le
+        précédent dépasse sa latence habituelle, ou aussitôt s'il échoue.
+        """
+
+        providers = self.providers()
+        if not providers:
+            raise RuntimeError("LLM non configuré (clé API manquante)")
+
+        body: Dict[str, Any] = {"messages": list(messages), "max_tokens": max_tokens}
+        key = (
+            tuple((p.api_base, p.model) for p in providers),
+            json.dumps(body, sort_keys=True, ensure_ascii=False),
+            allow_reasoning,
+        )
+        attempts = [
+            lambda sending, p=p: self.governor.call(
+                lambda: self._timed_post_chat(p, body, allow_reasoning, sending), provider=p.label
+            )
+            for p in providers
+        ]
+        return await llm_flights.do(
+            key,
+            lambda: first_success(attempts, lambda i: self._hedge_delay(providers[i]), provider_latencies.stats),
+        )
+
+    async def _timed_post_chat(
+        self,
+        provider: LLMProviderConfig,
+        body: Dict[str, Any],
+        allow_reasoning: bool,
+        sending: Callable[[bool], None],
+    ) -> str:
+        # Appelé une fois la place obtenue auprès du gouverneur : l'attente
+        # en file et les pauses entre reprises ne déclenchent pas de requête parallèle.
+        sending(True)
+        try:
+            return await self._post_chat(provider, body, allow_reasoning)
+        finally:
+            sending(False)
+
+    async def _post_chat(self, provider: LLMProviderConfig, body: Dict[str, Any], allow_reasoning: bool) -> str:
+        url = f"{provider.api_base}/chat/completions"
+        headers = self._build_headers(provider)
+        payload = {"model": provider.model, **body}
+        client = self._http_client or _shared_client
+        started = time.perf_counter()
+        if client is not None:
+            response = await client.post(url, headers=headers, json=payload, timeout=self.timeout)
+        else:
+            async with httpx.AsyncClient(timeout=self.timeout) as ephemeral:
+                response = await ephemeral.post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        provider_latencies.observe(provider.label, time.perf_counter() - started)
+        data = response.json()
+        return self._extract_choice_text(data, allow_reasoning=allow_reasoning)
+
+    async def stream_chat(
+        self,
+        messages: List[Mapping[str, str]],
+        *,
+        max_tokens: int = 512,
+    ) -> AsyncIterator[str]:
+        """Appel `/chat/completions` avec `stream=true` : produit les fragments de texte.
+
+        Fermer le générateur (client parti, annulation) ferme la réponse en
+        cours et rend la connexion au pool. Seul l'établissement du flux est
+        repris en cas d'échec, jamais un flux déjà entamé ; s'il échoue, le
+        fournisseur suivant prend le relais (pas de requête parallèle).
         """
 
-        if not self.settings.openai_api_key:
+        providers = self.providers()
+        if not providers:
             raise RuntimeError("LLM non configuré (clé API manquante)")
 
-        payload: Dict[str, Any] = {
-            "model": self.settings.llm_model,
-            "messages": list(messages),
-            "max_tokens": max_tokens,
-        }
+        body: Dict[str, Any] = {"messages": list(messages), "max_tokens": max_tokens, "stream": True}
+        client = self._http_client or _shared_client
+        if client is not None:
+            async with aclosing(self._fallback_stream(client, providers, body)) as deltas:
+                async for delta in deltas:
+                    yield delta
+            return
+        async with httpx.AsyncClient(timeout=self.timeout) as ephemeral:
+            async with aclosing(self._fallback_stream(ephemeral, providers, body)) as deltas:
+                async for delta in deltas:
+                    yield delta
 
-        headers = self._build_headers()
+    async def _fallback_stream(
+        self,
+        client: httpx.AsyncClient,
+        providers: List[LLMProviderConfig],
+        body: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        for index, provider in enumerate(providers):
+            url = f"{provider.api_base}/chat/completions"
+            headers = self._build_headers(provider)
+            payload = {"model": provider.model, **body}
+            started = False
+            try:
+                stream = self.governor.stream(
+                    lambda: self._stream_deltas(client, url, headers, payload), provider=provider.label
+                )
+                async with aclosing(stream) as deltas:
+                    async for delta in deltas:
+                        started = True
+                        yield delta
+                return
+            except Exception as exc:
+                if started or index == len(providers) - 1:
+                    raise
+                logger.warning("Flux LLM indisponible chez %s (%s) : repli", provider.label, exc)
+                provider_latencies.stats.fallbacks += 1
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.settings.llm_api_base}/chat/completions",
-                headers=headers,
-                json=payload,
-            )
+    async def _stream_deltas(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+    ) -> AsyncIterator[str]:
+        async with client.stream("POST", url, headers=headers, json=payload, timeout=self.timeout) as response:
             response.raise_for_status()
-            data = response.json()
-            return self._extract_choice_text(data, allow_reasoning=allow_reasoning)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choice = (json.loads(data).get("choices") or [{}])[0]
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    yield delta
 
     @staticmethod
     def _extract_choice_text(data: Mapping[str, Any], *, allow_reasoning: bool = True) -> str:
@@ -105,4 +288,4 @@ class LLMClient:
                 if joined:
                     return joined
 
-        return f"LLM réponse vide: {data}"
+        return f"{EMPTY_REPLY_PREFIX}: {data}"
@@ -0,0 +1,342 @@
+"""Admission control and failure handling around LLM calls.
+
+- a per-user token bucket, checked when a request is admitted (429 upstream
+  of any work, see `deps.enforce_llm_quota`);
+- a global cap on concurrent upstream requests, with queue depth and wait
+  time metrics;
+- retries of throttled (429), unavailable (5xx) and transport failures with
+  exponential backoff and full jitter, honouring `Retry-After` (a call asked
+  to wait longer than `retry_max_delay` gives up instead of retrying early);
+- a circuit breaker per provider that fails fast for `breaker_cooldown`
+  seconds after `breaker_threshold` consecutive outages (5xx, transport
+  errors), then lets one trial call through. Client errors (4xx) come from
+  the request, not the provider, and never open it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Optional, TypeVar
+from weakref import WeakKeyDictionary
+
+import httpx
+
+from ..config import Settings
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMRateLimitError(RuntimeError):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Trop de requêtes LLM, réessayez plus tard")
+        self.retry_after = retry_after
+
+
+class LLMUnavailableError(RuntimeError):
+    pass
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """`Retry-After` as seconds (delta-seconds or HTTP-date), None if absent or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_hint(exc: BaseException) -> tuple[bool, Optional[float]]:
+    """`(retryable, Retry-After seconds)` for a failed attempt."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        if status in RETRYABLE_STATUSES:
+            return True, parse_retry_after(exc.response.headers.get("retry-after"))
+        return False, None
+    return isinstance(exc, httpx.TransportError), None
+
+
+def is_outage(exc: BaseException) -> bool:
+    """Provider-side failure (5xx, network), as opposed to a rejected request."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float, now: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume one token: 0 on success, else seconds until one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float, clock: Callable[[], float]) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self._clock() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.threshold:
+            if self.opened_at is None or self.trial_in_flight:
+                self.opens += 1
+            self.opened_at = self._clock()
+        self.trial_in_flight = False
+
+
+@dataclass
+class GovernorStats:
+    admitted: int = 0
+    rate_limited: int = 0
+    attempts: int = 0
+    retries: int = 0
+    failures: int = 0
+    short_circuited: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    in_flight: int = 0
+    waits: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class LLMGovernor:
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 8,
+        user_rate_per_minute: float = 20.0,
+        user_burst: int = 5,
+        max_retries: int = 2,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 8.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30.0,
+        max_users: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep,
+        jitter: Callable[[], float] = random.random,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.user_rate = user_rate_per_minute / 60.0
+        self.user_burst = user_burst
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_users = max_users
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self.stats = GovernorStats()
+        self._clock = clock
+        self._sleep = sleep
+        self._jitter = jitter
+        self._semaphores: WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = WeakKeyDictionary()
+        self._buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LLMGovernor":
+        return cls(
+            max_concurrency=settings.llm_max_concurrency,
+            user_rate_per_minute=settings.llm_user_rate_per_minute,
+            user_burst=settings.llm_user_burst,
+            max_retries=settings.llm_max_retries,
+            retry_base_delay=settings.llm_retry_base_delay_seconds,
+            retry_max_delay=settings.llm_retry_max_delay_seconds,
+            breaker_threshold=settings.llm_breaker_threshold,
+            breaker_cooldown=settings.llm_breaker_cooldown_seconds,
+        )
+
+    def admit(self, user_id: Hashable) -> None:
+        """Take one token from the user's bucket or raise `LLMRateLimitError`."""
+        now = self._clock()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.user_burst, self.user_rate, now)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(user_id)
+        wait = bucket.take(now)
+        if wait > 0:
+            self.stats.rate_limited += 1
+            raise LLMRateLimitError(wait)
+        self.stats.admitted += 1
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One per event loop, created inside it: the module-level governor is
+        # built at import time and may serve several loops (tests, reloads).
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the `max_concurrency` upstream slots."""
+        semaphore = self._semaphore()
+        started = self._clock()
+        self.stats.queue_depth += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.stats.queue_depth -= 1
+        waited = self._clock() - started
+        self.stats.waits += 1
+        self.stats.total_wait_seconds += waited
+        self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, waited)
+        self.stats.in_flight += 1
+        try:
+            yield
+        finally:
+            self.stats.in_flight -= 1
+            semaphore.release()
+
+    def retry_delay(self, retry: int, retry_after: Optional[float]) -> float:
+        """Full jitter over an exponential backoff; never earlier than `Retry-After`."""
+        backoff = min(self.retry_max_delay, self.retry_base_delay * 2**retry) * self._jitter()
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+    def breaker(self, provider: str = "default") -> CircuitBreaker:
+        breaker = self._breakers.get(provider)
+        if breaker is None:
+            breaker = self._breakers[provider] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown, self._clock)
+        return breaker
+
+    async def call(self, attempt: Callable[[], Awaitable[T]], provider: str = "default") -> T:
+        """Run `attempt` under the provider's breaker, the concurrency cap and the retry policy."""
+        breaker = self.breaker(provider)
+        retry = 0
+        while True:
+            self._check_breaker(breaker)
+            try:
+                async with self.slot():
+                    result = await attempt()
+            except Exception as exc:
+                delay = self._after_failure(breaker, exc, retry)
+                if delay is None:
+                    raise
+                await self._sleep(delay)
+                retry += 1
+                continue
+            except BaseException:
+                breaker.trial_in_flight = False
+                raise
+            breaker.record_success()
+            return result
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[T]], provider: str = "default") -> AsyncIterator[T]:
+        """Same policy for a streamed response, holding a slot until it ends.
+
+        Only failures before the first item are retried: once something has
+        been yielded, replaying the stream would duplicate it.
+        """
+        breaker = self.breaker(provider)
+        retry = 0
+        while True:
+            self._check_breaker(breaker)
+            started = False
+            try:
+                async with self.slot():
+                    async with aclosing(open_stream()) as items:
+                        async for item in items:
+                            started = True
+                            yield item
+            except Exception as exc:
+                delay = self._after_failure(breaker, exc, self.max_retries if started else retry)
+                if delay is None:
+                    raise
+                await self._sleep(delay)
+                retry += 1
+                continue
+            except BaseException:
+                breaker.trial_in_flight = False
+                raise
+            breaker.record_success()
+            return
+
+    def _check_breaker(self, breaker: CircuitBreaker) -> None:
+        if not breaker.allow():
+            self.stats.short_circuited += 1
+            raise LLMUnavailableError("LLM indisponible (circuit ouvert), réessayez plus tard")
+        self.stats.attempts += 1
+
+    def _after_failure(self, breaker: CircuitBreaker, exc: Exception, retry: int) -> Optional[float]:
+        """Record a failed attempt; the delay before the next one, None to give up."""
+        retryable, retry_after = retry_hint(exc)
+        # A provider that answers 4xx (throttling included) is up: only outages open the circuit.
+        if is_outage(exc):
+            breaker.record_failure()
+        else:
+            breaker.trial_in_flight = False
+        too_long = retry_after is not None and retry_after > self.retry_max_delay
+        if not retryable or too_long or retry >= self.max_retries:
+            self.stats.failures += 1
+            return None
+        self.stats.retries += 1
+        return self.retry_delay(retry, retry_after)
+
+    def snapshot(self) -> dict[str, Any]:
+        stats = asdict(self.stats)
+        stats["avg_wait_seconds"] = round(self.stats.total_wait_seconds / self.stats.waits, 4) if self.stats.waits else 0.0
+        stats["breakers"] = {name: {"state": b.state, "opens": b.opens} for name, b in self._breakers.items()}
+        return stats
+
+
+llm_governor = LLMGovernor.from_settings(Settings())
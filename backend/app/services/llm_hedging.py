@@ -0,0 +1,177 @@
+"""Hedged requests across an ordered list of LLM providers.
+
+The first provider is called alone. If it has not answered once its usual
+latency (a percentile of its own histogram) has elapsed, the next provider is
+called too; if it fails, the next one is called at once. The first success
+wins and the requests still running are cancelled.
+
+Only time spent on an upstream request counts towards the hedge delay: an
+attempt waiting for a concurrency slot or sleeping before a retry reports it
+is idle, and its timer restarts with its next request.
+
+Latencies are kept per provider in log-spaced histograms whose counts are
+halved when they fill up, so the percentiles follow recent behaviour.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import math
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# 10 ms .. ~2 min, 10 % apart.
+_BOUNDS = [0.01 * 1.1**i for i in range(100)]
+
+
+class LatencyHistogram:
+    def __init__(self, max_count: int = 2048) -> None:
+        self.max_count = max_count
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        if self.count > self.max_count:
+            self.counts = [c // 2 for c in self.counts]
+            self.count = sum(self.counts)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the `q` quantile, None when empty."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return _BOUNDS[i] if i < len(_BOUNDS) else math.inf
+        return math.inf
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            **{f"p{int(q * 100)}": _round(self.percentile(q)) for q in (0.5, 0.95, 0.99)},
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None or math.isinf(value) else round(value, 3)
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedges: int = 0
+    fallbacks: int = 0
+    wins_by_backup: int = 0
+    cancelled: int = 0
+
+
+class ProviderLatencies:
+    def __init__(self) -> None:
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.stats = HedgeStats()
+
+    def histogram(self, provider: str) -> LatencyHistogram:
+        histogram = self.histograms.get(provider)
+        if histogram is None:
+            histogram = self.histograms[provider] = LatencyHistogram()
+        return histogram
+
+    def observe(self, provider: str, seconds: float) -> None:
+        self.histogram(provider).observe(seconds)
+
+    def hedge_delay(self, provider: str, q: float, min_samples: int, default: float) -> float:
+        histogram = self.histogram(provider)
+        if histogram.count < min_samples:
+            return default
+        return histogram.percentile(q)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            **asdict(self.stats),
+            "providers": {name: h.snapshot() for name, h in self.histograms.items()},
+        }
+
+
+async def first_success(
+    attempts: Sequence[Callable[[Callable[[bool], None]], Awaitable[T]]],
+    hedge_delay: Callable[[int], float],
+    stats: HedgeStats,
+) -> T:
+    """Run `attempts` in order, starting the next one when the last started
+    has had a request in flight for `hedge_delay(index)` seconds or has
+    failed. Returns the first result; raises the last error when every
+    attempt failed.
+
+    Each attempt is called with `sending(active)`, to call with True when a
+    request leaves and False when it is over; the hedge timer only runs in
+    between.
+    """
+    stats.calls += 1
+    loop = asyncio.get_running_loop()
+    pending: dict[asyncio.Future, int] = {}
+    sent_at: list[Optional[float]] = []
+    wakeup = asyncio.Event()
+    started = 0
+    error: Optional[BaseException] = None
+
+    def start_next() -> None:
+        nonlocal started
+        index = started
+
+        def sending(active: bool) -> None:
+            sent_at[index] = loop.time() if active else None
+            wakeup.set()
+
+        sent_at.append(None)
+        pending[asyncio.ensure_future(attempts[index](sending))] = index
+        started += 1
+
+    start_next()
+    try:
+        while pending:
+            timeout = None
+            since = sent_at[started - 1]
+            if started < len(attempts) and since is not None:
+                delay = hedge_delay(started - 1)
+                timeout = None if math.isinf(delay) else max(0.0, since + delay - loop.time())
+            wakeup.clear()
+            waiter = asyncio.ensure_future(wakeup.wait())
+            try:
+                done, _ = await asyncio.wait([*pending, waiter], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+            done.discard(waiter)
+            if not done:
+                if not wakeup.is_set():
+                    stats.hedges += 1
+                    start_next()
+                continue
+            for task in done:
+                index = pending.pop(task)
+                if task.exception() is None:
+                    if index > 0:
+                        stats.wins_by_backup += 1
+                    return task.result()
+                error = task.exception()
+            if started < len(attempts):
+                stats.fallbacks += 1
+                start_next()
+        assert error is not None
+        raise error
+    finally:
+        for task in pending:
+            if not task.done():
+                task.cancel()
+                stats.cancelled += 1
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+provider_latencies = ProviderLatencies()
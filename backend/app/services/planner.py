@@ -0,0 +1,261 @@
+"""Deterministic day/week scheduler for open tasks.
+
+Open tasks are packed greedily into the free time left by fixed events
+(`services.availability`), walking the window chronologically. At each
+position the best *ready* task is taken from a heap: a task is ready once all
+its open dependencies have been fully placed. Heap keys are, in order:
+deadline inside the window (or overdue), priority, deadline, `order_index`
+and id, so a run is O((n + b) log n) for n tasks and b placed blocks.
+
+`energy` (0-10) is matched to the time of day: demanding tasks (energy >= 6)
+have their own heap and win ties on priority during the first half of each
+working day, light tasks win them afterwards. Tasks longer than
+`session_duration_minutes` are split into several blocks separated by at
+least `SESSION_BREAK` (other tasks may fill the gap), and no more than
+`daily_load_limit_hours` of blocks are planned per day.
+"""
+
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable, Optional, Sequence
+
+from ..utils import naive_utc
+from .availability import Interval, load_busy_intervals, merge_intervals, subtract_intervals, working_intervals
+
+PRIORITY_RANK = {"haute": 0, "normale": 1, "basse": 2}
+DONE_STATUSES = ("terminee",)
+DEMANDING_ENERGY = 6
+DEFAULT_SESSION = timedelta(minutes=60)
+MIN_BLOCK = timedelta(minutes=15)
+SESSION_BREAK = timedelta(minutes=15)
+
+TASK_FIELDS = {
+    "_id": 0,
+    **dict.fromkeys(
+        ("id", "title", "status", "priority", "deadline", "duration_minutes", "category", "energy", "dependencies", "order_index"),
+        1,
+    ),
+}
+
+_NO_DEADLINE = datetime.max
+
+
+@dataclass
+class PlannedBlock:
+    task_id: int
+    title: str
+    start: datetime
+    end: datetime
+    category: Optional[str] = None
+    late: bool = False
+
+
+@dataclass
+class PlanResult:
+    blocks: list[PlannedBlock] = field(default_factory=list)
+    unplaced: list[int] = field(default_factory=list)
+    blocked: list[int] = field(default_factory=list)
+
+    @property
+    def late(self) -> list[int]:
+        return sorted({b.task_id for b in self.blocks if b.late})
+
+
+@dataclass
+class _Task:
+    id: int
+    title: str
+    category: Optional[str]
+    deadline: Optional[datetime]
+    remaining: timedelta
+    demanding: bool
+    key: tuple[Any, ...]
+    waiting_on: int = 0
+    dependents: list[int] = field(default_factory=list)
+
+
+def _task_duration(task: dict[str, Any], session: timedelta) -> timedelta:
+    minutes = task.get("duration_minutes")
+    return timedelta(minutes=minutes) if minutes and minutes > 0 else session
+
+
+def _prepare(
+    tasks: Iterable[dict[str, Any]],
+    horizon: datetime,
+    session: timedelta,
+) -> dict[int, _Task]:
+    prepared: dict[int, _Task] = {}
+    raw_dependencies: dict[int, list[int]] = {}
+    for task in tasks:
+        if task.get("status") in DONE_STATUSES:
+            continue
+        deadline = naive_utc(task["deadline"]) if task.get("deadline") else None
+        urgent = deadline is not None and deadline <= horizon
+        order_index = task.get("order_index")
+        key = (
+            not urgent,
+            PRIORITY_RANK.get(task.get("priority") or "normale", 1),
+            deadline or _NO_DEADLINE,
+            order_index if order_index is not None else float("inf"),
+            task["id"],
+        )
+        prepared[task["id"]] = _Task(
+            id=task["id"],
+            title=task.get("title") or "",
+            category=task.get("category"),
+            deadline=deadline,
+            remaining=_task_duration(task, session),
+            demanding=(task.get("energy") or 0) >= DEMANDING_ENERGY,
+            key=key,
+        )
+        raw_dependencies[task["id"]] = task.get("dependencies") or []
+
+    # Dependencies on finished, deleted or foreign tasks are already satisfied.
+    for task_id, dependencies in raw_dependencies.items():
+        for dep_id in set(dependencies):
+            if dep_id in prepared and dep_id != task_id:
+                prepared[dep_id].dependents.append(task_id)
+                prepared[task_id].waiting_on += 1
+    return prepared
+
+
+def _peak_ends(working: Sequence[Interval]) -> dict[date, datetime]:
+    """Middle of each working day: demanding tasks are preferred before it."""
+    bounds: dict[date, tuple[datetime, datetime]] = {}
+    for start, end in working:
+        day = start.date()
+        first, last = bounds.get(day, (start, end))
+        bounds[day] = (min(first, start), max(last, end))
+    return {day: first + (last - first) / 2 for day, (first, last) in bounds.items()}
+
+
+class _ReadyQueue:
+    """Two heaps of ready tasks (demanding / light) sharing the same keys.
+
+    Split tasks rest in a third heap, ordered by the end of their break, until
+    `release` moves them back.
+    """
+
+    def __init__(self) -> None:
+        self._heaps: dict[bool, list[tuple[tuple[Any, ...], int]]] = {True: [], False: []}
+        self._resting: list[tuple[datetime, tuple[Any, ...], int, bool]] = []
+
+    def push(self, task: _Task) -> None:
+        heapq.heappush(self._heaps[task.demanding], (task.key, task.id))
+
+    def heapify(self, tasks: Iterable[_Task]) -> None:
+        for task in tasks:
+            self._heaps[task.demanding].append((task.key, task.id))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    def rest(self, task: _Task, until: datetime) -> None:
+        heapq.heappush(self._resting, (until, task.key, task.id, task.demanding))
+
+    def release(self, now: datetime) -> None:
+        while self._resting and self._resting[0][0] <= now:
+            _, key, task_id, demanding = heapq.heappop(self._resting)
+            heapq.heappush(self._heaps[demanding], (key, task_id))
+
+    @property
+    def next_release(self) -> Optional[datetime]:
+        return self._resting[0][0] if self._resting else None
+
+    def __bool__(self) -> bool:
+        return bool(self._heaps[True] or self._heaps[False])
+
+    def pop(self, peak: bool) -> int:
+        preferred, other = self._heaps[peak], self._heaps[not peak]
+        if not other or (preferred and preferred[0][0][:2] <= other[0][0][:2]):
+            return heapq.heappop(preferred)[1]
+        return heapq.heappop(other)[1]
+
+
+def plan_tasks(
+    tasks: Iterable[dict[str, Any]],
+    working: Sequence[Interval],
+    busy: Iterable[Interval] = (),
+    *,
+    session_duration: Optional[timedelta] = None,
+    daily_limit: Optional[timedelta] = None,
+) -> PlanResult:
+    """Place open `tasks` in `working` intervals minus `busy` ones (all naive UTC)."""
+    session = session_duration if session_duration and session_duration > timedelta(0) else DEFAULT_SESSION
+    working = merge_intervals(working)
+    free = subtract_intervals(working, merge_intervals(busy))
+    horizon = working[-1][1] if working else datetime.min
+    prepared = _prepare(tasks, horizon, session)
+    peak_ends = _peak_ends(working)
+
+    ready = _ReadyQueue()
+    ready.heapify(t for t in prepared.values() if t.waiting_on == 0)
+    result = PlanResult()
+    load: dict[date, timedelta] = {}
+
+    for start, end in free:
+        cursor = start
+        while (ready or ready.next_release) and end - cursor >= MIN_BLOCK:
+            ready.release(cursor)
+            if not ready:
+                # Only split tasks on their break are left: wait for the first one.
+                cursor = ready.next_release
+                continue
+            day = cursor.date()
+            day_left = daily_limit - load.get(day, timedelta(0)) if daily_limit is not None else end - cursor
+            if day_left < MIN_BLOCK:
+                break
+            task = prepared[ready.pop(cursor < peak_ends.get(day, cursor))]
+            length = min(task.remaining, session, end - cursor, day_left)
+            block_end = cursor + length
+            result.blocks.append(
+                PlannedBlock(
+                    task_id=task.id,
+                    title=task.title,
+                    start=cursor,
+                    end=block_end,
+                    category=task.category,
+                    late=task.deadline is not None and block_end > task.deadline,
+                )
+            )
+            task.remaining -= length
+            load[day] = load.get(day, timedelta(0)) + length
+            cursor = block_end
+            if task.remaining > timedelta(0):
+                ready.rest(task, block_end + SESSION_BREAK)
+                continue
+            for dependent_id in task.dependents:
+                dependent = prepared[dependent_id]
+                dependent.waiting_on -= 1
+                if dependent.waiting_on == 0:
+                    ready.push(dependent)
+
+    for task in sorted(prepared.values(), key=lambda t: t.key):
+        if task.waiting_on:
+            result.blocked.append(task.id)
+        elif task.remaining > timedelta(0):
+            result.unplaced.append(task.id)
+    return result
+
+
+async def build_plan(session, owner_id: int, window_start: datetime, window_end: datetime) -> PlanResult:
+    """Load open tasks, preferences and fixed events of the window, then plan."""
+    window_start, window_end = naive_utc(window_start), naive_utc(window_end)
+    prefs = await session["user_preferences"].find_one({"owner_id": owner_id}) or {}
+    tasks = await session["tasks"].find(
+        {"owner_id": owner_id, "status": {"$nin": list(DONE_STATUSES)}},
+        TASK_FIELDS,
+    ).to_list(None)
+    busy = await load_busy_intervals(session, owner_id, window_start, window_end)
+    working = working_intervals(window_start, window_end, prefs.get("productive_hours"), prefs.get("days_off"))
+    limit_hours = prefs.get("daily_load_limit_hours")
+    session_minutes = prefs.get("session_duration_minutes")
+    return plan_tasks(
+        tasks,
+        working,
+        busy,
+        session_duration=timedelta(minutes=session_minutes) if session_minutes else None,
+        daily_limit=timedelta(hours=limit_hours) if limit_hours else None,
+    )
@@ -0,0 +1,247 @@
+"""Token-budgeted prompt assembly.
+
+Tokens are estimated locally, without the provider's tokenizer: a run of
+letters costs one token per 4 characters (rounded up), a group of up to 3
+digits or a punctuation mark costs one, and every message adds a fixed
+overhead. This is close to BPE tokenizers on French and English text and
+errs on the high side for short words. Counts are cached per message text,
+keyed by a 16-byte digest so that the cache stays small whatever it is fed.
+
+`PromptBuilder.build` fills the budget by priority:
+
+1. the system prompt and the current message, always sent (the message is
+   cut if it alone would overflow, but never to nothing);
+2. the conversation summary, cut to what is left;
+3. retrieved snippets, best first, within their own sub-budget;
+4. recent turns, newest first, until the budget is full.
+
+Every prompt built is logged with its size and counted in `snapshot()`. A
+prompt can only exceed its budget when the system prompt leaves no room for
+the message: it is then sent as is, logged as a warning and counted in
+`over_budget`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+from ..config import Settings
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+MESSAGE_OVERHEAD = 4
+PROMPT_OVERHEAD = 3
+# Below this, a turn that does not fit is dropped rather than cut.
+MIN_PARTIAL_TOKENS = 64
+ELLIPSIS = " […]"
+
+_PIECE = re.compile(r"[^\W\d_]+|\d{1,3}|\S")
+
+
+def estimate_tokens(text: str) -> int:
+    return sum((len(p) + 3) // 4 if p[0].isalpha() else 1 for p in _PIECE.findall(text))
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` that fits in `max_tokens`, marked with an ellipsis when cut."""
+    if max_tokens <= 0:
+        return ""
+    limit = max_tokens - estimate_tokens(ELLIPSIS)
+    used = 0
+    for match in _PIECE.finditer(text):
+        piece = match.group()
+        used += (len(piece) + 3) // 4 if piece[0].isalpha() else 1
+        if used > limit:
+            head = text[: match.start()].rstrip()
+            return head + ELLIPSIS if head else ""
+    return text
+
+
+class TokenCounter:
+    """`estimate_tokens` with a bounded LRU cache keyed by a digest of the message text."""
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str) -> int:
+        # Texts come from users (messages, summaries, snippets): never keep them alive.
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        tokens = self._counts.get(key)
+        if tokens is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return tokens
+        self.misses += 1
+        tokens = self._counts[key] = estimate_tokens(text)
+        if len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return tokens
+
+    def message(self, message: Mapping[str, str]) -> int:
+        return self.count(message["content"]) + MESSAGE_OVERHEAD
+
+    @property
+    def entries(self) -> int:
+        return len(self._counts)
+
+
+@dataclass
+class Prompt:
+    messages: list[dict[str, str]]
+    tokens: int
+    budget: int
+    dropped: int = 0
+    truncated: bool = False
+
+
+@dataclass
+class PromptStats:
+    prompts: int = 0
+    tokens: int = 0
+    max_tokens: int = 0
+    last_tokens: int = 0
+    truncated: int = 0
+    dropped: int = 0
+    over_budget: int = 0
+
+
+class PromptBuilder:
+    def __init__(self, max_tokens: int, counter: Optional[TokenCounter] = None) -> None:
+        self.max_tokens = max_tokens
+        self.counter = counter or TokenCounter()
+        self.stats: dict[str, PromptStats] = {}
+
+    def build(
+        self,
+        purpose: str,
+        system: str,
+        message: Optional[str] = None,
+        *,
+        summary: str = "",
+        retrieved: Sequence[str] = (),
+        retrieved_header: str = "",
+        retrieved_budget: Optional[int] = None,
+        history: Sequence[Mapping[str, str]] = (),
+        budget: Optional[int] = None,
+    ) -> Prompt:
+        """Messages in order system, summary, retrieved, history, message.
+
+        `summary` and `retrieved_header` are sent as written (a summary is
+        cut at the end if needed); `retrieved` lines are joined under the
+        header.
+        """
+        budget = self.max_tokens if budget is None else budget
+        count, overhead = self.counter.count, MESSAGE_OVERHEAD
+        dropped, truncated = 0, False
+
+        system_msg = {"role": "system", "content": system}
+        left = budget - PROMPT_OVERHEAD - self.counter.message(system_msg)
+        user_msg = None
+        if message is not None:
+            content = message
+            if count(content) + overhead > left:
+                cut = truncate(content, left - overhead)
+                if cut:
+                    content, truncated = cut, True
+            user_msg = {"role": "user", "content": content}
+            left -= count(content) + overhead
+
+        summary_msg = None
+        if summary:
+            content = summary
+            if count(content) + overhead > left:
+                content = truncate(content, left - overhead)
+                truncated = truncated or bool(content)
+            if content:
+                summary_msg = {"role": "system", "content": content}
+                left -= count(content) + overhead
+            else:
+                dropped += 1
+
+        retrieved_msg = None
+        if retrieved:
+            room = left if retrieved_budget is None else min(left, retrieved_budget)
+            used = count(retrieved_header) + overhead
+            lines = []
+            for line in retrieved:
+                cost = count(line) + 1  # newline
+                if used + cost > room:
+                    break
+                lines.append(line)
+                used += cost
+            dropped += len(retrieved) - len(lines)
+            if lines:
+                retrieved_msg = {"role": "system", "content": "\n".join([retrieved_header, *lines]).lstrip("\n")}
+                left -= count(retrieved_msg["content"]) + overhead
+
+        turns: list[dict[str, str]] = []
+        for turn in reversed(history):
+            turn = {"role": turn.get("role", "user"), "content": turn.get("content", "")}
+            cost = count(turn["content"]) + overhead
+            if cost > left:
+                if left - overhead >= MIN_PARTIAL_TOKENS:
+                    turn["content"], truncated = truncate(turn["content"], left - overhead), True
+                    turns.append(turn)
+                    left -= count(turn["content"]) + overhead
+                break
+            turns.append(turn)
+            left -= cost
+        dropped += len(history) - len(turns)
+        turns.reverse()
+
+        messages = [system_msg]
+        messages += [m for m in (summary_msg, retrieved_msg) if m is not None]
+        messages += turns
+        if user_msg is not None:
+            messages.append(user_msg)
+        prompt = Prompt(messages, budget - left, budget, dropped, truncated)
+        self._record(purpose, prompt)
+        return prompt
+
+    def _record(self, purpose: str, prompt: Prompt) -> None:
+        stats = self.stats.setdefault(purpose, PromptStats())
+        stats.prompts += 1
+        stats.tokens += prompt.tokens
+        stats.max_tokens = max(stats.max_tokens, prompt.tokens)
+        stats.last_tokens = prompt.tokens
+        stats.truncated += prompt.truncated
+        stats.dropped += prompt.dropped
+        logger.info(
+            "Prompt %s : %d tokens estimés / %d (%d message(s), %d élément(s) écarté(s)%s)",
+            purpose,
+            prompt.tokens,
+            prompt.budget,
+            len(prompt.messages),
+            prompt.dropped,
+            ", tronqué" if prompt.truncated else "",
+        )
+        if prompt.tokens > prompt.budget:
+            stats.over_budget += 1
+            logger.warning(
+                "Prompt %s : %d tokens estimés, au-delà du budget de %d (prompt système trop long)",
+                purpose,
+                prompt.tokens,
+                prompt.budget,
+            )
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "budget": self.max_tokens,
+            "token_cache": {"entries": self.counter.entries, "hits": self.counter.hits, "misses": self.counter.misses},
+            "purposes": {
+                name: {**asdict(s), "avg_tokens": round(s.tokens / s.prompts, 1) if s.prompts else 0}
+                for name, s in self.stats.items()
+            },
+        }
+
+
+prompt_builder = PromptBuilder(settings.llm_prompt_max_tokens)
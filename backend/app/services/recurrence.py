@@ -0,0 +1,302 @@
+"""Lazy expansion of recurring events.
+
+A recurring event is stored once (`recurrence`, `recurrence_interval`,
+`recurrence_until`, `recurrence_custom`) and expanded on read, only inside
+the requested window: the first candidate occurrence is computed
+arithmetically, so a five-year daily series costs O(window) per query and
+not O(series). Occurrences can be cancelled (`recurrence_exceptions`) or
+modified (`recurrence_overrides`, matched on their original start).
+
+Parsed series are cached per `(owner_id, event id, version)`; `version` is
+bumped on every update so a modified event is never served stale.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Iterator, Optional
+
+from ..mongo_helpers import strip_mongo_id
+from ..repositories.events import EventRepository
+from ..utils import naive_utc
+
+RECURRENCE_FREQUENCIES = ("daily", "weekly", "monthly", "yearly", "custom")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+OVERRIDE_FIELDS = ("title", "start", "end", "description", "note", "location", "color", "important", "category")
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str  # daily | weekly | monthly | yearly
+    interval: int = 1
+    until: Optional[datetime] = None
+    count: Optional[int] = None
+    byday: tuple[int, ...] = ()
+
+
+def _parse_until(value: str) -> Optional[datetime]:
+    value = value.strip().rstrip("Z")
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_custom_rule(text: str) -> Optional[RecurrenceRule]:
+    """Parse the RRULE subset accepted in `recurrence_custom`.
+
+    Supported parts: FREQ, INTERVAL, COUNT, UNTIL and BYDAY (weekly only,
+    without ordinal prefixes). Anything else makes the rule invalid.
+    """
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    parts: dict[str, str] = {}
+    for chunk in filter(None, text.split(";")):
+        key, _, value = chunk.partition("=")
+        parts[key.strip().upper()] = value.strip().upper()
+
+    freq = parts.get("FREQ", "").lower()
+    if freq not in ("daily", "weekly", "monthly", "yearly"):
+        return None
+    try:
+        interval = max(1, int(parts.get("INTERVAL", "1")))
+        count = int(parts["COUNT"]) if "COUNT" in parts else None
+        byday = tuple(sorted({WEEKDAYS[d] for d in parts["BYDAY"].split(",")})) if "BYDAY" in parts else ()
+    except (KeyError, ValueError):
+        return None
+    until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+    return RecurrenceRule(freq=freq, interval=interval, until=until, count=count, byday=byday if freq == "weekly" else ())
+
+
+def parse_rule(event: dict[str, Any]) -> Optional[RecurrenceRule]:
+    freq = event.get("recurrence")
+    if not freq:
+        return None
+    if freq == "custom":
+        rule = parse_custom_rule(event.get("recurrence_custom") or "")
+    elif freq in RECURRENCE_FREQUENCIES:
+        rule = RecurrenceRule(freq=freq, interval=max(1, event.get("recurrence_interval") or 1))
+    else:
+        return None
+    until = event.get("recurrence_until")
+    if rule is not None and until is not None:
+        until = naive_utc(until)
+        if rule.until is None or until < rule.until:
+            rule = RecurrenceRule(rule.freq, rule.interval, until, rule.count, rule.byday)
+    return rule
+
+
+def _add_months(value: datetime, months: int) -> Optional[datetime]:
+    month_index = value.month - 1 + months
+    try:
+        return value.replace(year=value.year + month_index // 12, month=month_index % 12 + 1)
+    except ValueError:  # e.g. 31st of a 30-day month: no occurrence (RFC 5545)
+        return None
+
+
+def _candidates(rule: RecurrenceRule, dtstart: datetime, lower: datetime) -> Iterator[tuple[int, Optional[datetime]]]:
+    """Yield `(occurrence index, start)` from the first one that may end after `lower`.
+
+    Starting indices are computed arithmetically so that nothing before the
+    window is generated. A `None` start marks a skipped (invalid) date.
+    """
+    if rule.freq in ("daily", "weekly") and not rule.byday:
+        period = timedelta(days=rule.interval * (7 if rule.freq == "weekly" else 1))
+        k = max(0, (lower - dtstart) // period)
+        while True:
+            yield k, dtstart + k * period
+            k += 1
+
+    if rule.freq == "weekly":
+        week = timedelta(days=7 * rule.interval)
+        anchor = dtstart - timedelta(days=dtstart.weekday())
+        first_week = len([d for d in rule.byday if d >= dtstart.weekday()])
+        j = max(0, (lower - anchor) // week)
+        n = 0 if j == 0 else first_week + (j - 1) * len(rule.byday)
+        while True:
+            for day in rule.byday:
+                occurrence = anchor + j * week + timedelta(days=day)
+                if occurrence < dtstart:
+                    continue
+                yield n, occurrence
+                n += 1
+            j += 1
+
+    step = rule.interval * (12 if rule.freq == "yearly" else 1)
+    months_to_lower = (lower.year - dtstart.year) * 12 + lower.month - dtstart.month
+    # Invalid dates are skipped without counting, so COUNT forbids jumping ahead.
+    can_jump = rule.count is None or dtstart.day <= 28
+    k = max(0, months_to_lower // step) if can_jump else 0
+    n = k
+    while True:
+        occurrence = _add_months(dtstart, k * step)
+        yield n, occurrence
+        if occurrence is not None:
+            n += 1
+        k += 1
+
+
+def iter_occurrence_starts(
+    rule: RecurrenceRule,
+    dtstart: datetime,
+    duration: timedelta,
+    window_start: datetime,
+    window_end: datetime,
+) -> Iterator[datetime]:
+    """Original starts of the occurrences overlapping `[window_start, window_end)`."""
+    for index, occurrence in _candidates(rule, dtstart, window_start - duration):
+        if rule.count is not None and index >= rule.count:
+            return
+        if occurrence is None:
+            continue
+        if occurrence >= window_end or (rule.until is not None and occurrence > rule.until):
+            return
+        if occurrence + duration > window_start or occurrence >= window_start:
+            yield occurrence
+
+
+def _overlaps(start: datetime, end: datetime, window_start: datetime, window_end: datetime) -> bool:
+    return start < window_end and (end > window_start or start >= window_start)
+
+
+class RecurrenceSeries:
+    """Parsed recurring event; remembers its last expanded windows."""
+
+    max_windows = 8
+
+    def __init__(self, event: dict[str, Any]) -> None:
+        self.event = event
+        self.rule = parse_rule(event)
+        self.start = naive_utc(event["start"])
+        self.duration = naive_utc(event["end"]) - self.start
+        self.exceptions = {naive_utc(d) for d in event.get("recurrence_exceptions") or []}
+        self.overrides = {
+            naive_utc(o["original_start"]): o for o in event.get("recurrence_overrides") or [] if o.get("original_start")
+        }
+        self._windows: OrderedDict[tuple[datetime, datetime], list[dict[str, Any]]] = OrderedDict()
+
+    def _occurrence(self, original_start: datetime) -> dict[str, Any]:
+        item = {
+            **self.event,
+            "start": original_start,
+            "end": original_start + self.duration,
+            "recurrence_id": original_start,
+            "is_override": False,
+        }
+        override = self.overrides.get(original_start)
+        if override:
+            item.update({k: override[k] for k in OVERRIDE_FIELDS if override.get(k) is not None})
+            item["start"], item["end"] = naive_utc(item["start"]), naive_utc(item["end"])
+            item["is_override"] = True
+        return item
+
+    def _expand(self, window_start: datetime, window_end: datetime) -> list[dict[str, Any]]:
+        if self.rule is None:
+            end = self.start + self.duration
+            return [self._occurrence(self.start)] if _overlaps(self.start, end, window_start, window_end) else []
+
+        items = [
+            self._occurrence(start)
+            for start in iter_occurrence_starts(self.rule, self.start, self.duration, window_start, window_end)
+            if start not in self.exceptions and start not in self.overrides
+        ]
+        # Overrides may move an occurrence into (or out of) the window.
+        for original_start in self.overrides:
+            if original_start in self.exceptions:
+                continue
+            item = self._occurrence(original_start)
+            if _overlaps(item["start"], item["end"], window_start, window_end):
+                items.append(item)
+        items.sort(key=lambda o: o["start"])
+        return items
+
+    def occurrences(self, window_start: datetime, window_end: datetime) -> list[dict[str, Any]]:
+        key = (naive_utc(window_start), naive_utc(window_end))
+        if key in self._windows:
+            self._windows.move_to_end(key)
+            return self._windows[key]
+        items = self._expand(*key)
+        self._windows[key] = items
+        if len(self._windows) > self.max_windows:
+            self._windows.popitem(last=False)
+        return items
+
+
+class SeriesCache:
+    """Bounded LRU of parsed series keyed by `(owner_id, id, version)`."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._items: OrderedDict[tuple[Any, ...], RecurrenceSeries] = OrderedDict()
+
+    def get(self, event: dict[str, Any]) -> RecurrenceSeries:
+        key = (event.get("owner_id"), event.get("id"), event.get("version"))
+        series = self._items.get(key)
+        if series is None:
+            series = RecurrenceSeries(event)
+            self._items[key] = series
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        else:
+            self._items.move_to_end(key)
+        return series
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+series_cache = SeriesCache()
+
+
+def expand_events(
+    events: Iterable[dict[str, Any]],
+    window_start: datetime,
+    window_end: datetime,
+    cache: SeriesCache = series_cache,
+) -> list[dict[str, Any]]:
+    """Occurrences of `events` overlapping the window, sorted by start."""
+    items: list[dict[str, Any]] = []
+    for event in events:
+        items.extend(cache.get(event).occurrences(window_start, window_end))
+    items.sort(key=lambda o: (o["start"], o.get("id") or 0))
+    return items
+
+
+async def load_occurrences(
+    session,
+    owner_id: int,
+    window_start: datetime,
+    window_end: datetime,
+    extra_filter: Optional[dict[str, Any]] = None,
+) -> list[dict[str, Any]]:
+    """Fetch the events touching the window from Mongo and expand them.
+
+    One-off events are selected with the bounded overlap filter of
+    `EventRepository`; recurring series are selected by their start and
+    `recurrence_until` and expanded in memory.
+    """
+    repo = EventRepository(session)
+    singles_query = {
+        "owner_id": owner_id,
+        "recurrence": {"$nin": list(RECURRENCE_FREQUENCIES)},
+        **(extra_filter or {}),
+        **(await repo.window_filter(owner_id, window_start, window_end) or {}),
+    }
+    series_query = {
+        "owner_id": owner_id,
+        "recurrence": {"$in": list(RECURRENCE_FREQUENCIES)},
+        **(extra_filter or {}),
+        "start": {"$lt": window_end},
+        "$or": [
+            {"recurrence_until": None},
+            {"recurrence_until": {"$gte": window_start - await repo.max_duration(owner_id)}},
+        ],
+    }
+    singles = await session["events"].find(singles_query).to_list(None)
+    series = await session["events"].find(series_query).to_list(None)
+    return expand_events([strip_mongo_id(e) for e in [*singles, *series]], window_start, window_end)
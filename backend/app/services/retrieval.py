@@ -0,0 +1,404 @@
+"""Per-user BM25 index over tasks, events, projects and study cards.
+
+Documents are tokenized locally (lowercase, accents folded, short words and
+stop words dropped) into an inverted index: term -> {doc: term frequency},
+and a query is scored term at a time with BM25 (k1 = 1.2, b = 0.75).
+
+Query terms are taken from the rarest. Their postings are scanned in full
+while the total stays within `SCAN_BUDGET`; beyond that, a term only
+contributes its champion list, the `CHAMPIONS` documents where it weighs
+most (high frequency, short text), and the best candidates are then
+rescored exactly on every query term. Results are exact when the query
+fits in the budget, and a query never reads more than about `SCAN_BUDGET`
+plus `CHAMPIONS` postings per term, whatever the size of the workspace
+(`python -m benchmarks.bench_retrieval`). Champion lists are built when a
+term becomes frequent and kept up to date by `upsert`/`remove`.
+
+The BM25 weights a term contributes (IDF and length norms folded in) are
+cached per term, up to `WEIGHT_CACHE` postings, until the next write: a
+query then mostly merges cached weights, adding up only the documents that
+match several terms.
+
+Indexes are built from Mongo in the background, off the request path: a
+search on a workspace that is not indexed yet returns nothing and starts the
+build. They are kept in a bounded LRU, updated in place by the write
+handlers of this process (writes made during a build are replayed on the
+new index) and rebuilt in the background after `ttl_seconds`, the previous
+index serving meanwhile, so that writes made by other workers are
+eventually seen.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+CHAMPIONS = 256
+RESCORE = 16
+SCAN_BUDGET = 1024
+WEIGHT_CACHE = 32_768
+BUILD_CHUNK = 1000
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    """
+    au aux avec ce ces dans de des du elle en est et il je la le les leur lui ma mais me mes moi mon ne nos notre
+    nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous sont ete etre
+    avoir fait faire plus tout tous cette cet a an the of to in for on is are be and or with at by from it this that
+    """.split()
+)
+
+# Mongo projections: only the fields that are indexed or shown in snippets.
+SOURCES: dict[str, dict[str, int]] = {
+    "tasks": {"_id": 0, "id": 1, "title": 1, "description": 1, "status": 1, "priority": 1, "deadline": 1, "category": 1},
+    "events": {"_id": 0, "id": 1, "title": 1, "description": 1, "note": 1, "location": 1, "start": 1, "category": 1, "kind": 1},
+    "projects": {"_id": 0, "id": 1, "name": 1, "description": 1, "objectives": 1, "subgoals": 1, "due_date": 1, "progress": 1},
+    "study_cards": {"_id": 0, "id": 1, "front": 1, "back": 1, "due_at": 1},
+}
+
+
+def tokenize(text: str) -> list[str]:
+    folded = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    return [w for w in _WORD.findall(folded) if len(w) > 1 and w not in STOP_WORDS]
+
+
+def _date(value: Any) -> str:
+    return value.strftime("%Y-%m-%d") if hasattr(value, "strftime") else ""
+
+
+def describe(collection: str, doc: dict[str, Any]) -> tuple[str, str]:
+    """`(indexed text, one-line snippet)` for a document of `collection`."""
+    if collection == "tasks":
+        details = ", ".join(
+            p for p in (doc.get("status"), doc.get("priority"), f"échéance {_date(doc['deadline'])}" if doc.get("deadline") else "") if p
+        )
+        snippet = f"Tâche #{doc['id']} « {doc.get('title', '')} »" + (f" ({details})" if details else "")
+        text = " ".join(filter(None, (doc.get("title"), doc.get("description"), doc.get("category"))))
+    elif collection == "events":
+        snippet = f"Événement #{doc['id']} « {doc.get('title', '')} » le {_date(doc.get('start'))}"
+        if doc.get("location"):
+            snippet += f" à {doc['location']}"
+        text = " ".join(
+            filter(None, (doc.get("title"), doc.get("description"), doc.get("note"), doc.get("location"), doc.get("category")))
+        )
+    elif collection == "projects":
+        snippet = f"Projet #{doc['id']} « {doc.get('name', '')} » ({round(doc.get('progress') or 0)} %)"
+        if doc.get("due_date"):
+            snippet += f", échéance {_date(doc['due_date'])}"
+        text = " ".join(
+            filter(None, (doc.get("name"), doc.get("description"), *(doc.get("objectives") or []), *(doc.get("subgoals") or [])))
+        )
+    else:
+        snippet = f"Fiche #{doc['id']} : {doc.get('front', '')} → {doc.get('back', '')}"
+        text = " ".join(filter(None, (doc.get("front"), doc.get("back"))))
+    return text, snippet
+
+
+def _best(scores: dict[int, float], m: int) -> list[int]:
+    """Keys of the `m` highest scores, and of any tied with the last one."""
+    if len(scores) <= m:
+        return list(scores)
+    floor = heapq.nlargest(m, scores.values())[-1]
+    return [slot for slot, score in scores.items() if score >= floor]
+
+
+@dataclass
+class Hit:
+    collection: str
+    id: int
+    score: float
+    snippet: str
+
+
+class BM25Index:
+    def __init__(self, champions: int = CHAMPIONS) -> None:
+        self.champions = champions
+        self._postings: dict[str, dict[int, int]] = {}
+        self._champions: dict[str, list[tuple[float, int]]] = {}  # ascending impact
+        self._lengths: dict[int, int] = {}
+        self._keys: dict[int, tuple[str, int]] = {}
+        self._snippets: dict[int, str] = {}
+        self._slots: dict[tuple[str, int], int] = {}
+        self._terms: dict[int, Counter] = {}
+        self._next_slot = 0
+        self._total_length = 0
+        self._impact_avgdl: Optional[float] = None
+        # term -> (version, full postings?, slot -> BM25 weight); stale once `_version` moves.
+        self._weights: OrderedDict[str, tuple[int, bool, dict[int, float]]] = OrderedDict()
+        self._cached = 0
+        self._version = 0
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def upsert(self, collection: str, doc: dict[str, Any]) -> None:
+        key = (collection, doc["id"])
+        self.remove(*key)
+        self._version += 1
+        text, snippet = describe(collection, doc)
+        terms = Counter(tokenize(text))
+        slot = self._next_slot
+        self._next_slot += 1
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._snippets[slot] = snippet
+        self._terms[slot] = terms
+        length = sum(terms.values())
+        self._lengths[slot] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            postings = self._postings.setdefault(term, {})
+            postings[slot] = tf
+            champions = self._champions.get(term)
+            if champions is None and len(postings) > self.champions:
+                # Built as soon as the term becomes frequent, then maintained in place.
+                self._champion_list(term, postings)
+            elif champions is not None:
+                impact = self._impact(tf, length)
+                if len(champions) < self.champions or impact > champions[0][0]:
+                    bisect.insort(champions, (impact, slot))
+                    if len(champions) > self.champions:
+                        del champions[0]
+
+    def upsert_many(self, collection: str, docs: Iterable[dict[str, Any]]) -> None:
+        for doc in docs:
+            self.upsert(collection, doc)
+
+    def remove(self, collection: str, doc_id: int) -> None:
+        slot = self._slots.pop((collection, doc_id), None)
+        if slot is None:
+            return
+        self._version += 1
+        length = self._lengths.pop(slot)
+        for term, tf in self._terms.pop(slot).items():
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+            champions = self._champions.get(term)
+            if champions is not None:
+                entry = (self._impact(tf, length), slot)
+                i = bisect.bisect_left(champions, entry)
+                if i < len(champions) and champions[i] == entry:
+                    del champions[i]
+                # Rebuilt on next use once it no longer covers enough documents.
+                if len(champions) < self.champions // 2:
+                    del self._champions[term]
+        self._total_length -= length
+        del self._keys[slot], self._snippets[slot]
+
+    def _impact(self, tf: int, length: int) -> float:
+        return tf / (tf + K1 * (1 - B + B * length / self._impact_avgdl))
+
+    def _champion_list(self, term: str, postings: dict[int, int]) -> list[tuple[float, int]]:
+        champions = self._champions.get(term)
+        if champions is None:
+            if self._impact_avgdl is None:
+                # Frozen so that stored impacts stay comparable; only the selection depends on it.
+                self._impact_avgdl = self._total_length / len(self._slots) or 1.0
+            lengths = self._lengths
+            champions = sorted(
+                heapq.nlargest(self.champions, ((self._impact(tf, lengths[slot]), slot) for slot, tf in postings.items()))
+            )
+            self._champions[term] = champions
+        return champions
+
+    def _term_weights(self, term: str, postings: dict[int, int], full: bool) -> dict[int, float]:
+        """BM25 weight of `term` per document: every posting, or its champions only."""
+        cached = self._weights.get(term)
+        if cached is not None and cached[0] == self._version and cached[1] == full:
+            self._weights.move_to_end(term)
+            return cached[2]
+        n = len(self._slots)
+        scale = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5)) * (K1 + 1)
+        if full:
+            base, per_length = K1 * (1 - B), K1 * B / (self._total_length / n or 1.0)
+            lengths = self._lengths
+            weights = {slot: scale * tf / (tf + base + per_length * lengths[slot]) for slot, tf in postings.items()}
+        else:
+            # Stored impacts are enough to pick candidates: they are rescored exactly.
+            weights = {slot: scale * impact for impact, slot in self._champion_list(term, postings)}
+        if cached is not None:
+            self._cached -= len(self._weights.pop(term)[2])
+        self._weights[term] = (self._version, full, weights)
+        self._cached += len(weights)
+        while self._cached > WEIGHT_CACHE:
+            self._cached -= len(self._weights.popitem(last=False)[1][2])
+        return weights
+
+    def search(self, query: str, k: int = 5) -> list[Hit]:
+        if not self._slots or k <= 0:
+            return []
+        terms = [(term, postings) for term in set(tokenize(query)) if (postings := self._postings.get(term))]
+
+        scores: dict[int, float] = {}
+        scanned: dict[str, dict[int, float]] = {}
+        budget = SCAN_BUDGET
+        for term, postings in sorted(terms, key=lambda t: len(t[1])):
+            full = len(postings) <= max(budget, self.champions)
+            weights = self._term_weights(term, postings, full)
+            if full:
+                budget -= len(postings)
+                scanned[term] = weights
+            if not scores:
+                scores = dict(weights)  # cached weights are shared: never updated in place
+                continue
+            # Documents matching several terms are few: add those up, copy the rest.
+            both = {slot: scores[slot] + weights[slot] for slot in scores.keys() & weights.keys()}
+            scores.update(weights)
+            scores.update(both)
+
+        if len(scanned) < len(terms):
+            # A document reached through one champion list may hold other query terms
+            # it was not credited for: rescore the best candidates exactly.
+            scores = self._rescore(_best(scores, RESCORE * k), terms, scanned)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [Hit(*self._keys[slot], round(score, 4), self._snippets[slot]) for slot, score in best]
+
+    def _rescore(
+        self, shortlist: list[int], terms: list[tuple[str, dict[int, int]]], scanned: dict[str, dict[int, float]]
+    ) -> dict[int, float]:
+        n = len(self._slots)
+        base, per_length = K1 * (1 - B), K1 * B / (self._total_length / n or 1.0)
+        lengths = self._lengths
+        scores = dict.fromkeys(shortlist, 0.0)
+        for term, postings in terms:
+            weights = scanned.get(term)
+            if weights is not None:
+                for slot in weights.keys() & scores.keys():
+                    scores[slot] += weights[slot]
+                continue
+            scale = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5)) * (K1 + 1)
+            for slot in postings.keys() & scores.keys():
+                tf = postings[slot]
+                scores[slot] += scale * tf / (tf + base + per_length * lengths[slot])
+        return scores
+
+
+class RetrievalIndex:
+    """Per-user BM25 indexes, bounded LRU keyed by `(database, owner_id)`."""
+
+    def __init__(self, max_users: int = 64, ttl_seconds: float = 600.0) -> None:
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._indexes: OrderedDict[tuple[str, int], BM25Index] = OrderedDict()
+        self._builds: dict[tuple[str, int], asyncio.Task] = {}
+        # Writes seen while a build runs, replayed on the new index: (collection, doc or None, doc id).
+        self._pending: dict[tuple[str, int], list[tuple[str, Optional[dict[str, Any]], int]]] = {}
+
+    @staticmethod
+    def _key(session, owner_id: int) -> tuple[str, int]:
+        return (getattr(session, "name", ""), owner_id)
+
+    def get(self, session, owner_id: int) -> Optional[BM25Index]:
+        """The current index, None until the first build is done; starts a build when missing or expired."""
+        key = self._key(session, owner_id)
+        index = self._indexes.get(key)
+        if index is None or time.monotonic() - index.built_at >= self.ttl_seconds:
+            self._build(session, owner_id)
+        if index is not None:
+            self._indexes.move_to_end(key)
+        return index
+
+    async def ready(self, session, owner_id: int) -> BM25Index:
+        """Wait for an up-to-date index, building it if needed."""
+        index = self.get(session, owner_id)
+        task = self._builds.get(self._key(session, owner_id))
+        if task is None:
+            return index
+        return await asyncio.shield(task)
+
+    def search(self, session, owner_id: int, query: str, k: int = 5) -> list[Hit]:
+        index = self.get(session, owner_id)
+        return index.search(query, k) if index is not None else []
+
+    def _build(self, session, owner_id: int) -> asyncio.Task:
+        key = self._key(session, owner_id)
+        task = self._builds.get(key)
+        if task is None:
+            task = self._builds[key] = asyncio.create_task(self._load(session, owner_id, key))
+            self._pending[key] = []
+            task.add_done_callback(partial(self._built, key))
+        return task
+
+    async def _load(self, session, owner_id: int, key: tuple[str, int]) -> BM25Index:
+        # Tokenizing runs in a worker thread, a chunk at a time, so the event loop stays responsive.
+        index = BM25Index()
+        for collection, projection in SOURCES.items():
+            chunk: list[dict[str, Any]] = []
+            async for doc in session[collection].find({"owner_id": owner_id}, projection):
+                chunk.append(doc)
+                if len(chunk) >= BUILD_CHUNK:
+                    await asyncio.to_thread(index.upsert_many, collection, chunk)
+                    chunk = []
+            if chunk:
+                await asyncio.to_thread(index.upsert_many, collection, chunk)
+        for collection, doc, doc_id in self._pending.pop(key, []):
+            if doc is None:
+                index.remove(collection, doc_id)
+            else:
+                index.upsert(collection, doc)
+        self._indexes[key] = index
+        self._indexes.move_to_end(key)
+        if len(self._indexes) > self.max_users:
+            self._indexes.popitem(last=False)
+        return index
+
+    def _built(self, key: tuple[str, int], task: asyncio.Task) -> None:
+        if self._builds.get(key) is not task:
+            return
+        del self._builds[key]
+        self._pending.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Retrieval index build failed for %s: %s", key, task.exception())
+
+    def _apply(self, session, owner_id: int, collection: str, doc: Optional[dict[str, Any]], doc_id: int) -> None:
+        key = self._key(session, owner_id)
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.append((collection, doc, doc_id))
+        index = self._indexes.get(key)
+        if index is not None:
+            if doc is None:
+                index.remove(collection, doc_id)
+            else:
+                index.upsert(collection, doc)
+
+    def record(self, session, owner_id: int, collection: str, doc: dict[str, Any]) -> None:
+        """Apply a created/updated document to the index, if built or being built (no-op otherwise)."""
+        self._apply(session, owner_id, collection, doc, doc["id"])
+
+    def record_many(self, session, owner_id: int, collection: str, docs: Iterable[dict[str, Any]]) -> None:
+        for doc in docs:
+            self._apply(session, owner_id, collection, doc, doc["id"])
+
+    def discard(self, session, owner_id: int, collection: str, doc_id: int) -> None:
+        self._apply(session, owner_id, collection, None, doc_id)
+
+    def invalidate(self, session, owner_id: int) -> None:
+        key = self._key(session, owner_id)
+        self._indexes.pop(key, None)
+        task = self._builds.pop(key, None)
+        if task is not None:
+            # Its snapshot may predate the writes that caused the invalidation.
+            task.cancel()
+        self._pending.pop(key, None)
+
+
+retrieval_index = RetrievalIndex()
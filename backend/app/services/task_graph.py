@@ -0,0 +1,318 @@
+"""Per-user task dependency graph.
+
+Edges go from a prerequisite to the task waiting on it: every id listed in
+`dependencies`, and every subtask of a parent (`parent_task_id`), since a
+parent cannot be finished before its subtasks. Ids of deleted or foreign
+tasks are ignored.
+
+The graph of a user is loaded once and kept in a bounded LRU. Writes from
+the tasks router update it in place: a status change only touches the
+unfinished-prerequisite counters of the task's successors (the unblocked
+set is maintained incrementally) and invalidates the critical path; an edge
+change also invalidates the topological order and cycle report, which are
+recomputed lazily (O(V + E)) on the next read. Graphs are rebuilt after
+`ttl_seconds` so that writes of other workers are eventually seen.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+DONE_STATUSES = ("terminee",)
+TASK_FIELDS = {"_id": 0, "id": 1, "title": 1, "status": 1, "duration_minutes": 1, "dependencies": 1, "parent_task_id": 1}
+
+
+@dataclass
+class _Node:
+    id: int
+    done: bool = False
+    minutes: int = 0
+    requires: set[int] = field(default_factory=set)  # declared prerequisites (may be dangling)
+    parent_id: Optional[int] = None
+
+
+@dataclass
+class GraphView:
+    order: list[int]
+    cycles: list[list[int]]
+    critical_path: list[int]
+    critical_path_minutes: int
+    unblocked: list[int]
+
+
+class TaskGraph:
+    def __init__(self) -> None:
+        self._nodes: dict[int, _Node] = {}
+        self._successors: dict[int, set[int]] = {}
+        self._predecessors: dict[int, set[int]] = {}
+        self._waiting: dict[int, int] = {}  # unfinished prerequisites per task
+        self._dangling: dict[int, set[int]] = {}  # unknown id -> tasks referencing it
+        self._unblocked: set[int] = set()
+        self._structure: Optional[tuple[list[int], list[list[int]]]] = None
+        self._critical: Optional[tuple[list[int], int]] = None
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @classmethod
+    def build(cls, tasks: list[dict[str, Any]]) -> "TaskGraph":
+        graph = cls()
+        for task in tasks:
+            node = _node_from(task)
+            graph._nodes[node.id] = node
+            graph._successors[node.id] = set()
+            graph._predecessors[node.id] = set()
+        for node in graph._nodes.values():
+            graph._connect(node)
+        for task_id in graph._nodes:
+            graph._refresh_waiting(task_id)
+        return graph
+
+    # -- incremental updates -------------------------------------------------
+
+    def upsert(self, task: dict[str, Any]) -> None:
+        new = _node_from(task)
+        old = self._nodes.get(new.id)
+        if old is not None and old.requires == new.requires and old.parent_id == new.parent_id:
+            old.minutes = new.minutes
+            self._critical = None
+            if old.done != new.done:
+                old.done = new.done
+                self._propagate_status(old.id)
+            return
+        self.remove(new.id)
+        self._nodes[new.id] = new
+        self._successors[new.id] = set()
+        self._predecessors[new.id] = set()
+        self._connect(new)
+        # Tasks stored earlier may already reference this id.
+        for referrer in self._dangling.pop(new.id, set()):
+            self._connect_to(self._nodes[referrer], new.id)
+        for task_id in {new.id, *self._successors[new.id], *self._predecessors[new.id]}:
+            self._refresh_waiting(task_id)
+        self._invalidate_structure()
+
+    def remove(self, task_id: int) -> None:
+        node = self._nodes.pop(task_id, None)
+        if node is None:
+            return
+        for reference in _references(node):
+            self._dangling.get(reference, set()).discard(task_id)
+        successors = self._successors.pop(task_id)
+        predecessors = self._predecessors.pop(task_id)
+        for neighbour in successors | predecessors:
+            self._successors[neighbour].discard(task_id)
+            self._predecessors[neighbour].discard(task_id)
+            if task_id in _references(self._nodes[neighbour]):
+                self._dangling.setdefault(task_id, set()).add(neighbour)
+        self._waiting.pop(task_id, None)
+        self._unblocked.discard(task_id)
+        for neighbour in successors | predecessors:
+            self._refresh_waiting(neighbour)
+        self._invalidate_structure()
+
+    def _connect(self, node: _Node) -> None:
+        for reference in _references(node):
+            if reference in self._nodes:
+                self._connect_to(node, reference)
+            else:
+                self._dangling.setdefault(reference, set()).add(node.id)
+
+    def _connect_to(self, node: _Node, other_id: int) -> None:
+        if other_id in node.requires:
+            self._link(other_id, node.id)
+        if node.parent_id == other_id:
+            self._link(node.id, other_id)
+
+    def _link(self, before: int, after: int) -> None:
+        self._successors[before].add(after)
+        self._predecessors[after].add(before)
+
+    def _refresh_waiting(self, task_id: int) -> None:
+        waiting = sum(1 for p in self._predecessors[task_id] if not self._nodes[p].done)
+        self._waiting[task_id] = waiting
+        if waiting == 0 and not self._nodes[task_id].done:
+            self._unblocked.add(task_id)
+        else:
+            self._unblocked.discard(task_id)
+
+    def _propagate_status(self, task_id: int) -> None:
+        node = self._nodes[task_id]
+        delta = -1 if node.done else 1
+        for successor in self._successors[task_id]:
+            self._waiting[successor] += delta
+            if self._waiting[successor] == 0 and not self._nodes[successor].done:
+                self._unblocked.add(successor)
+            else:
+                self._unblocked.discard(successor)
+        if node.done:
+            self._unblocked.discard(task_id)
+        elif self._waiting[task_id] == 0:
+            self._unblocked.add(task_id)
+        self._critical = None
+
+    def _invalidate_structure(self) -> None:
+        self._structure = None
+        self._critical = None
+
+    # -- derived views -------------------------------------------------------
+
+    def _topological(self) -> tuple[list[int], list[list[int]]]:
+        """Kahn's algorithm (smallest id first); leftovers are split into cycles."""
+        if self._structure is None:
+            indegree = {task_id: len(p) for task_id, p in self._predecessors.items()}
+            ready = [task_id for task_id, degree in indegree.items() if degree == 0]
+            heapq.heapify(ready)
+            order: list[int] = []
+            while ready:
+                task_id = heapq.heappop(ready)
+                order.append(task_id)
+                for successor in self._successors[task_id]:
+                    indegree[successor] -= 1
+                    if indegree[successor] == 0:
+                        heapq.heappush(ready, successor)
+            leftovers = {task_id for task_id, degree in indegree.items() if degree > 0}
+            self._structure = (order, self._cycles(leftovers))
+        return self._structure
+
+    def _cycles(self, candidates: set[int]) -> list[list[int]]:
+        """Strongly connected components of size > 1 (iterative Tarjan)."""
+        index: dict[int, int] = {}
+        low: dict[int, int] = {}
+        on_stack: set[int] = set()
+        stack: list[int] = []
+        components: list[list[int]] = []
+        for root in sorted(candidates):
+            if root in index:
+                continue
+            work = [(root, iter(sorted(self._successors[root] & candidates)))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                task_id, successors = work[-1]
+                advanced = False
+                for successor in successors:
+                    if successor not in index:
+                        index[successor] = low[successor] = len(index)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(sorted(self._successors[successor] & candidates))))
+                        advanced = True
+                        break
+                    if successor in on_stack:
+                        low[task_id] = min(low[task_id], index[successor])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[task_id])
+                if low[task_id] == index[task_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == task_id:
+                            break
+                    if len(component) > 1:
+                        components.append(sorted(component))
+        return sorted(components)
+
+    def _critical_path(self) -> tuple[list[int], int]:
+        """Longest chain of remaining work (finished tasks weigh 0) in the acyclic part."""
+        if self._critical is None:
+            order, _ = self._topological()
+            best: dict[int, int] = {}
+            previous: dict[int, Optional[int]] = {}
+            for task_id in order:
+                node = self._nodes[task_id]
+                weight = 0 if node.done else node.minutes
+                origin = max(self._predecessors[task_id], key=lambda p: (best[p], -p), default=None)
+                best[task_id] = weight + (best[origin] if origin is not None else 0)
+                previous[task_id] = origin
+            end = max(best, key=lambda t: (best[t], -t), default=None)
+            path: list[int] = []
+            while end is not None:
+                path.append(end)
+                end = previous[end]
+            path.reverse()
+            total = best[path[-1]] if path else 0
+            self._critical = ([t for t in path if not self._nodes[t].done], total)
+        return self._critical
+
+    def unblocked(self) -> list[int]:
+        return sorted(self._unblocked)
+
+    def view(self) -> GraphView:
+        order, cycles = self._topological()
+        path, minutes = self._critical_path()
+        return GraphView(order=order, cycles=cycles, critical_path=path, critical_path_minutes=minutes, unblocked=self.unblocked())
+
+
+def _references(node: _Node) -> set[int]:
+    """Ids this task points to (prerequisites and parent), self-references excluded."""
+    references = set(node.requires)
+    if node.parent_id is not None:
+        references.add(node.parent_id)
+    references.discard(node.id)
+    return references
+
+
+def _node_from(task: dict[str, Any]) -> _Node:
+    return _Node(
+        id=task["id"],
+        done=task.get("status") in DONE_STATUSES,
+        minutes=max(0, task.get("duration_minutes") or 0),
+        requires=set(task.get("dependencies") or []),
+        parent_id=task.get("parent_task_id"),
+    )
+
+
+class TaskGraphCache:
+    """Bounded LRU of task graphs keyed by `(database, owner_id)`."""
+
+    def __init__(self, max_users: int = 256, ttl_seconds: float = 300.0) -> None:
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self._graphs: OrderedDict[tuple[str, int], TaskGraph] = OrderedDict()
+
+    @staticmethod
+    def _key(session, owner_id: int) -> tuple[str, int]:
+        return (getattr(session, "name", ""), owner_id)
+
+    async def get(self, session, owner_id: int) -> TaskGraph:
+        key = self._key(session, owner_id)
+        graph = self._graphs.get(key)
+        if graph is not None and time.monotonic() - graph.built_at < self.ttl_seconds:
+            self._graphs.move_to_end(key)
+            return graph
+        tasks = await session["tasks"].find({"owner_id": owner_id}, TASK_FIELDS).to_list(None)
+        graph = TaskGraph.build(tasks)
+        self._graphs[key] = graph
+        self._graphs.move_to_end(key)
+        if len(self._graphs) > self.max_users:
+            self._graphs.popitem(last=False)
+        return graph
+
+    def record(self, session, owner_id: int, task: dict[str, Any]) -> None:
+        """Apply a created/updated task to an already built graph (no-op otherwise)."""
+        graph = self._graphs.get(self._key(session, owner_id))
+        if graph is not None:
+            graph.upsert(task)
+
+    def discard(self, session, owner_id: int, task_id: int) -> None:
+        graph = self._graphs.get(self._key(session, owner_id))
+        if graph is not None:
+            graph.remove(task_id)
+
+    def invalidate(self, session, owner_id: int) -> None:
+        self._graphs.pop(self._key(session, owner_id), None)
+
+
+task_graphs = TaskGraphCache()
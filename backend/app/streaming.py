@@ -0,0 +1,100 @@
+"""NDJSON streaming of list endpoints straight from Motor cursors.
+
+Clients opt in with `Accept: application/x-ndjson` or `?stream=1`. Documents
+are pulled from Mongo `batch_size` at a time and each batch is serialized and
+written before the next one is fetched, so peak memory per request is bounded
+by the batch size rather than by the size of the collection.
+
+LLM answers are relayed the same way as Server-Sent Events (`Accept:
+text/event-stream` or `?stream=1`): one `{"delta": ...}` message per text
+fragment, then a `done` event carrying the full text.
+"""
+
+from __future__ import annotations
+
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorCursor
+from pydantic import BaseModel
+
+from .mongo_helpers import strip_mongo_id
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+STREAM_BATCH_SIZE = 200
+
+
+def wants_stream(request: Request, stream: bool = False) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def wants_sse(request: Request, stream: bool = False) -> bool:
+    return stream or SSE_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def iter_ndjson(
+    cursor: AsyncIOMotorCursor,
+    serialize: Callable[[dict[str, Any]], str],
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    lines: list[str] = []
+    async for doc in cursor.batch_size(batch_size):
+        lines.append(serialize(doc))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def ndjson_response(
+    cursor: AsyncIOMotorCursor,
+    model: type[BaseModel],
+    batch_size: int = STREAM_BATCH_SIZE,
+    headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    """Stream one `model` JSON document per line for every document of `cursor`."""
+
+    def serialize(doc: dict[str, Any]) -> str:
+        return model(**strip_mongo_id(doc)).model_dump_json()
+
+    return StreamingResponse(iter_ndjson(cursor, serialize, batch_size), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+async def iter_sse(
+    deltas: AsyncIterator[str],
+    result_field: str,
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> AsyncIterator[bytes]:
+    """Relay `deltas` as SSE messages; `on_complete` only runs if the stream was not interrupted."""
+    parts: list[str] = []
+    async with aclosing(deltas):
+        async for delta in deltas:
+            parts.append(delta)
+            yield sse_event({"delta": delta})
+    text = "".join(parts).strip()
+    if on_complete is not None:
+        await on_complete(text)
+    yield sse_event({result_field: text}, event="done")
+
+
+def sse_response(
+    deltas: AsyncIterator[str],
+    result_field: str,
+    on_complete: Optional[Callable[[str], Awaitable[None]]] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> StreamingResponse:
+    return StreamingResponse(
+        iter_sse(deltas, result_field, on_complete),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})},
+    )
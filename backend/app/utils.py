@@ -1,6 +1,16 @@
+from datetime import datetime, timezone
+
+
 def build_command_repr(command: str, args: list[str] | None = None) -> str:
     base = (command or "").strip()
     extras = [a.strip() for a in (args or []) if a.strip()]
     if extras:
         return " ".join([base, *extras]).strip()
     return base
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Mongo stores naive UTC datetimes; align aware values on that convention."""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
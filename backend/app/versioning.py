@@ -0,0 +1,101 @@
+"""Per-user write-version counters and conditional GET helpers.
+
+Every write to a tracked collection bumps one counter document in
+`collection_versions` (`owner_id`, `collection`, `version`, `updated_at`)
+*after* the write succeeded. Read endpoints derive their ETag from those
+counters and from the query string, so an unchanged resource is answered
+with 304 after a single indexed lookup, without querying or serializing the
+collection itself.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response, status
+from pymongo import ReturnDocument
+
+VERSIONS_COLLECTION = "collection_versions"
+
+
+async def bump_version(session, owner_id: int, collection: str) -> int:
+    doc = await session[VERSIONS_COLLECTION].find_one_and_update(
+        {"owner_id": owner_id, "collection": collection},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+
+async def get_versions(session, owner_id: int, collections: Iterable[str]) -> dict[str, tuple[int, Optional[datetime]]]:
+    """`{collection: (version, updated_at)}`; `(0, None)` before the first tracked write."""
+    collections = list(collections)
+    versions = {name: (0, None) for name in collections}
+    cursor = session[VERSIONS_COLLECTION].find({"owner_id": owner_id, "collection": {"$in": collections}})
+    async for doc in cursor:
+        versions[doc["collection"]] = (doc.get("version", 0), doc.get("updated_at"))
+    return versions
+
+
+def make_etag(*parts: object) -> str:
+    return '"' + "-".join(str(p) for p in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of `If-None-Match` against `etag` (RFC 9110 §13.1.2)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+@dataclass
+class CacheValidator:
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    @property
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if self.last_modified is not None:
+            value = self.last_modified
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            headers["Last-Modified"] = format_datetime(value.astimezone(timezone.utc), usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        return etag_matches(request, self.etag)
+
+    def not_modified(self) -> Response:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=self.headers)
+
+    def apply(self, response: Response) -> None:
+        response.headers.update(self.headers)
+
+
+async def collection_validator(
+    request: Request,
+    session,
+    owner_id: int,
+    collections: Iterable[str],
+    *extra: object,
+) -> CacheValidator:
+    """Validator of a GET whose body only depends on `collections`, the query and `extra`."""
+    versions = await get_versions(session, owner_id, collections)
+    variant = "&".join(sorted(request.url.query.split("&"))) + "|" + request.headers.get("accept", "")
+    digest = hashlib.blake2b(variant.encode(), digest_size=6).hexdigest()
+    parts = [f"{name}.{version}" for name, (version, _) in sorted(versions.items())]
+    stamps = [updated for _, updated in versions.values() if updated is not None]
+    return CacheValidator(
+        etag=make_etag(owner_id, *parts, *extra, digest),
+        last_modified=max(stamps) if stamps else None,
+    )
@@ -0,0 +1,66 @@
+"""Free/busy benchmark on a synthetic agenda of 50k events.
+
+Events follow a realistic density: 2 to 8 per working day, inside working
+hours, none on weekends. At that pace 50k events span several decades, which
+is the window the sweep is timed on; most days keep free hours, so the slot
+search has real work to do.
+
+    cd backend && python -m benchmarks.bench_availability
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.services.availability import find_slots, free_intervals
+
+EVENTS = 50_000
+EVENTS_PER_DAY = (2, 8)
+DAY_START_MINUTES = 8 * 60
+DAY_END_MINUTES = 19 * 60
+
+
+def synthetic_busy(n: int, start: datetime, seed: int = 42) -> tuple[list[tuple[datetime, datetime]], int]:
+    """`n` events on weekdays between 08:00 and 19:00; returns them with the number of days covered."""
+    rng = random.Random(seed)
+    busy: list[tuple[datetime, datetime]] = []
+    day = 0
+    while len(busy) < n:
+        midnight = start + timedelta(days=day)
+        day += 1
+        if midnight.weekday() >= 5:
+            continue
+        for _ in range(min(rng.randint(*EVENTS_PER_DAY), n - len(busy))):
+            length = rng.choice([15, 30, 30, 60, 60, 90, 120])
+            offset = rng.randrange(DAY_START_MINUTES, DAY_END_MINUTES - length + 1, 15)
+            begin = midnight + timedelta(minutes=offset)
+            busy.append((begin, begin + timedelta(minutes=length)))
+    return busy, day
+
+
+def main() -> None:
+    start = datetime(2000, 1, 3)
+    busy, days = synthetic_busy(EVENTS, start)
+    end = start + timedelta(days=days)
+    prefs = [{"start": "08:00", "end": "12:00"}, {"start": "13:30", "end": "19:00"}]
+
+    runs = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        free = free_intervals(start, end, busy, prefs, ["samedi", "dimanche"])
+        slots = find_slots(free, timedelta(minutes=60))
+        runs.append(time.perf_counter() - t0)
+    working_days = sum(1 for d in range(days) if (start + timedelta(days=d)).weekday() < 5)
+    print(
+        f"{EVENTS} events / {days} days: {len(free)} free intervals, {len(slots)} slots >= 1h, "
+        f"best {min(runs) * 1000:.1f} ms, median {sorted(runs)[len(runs) // 2] * 1000:.1f} ms"
+    )
+    # A few meetings a day leave free hours on most working days.
+    if len(slots) < working_days:
+        raise SystemExit(f"only {len(slots)} slots for {working_days} working days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Latency of an unrelated endpoint while a storm of logins is being hashed.
+
+Each scenario sends LOGINS concurrent `POST /api/auth/login` through the ASGI
+app while a probe calls `GET /` back to back, and reports the probe's p50 and
+p99. `inline` verifies passwords on the event loop (the previous behaviour),
+`pool` uses the password hashing pool. Users live in a dict: only hashing and
+the event loop are measured, not Mongo.
+
+    cd backend && python -m benchmarks.bench_login_storm
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("MONGODB_URI", "mongodb://unused")
+
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+from app.deps import get_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.routers import auth  # noqa: E402
+from app.security import pwd_context  # noqa: E402
+
+LOGINS = 64
+USERS = 8
+BUDGET_P99_MS = 50
+
+
+class _Users:
+    def __init__(self, docs: list[dict]) -> None:
+        self._by_email = {doc["email"]: doc for doc in docs}
+
+    async def find_one(self, query: dict) -> dict | None:
+        return self._by_email.get(query["email"])
+
+    async def update_one(self, query: dict, update: dict) -> None:
+        pass
+
+
+async def _inline_verify_and_update(plain: str, hashed: str):
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+async def _scenario(client: AsyncClient, logins: int) -> list[float]:
+    storm_done = asyncio.Event()
+    latencies: list[float] = []
+
+    async def probe() -> None:
+        while not storm_done.is_set():
+            t0 = time.perf_counter()
+            (await client.get("/")).raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(0.001)
+
+    async def storm() -> None:
+        await asyncio.sleep(0.01)
+        responses = await asyncio.gather(
+            *(
+                client.post("/api/auth/login", data={"username": f"user{i % USERS}@example.com", "password": "secret123"})
+                for i in range(logins)
+            )
+        )
+        assert all(r.status_code == 200 for r in responses)
+        storm_done.set()
+
+    await asyncio.gather(probe(), storm())
+    return latencies
+
+
+async def main() -> None:
+    hashed = pwd_context.hash("secret123")
+    users = _Users([{"id": i, "email": f"user{i}@example.com", "hashed_password": hashed} for i in range(USERS)])
+
+    async def _get_db():
+        yield {"users": users}
+
+    app.dependency_overrides[get_db] = _get_db
+    pooled = auth.verify_and_update
+    results = {}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        for name, verifier in (("inline", _inline_verify_and_update), ("pool", pooled)):
+            auth.verify_and_update = verifier
+            results[name] = await _scenario(client, LOGINS)
+    auth.verify_and_update = pooled
+    app.dependency_overrides.pop(get_db)
+
+    for name, latencies in results.items():
+        print(
+            f"{name:>6}: {LOGINS} logins, {len(latencies)} probes of GET /, "
+            f"p50 {_percentile(latencies, 0.5):.1f} ms, p99 {_percentile(latencies, 0.99):.1f} ms, "
+            f"max {max(latencies) * 1000:.1f} ms"
+        )
+    print(f"budget: pool p99 <= {BUDGET_P99_MS} ms")
+    if _percentile(results["pool"], 0.99) > BUDGET_P99_MS:
+        raise SystemExit("over budget")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
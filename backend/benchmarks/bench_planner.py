@@ -0,0 +1,80 @@
+"""Scheduler benchmark: one week for a user with 5k open tasks.
+
+    cd backend && python -m benchmarks.bench_planner
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.services.availability import working_intervals
+from app.services.planner import plan_tasks
+
+TASKS = 5_000
+FIXED_EVENTS = 60
+WINDOW_DAYS = 7
+BUDGET_MS = 100
+
+
+def synthetic_tasks(n: int, start: datetime, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    tasks = []
+    for task_id in range(1, n + 1):
+        tasks.append(
+            {
+                "id": task_id,
+                "title": f"Tâche {task_id}",
+                "status": rng.choice(["a_faire", "a_faire", "en_cours"]),
+                "priority": rng.choice(["basse", "normale", "haute"]),
+                "deadline": start + timedelta(hours=rng.randrange(24 * 30)) if rng.random() < 0.6 else None,
+                "duration_minutes": rng.choice([None, 15, 30, 45, 60, 90, 180]),
+                "energy": rng.randrange(11),
+                # Chains and fan-ins on earlier tasks keep the graph acyclic.
+                "dependencies": rng.sample(range(1, task_id), k=min(task_id - 1, rng.choice([0, 0, 0, 1, 2]))),
+            }
+        )
+    return tasks
+
+
+def synthetic_busy(n: int, start: datetime, seed: int = 7) -> list[tuple[datetime, datetime]]:
+    rng = random.Random(seed)
+    busy = []
+    for _ in range(n):
+        begin = start + timedelta(days=rng.randrange(WINDOW_DAYS), hours=rng.randrange(8, 19))
+        busy.append((begin, begin + timedelta(minutes=rng.choice([30, 60, 120]))))
+    return busy
+
+
+def main() -> None:
+    start = datetime(2025, 1, 6)
+    end = start + timedelta(days=WINDOW_DAYS)
+    tasks = synthetic_tasks(TASKS, start)
+    busy = synthetic_busy(FIXED_EVENTS, start)
+    prefs = [{"start": "08:00", "end": "12:00"}, {"start": "13:30", "end": "19:00"}]
+
+    runs = []
+    for _ in range(7):
+        t0 = time.perf_counter()
+        working = working_intervals(start, end, prefs, ["dimanche"])
+        plan = plan_tasks(
+            tasks,
+            working,
+            busy,
+            session_duration=timedelta(minutes=90),
+            daily_limit=timedelta(hours=7),
+        )
+        runs.append(time.perf_counter() - t0)
+    median = sorted(runs)[len(runs) // 2] * 1000
+    print(
+        f"{TASKS} tasks / {WINDOW_DAYS} days: {len(plan.blocks)} blocks, {len(plan.unplaced)} unplaced, "
+        f"{len(plan.blocked)} blocked, best {min(runs) * 1000:.1f} ms, median {median:.1f} ms "
+        f"(budget {BUDGET_MS} ms)"
+    )
+    if median > BUDGET_MS:
+        raise SystemExit("over budget")
+
+
+if __name__ == "__main__":
+    main()
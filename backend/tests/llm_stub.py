@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+from app.config import Settings
+
+
+class StubLLMServer:
+    """Minimal HTTP/1.1 keep-alive server answering `/chat/completions`.
+
+    Plain requests get `ok <last message>` after `delay` seconds. `faults` is
+    consumed one entry per request: `(status, headers)` answers with that
+    error, `None` answers normally; once exhausted, `fail_with` (if set) is
+    returned for every request. Requests with `"stream": true` get `chunks` as
+    SSE deltas, `chunk_delay` seconds apart (forever when `endless`), then the
+    connection is closed.
+    """
+
+    def __init__(
+        self,
+        faults=(),
+        *,
+        fail_with=None,
+        delay: float = 0.0,
+        chunks=("ok",),
+        chunk_delay: float = 0.0,
+        endless: bool = False,
+    ) -> None:
+        self.faults = list(faults)
+        self.fail_with = fail_with
+        self.delay = delay
+        self.chunks = list(chunks)
+        self.chunk_delay = chunk_delay
+        self.endless = endless
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.sent = 0
+        self.payloads = []
+        self.disconnected = asyncio.Event()
+        self._server = None
+
+    async def __aenter__(self) -> "StubLLMServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def settings(self, **overrides) -> Settings:
+        return Settings(**{"openai_api_key": "test", "llm_api_base": self.base_url, **overrides})
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n")[1:]:
+                    name, _, value = line.partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                payload = json.loads(await reader.readexactly(length))
+                self.payloads.append(payload)
+                self.requests += 1
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                try:
+                    await asyncio.sleep(self.delay)
+                finally:
+                    self.active -= 1
+                fault = self.faults.pop(0) if self.faults else self.fail_with
+                if fault is None and payload.get("stream"):
+                    await self._stream(writer)
+                    return
+                if fault is None:
+                    status, headers = 200, {}
+                    body = {"choices": [{"message": {"content": f"ok {payload['messages'][-1]['content']}"}}]}
+                else:
+                    status, headers = fault
+                    body = {"error": "injected"}
+                raw = json.dumps(body).encode()
+                extra = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+                writer.write(
+                    f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n{extra}"
+                    f"Content-Length: {len(raw)}\r\n\r\n".encode()
+                    + raw
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+            self.disconnected.set()
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n")
+        index = 0
+        while self.endless or index < len(self.chunks):
+            chunk = {"choices": [{"delta": {"content": self.chunks[index % len(self.chunks)]}}]}
+            writer.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await writer.drain()
+            self.sent += 1
+            index += 1
+            await asyncio.sleep(self.chunk_delay)
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
@@ -0,0 +1,199 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.retrieval import retrieval_index
+
+
+async def auth_headers(client):
+    email = "planner@example.com"
+    password = "secret123"
+    await client.post("/api/auth/register", json={"email": email, "password": password})
+    res = await client.post("/api/auth/login", data={"username": email, "password": password})
+    res.raise_for_status()
+    token = res.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_plan_week_proposes_task_blocks_around_fixed_events(client, mongo_client):
+    headers = await auth_headers(client)
+    await client.put(
+        "/api/user/preferences",
+        json={"productive_hours": [{"start": "09:00", "end": "12:00"}], "session_duration_minutes": 60},
+        headers=headers,
+    )
+    first = (await client.post("/api/tasks/", json={"title": "Rédiger", "duration_minutes": 120}, headers=headers)).json()
+    second = (
+        await client.post(
+            "/api/tasks/",
+            json={"title": "Relire", "priority": "haute", "duration_minutes": 60, "dependencies": [first["id"]]},
+            headers=headers,
+        )
+    ).json()
+
+    day = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    await client.post(
+        "/api/events/",
+        json={"title": "Cours", "start": (day + timedelta(hours=9)).isoformat(), "end": (day + timedelta(hours=10)).isoformat()},
+        headers=headers,
+    )
+
+    res = await client.post("/api/agent/plan", json={"date": day.isoformat(), "mode": "week"}, headers=headers)
+    assert res.status_code == 200
+    body = res.json()
+    events = body["events"]
+    # "Rédiger" is split around a break (10:00-11:00, 11:15-12:00, then 15 minutes the next day).
+    assert [e["task_id"] for e in events] == [first["id"], first["id"], first["id"], second["id"]]
+    assert all(e["kind"] == "propose" for e in events)
+    assert events[0]["start"].startswith((day + timedelta(hours=10)).strftime("%Y-%m-%dT%H:%M"))
+
+    # Replanning replaces the previous proposals instead of stacking them.
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    owner_id = (await client.get("/api/auth/me", headers=headers)).json()["id"]
+    await retrieval_index.ready(db, owner_id)
+    res = await client.post("/api/agent/plan", json={"date": day.isoformat(), "mode": "week"}, headers=headers)
+    assert await db["events"].count_documents({"kind": "propose"}) == len(res.json()["events"]) == 4
+
+    # The built index follows the replacement without a rebuild.
+    hits = retrieval_index.search(db, owner_id, "Rédiger Relire", k=20)
+    assert {h.id for h in hits if h.collection == "events"} == {e["id"] for e in res.json()["events"]}
+
+
+@pytest.mark.asyncio
+async def test_chat_streams_server_sent_events_and_logs_the_reply(client, mongo_client):
+    headers = await auth_headers(client)
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    logs_before = await db["agent_logs"].count_documents({"action": "chat"})
+
+    res = await client.post(
+        "/api/agent/chat", json={"message": "Bonjour"}, headers={**headers, "Accept": "text/event-stream"}
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+    messages = [m for m in res.text.split("\n\n") if m]
+    assert messages[0].startswith("data: ")
+    assert messages[-1].startswith("event: done\ndata: ")
+    assert await db["agent_logs"].count_documents({"action": "chat"}) == logs_before + 1
+
+
+@pytest.mark.asyncio
+async def test_chat_is_rate_limited_per_user(client, mongo_client):
+    from app.services.llm_governor import llm_governor
+
+    email, password = "quota@example.com", "secret123"
+    await client.post("/api/auth/register", json={"email": email, "password": password})
+    res = await client.post("/api/auth/login", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+    statuses = [
+        (await client.post("/api/agent/chat", json={"message": "Bonjour"}, headers=headers)).status_code
+        for _ in range(llm_governor.user_burst + 1)
+    ]
+    assert statuses[:-1] == [200] * llm_governor.user_burst
+    assert statuses[-1] == 429
+    last = await client.post("/api/agent/chat", json={"message": "Bonjour"}, headers=headers)
+    assert int(last.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_conversation_summary_rolls_incrementally(client, mongo_client, monkeypatch):
+    from app.services import agent as agent_service
+    from app.services.llm_governor import llm_governor
+
+    prompts = []
+
+    class RecordingLLM:
+        def providers(self):
+            return ["stub"]
+
+        async def chat(self, messages, **kwargs):
+            prompts.append(messages)
+            if messages[-1]["content"].startswith("Résumé actuel"):
+                return f"résumé {len(prompts)}"
+            return f"réponse à {messages[-1]['content']}"
+
+    monkeypatch.setattr(agent_service, "llm_client", RecordingLLM())
+    monkeypatch.setattr(agent_service.settings, "agent_chat_window_messages", 2)
+    monkeypatch.setattr(llm_governor, "user_burst", 100)
+
+    email, password = "conversation@example.com", "secret123"
+    await client.post("/api/auth/register", json={"email": email, "password": password})
+    res = await client.post("/api/auth/login", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+    first = (await client.post("/api/agent/chat", json={"message": "m1"}, headers=headers)).json()
+    conversation_id = first["conversation_id"]
+    for i in range(2, 5):
+        await client.post("/api/agent/chat", json={"message": f"m{i}", "conversation_id": conversation_id}, headers=headers)
+
+    # Turn 4 saw 6 stored messages (> 2 windows): the 4 oldest were folded, the last 2 kept verbatim.
+    summary_prompt, chat_prompt = prompts[-2:]
+    assert "user: m1" in summary_prompt[-1]["content"] and "m3" not in summary_prompt[-1]["content"]
+    assert [m["content"] for m in chat_prompt[1:]] == ["Résumé de la conversation jusqu'ici : résumé 4", "m3", "réponse à m3", "m4"]
+
+    detail = (await client.get(f"/api/agent/conversations/{conversation_id}", headers=headers)).json()
+    assert (detail["summarized_through"], detail["last_seq"], len(detail["messages"])) == (4, 8, 8)
+
+    # Only the messages after the checkpoint are sent to refresh the summary.
+    summary = (
+        await client.post("/api/agent/chat-summary", json={"message": "", "conversation_id": conversation_id}, headers=headers)
+    ).json()["summary"]
+    assert summary == f"résumé {len(prompts)}"
+    refreshed = prompts[-1][-1]["content"]
+    assert "Résumé actuel :\nrésumé 4" in refreshed and "m2" not in refreshed and "user: m4" in refreshed
+
+    missing = await client.post("/api/agent/chat", json={"message": "x", "conversation_id": 999999}, headers=headers)
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_failed_replies_stay_out_of_the_conversation(client, mongo_client, monkeypatch):
+    from app.services import agent as agent_service
+    from app.services.llm_governor import llm_governor
+
+    prompts = []
+
+    class FlakyLLM:
+        def providers(self):
+            return ["stub"]
+
+        async def chat(self, messages, **kwargs):
+            prompts.append(messages)
+            if messages[-1]["content"] == "panne":
+                raise RuntimeError("503")
+            return f"réponse à {messages[-1]['content']}"
+
+        async def stream_chat(self, messages, **kwargs):
+            prompts.append(messages)
+            yield "début"
+            raise RuntimeError("coupure")
+
+    monkeypatch.setattr(agent_service, "llm_client", FlakyLLM())
+    monkeypatch.setattr(llm_governor, "user_burst", 100)
+
+    email, password = "flaky@example.com", "secret123"
+    await client.post("/api/auth/register", json={"email": email, "password": password})
+    res = await client.post("/api/auth/login", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+    failed = (await client.post("/api/agent/chat", json={"message": "panne"}, headers=headers)).json()
+    assert failed["reply"] == "Impossible de répondre via le LLM: 503"
+    conversation_id = failed["conversation_id"]
+    streamed = await client.post(
+        "/api/agent/chat",
+        json={"message": "flux", "conversation_id": conversation_id},
+        headers={**headers, "Accept": "text/event-stream"},
+    )
+    assert "Impossible de répondre via le LLM: coupure" in streamed.text
+    await client.post("/api/agent/chat", json={"message": "m3", "conversation_id": conversation_id}, headers=headers)
+
+    assert [m["content"] for m in prompts[-1][1:]] == ["panne", "flux", "m3"]
+    detail = (await client.get(f"/api/agent/conversations/{conversation_id}", headers=headers)).json()
+    assert [(m["role"], m["content"]) for m in detail["messages"]] == [
+        ("user", "panne"),
+        ("user", "flux"),
+        ("user", "m3"),
+        ("assistant", "réponse à m3"),
+    ]
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.deps import user_cache
+
+
+async def login(client, email: str, password: str):
+    return await client.post("/api/auth/login", data={"username": email, "password": password})
+
+
+@pytest.mark.asyncio
+async def test_burst_of_requests_reuses_cached_user(client):
+    email, password = "burst@example.com", "secret123"
+    await client.post("/api/auth/register", json={"email": email, "password": password})
+    headers = {"Authorization": f"Bearer {(await login(client, email, password)).json()['access_token']}"}
+
+    lookups = user_cache.lookups
+    responses = await asyncio.gather(*(client.get("/api/auth/me", headers=headers) for _ in range(20)))
+    assert all(r.status_code == 200 for r in responses)
+    assert user_cache.lookups - lookups == 1
+
+
+@pytest.mark.asyncio
+async def test_password_change(client):
+    email = "password@example.com"
+    await client.post("/api/auth/register", json={"email": email, "password": "old-secret"})
+    headers = {"Authorization": f"Bearer {(await login(client, email, 'old-secret')).json()['access_token']}"}
+
+    res = await client.post(
+        "/api/auth/password", json={"current_password": "wrong", "new_password": "new-secret"}, headers=headers
+    )
+    assert res.status_code == 400
+    res = await client.post(
+        "/api/auth/password", json={"current_password": "old-secret", "new_password": "new-secret"}, headers=headers
+    )
+    assert res.status_code == 204
+
+    assert (await login(client, email, "old-secret")).status_code == 401
+    # Tokens issued before the change are revoked, even though the user was cached.
+    assert (await client.get("/api/auth/me", headers=headers)).status_code == 401
+    fresh = await login(client, email, "new-secret")
+    assert fresh.status_code == 200
+    headers = {"Authorization": f"Bearer {fresh.json()['access_token']}"}
+    res = await client.post(
+        "/api/auth/password", json={"current_password": "new-secret", "new_password": "other"}, headers=headers
+    )
+    assert res.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_passwords_of_an_older_policy(client, mongo_client):
+    import os
+
+    from passlib.context import CryptContext
+
+    from app.security import settings
+
+    email = "rehash@example.com"
+    await client.post("/api/auth/register", json={"email": email, "password": "secret123"})
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    old = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=1000).hash("secret123")
+    await db["users"].update_one({"email": email}, {"$set": {"hashed_password": old}})
+
+    assert (await login(client, email, "secret123")).status_code == 200
+    stored = (await db["users"].find_one({"email": email}))["hashed_password"]
+    assert stored != old and f"${settings.password_hash_rounds}$" in stored
+    assert (await login(client, email, "secret123")).status_code == 200
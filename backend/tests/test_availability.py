@@ -0,0 +1,44 @@
+from datetime import date, datetime, timedelta
+
+from app.services.availability import (
+    find_slots,
+    free_intervals,
+    merge_intervals,
+    parse_days_off,
+    subtract_intervals,
+)
+
+
+def dt(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 3, day, hour, minute)
+
+
+def test_merge_intervals_sorts_and_merges_touching_ranges():
+    merged = merge_intervals([(dt(4, 14), dt(4, 15)), (dt(4, 10), dt(4, 11)), (dt(4, 11), dt(4, 12)), (dt(4, 10, 30), dt(4, 10, 45))])
+    assert merged == [(dt(4, 10), dt(4, 12)), (dt(4, 14), dt(4, 15))]
+
+
+def test_subtract_intervals_handles_busy_spanning_several_windows():
+    available = [(dt(4, 9), dt(4, 12)), (dt(4, 14), dt(4, 18))]
+    busy = [(dt(4, 8), dt(4, 9, 30)), (dt(4, 11), dt(4, 15))]
+    assert subtract_intervals(available, busy) == [(dt(4, 9, 30), dt(4, 11)), (dt(4, 15), dt(4, 18))]
+
+
+def test_free_intervals_respect_productive_hours_and_days_off():
+    # 2024-03-02 is a Saturday, 2024-03-05 is listed as a date off.
+    free = free_intervals(
+        dt(2, 0),
+        dt(6, 0),
+        busy=[(dt(4, 10), dt(4, 11))],
+        productive_hours=[{"start": "09:00", "end": "12:00"}],
+        days_off=["samedi", "dimanche", "2024-03-05"],
+    )
+    assert free == [(dt(4, 9), dt(4, 10)), (dt(4, 11), dt(4, 12))]
+    assert find_slots(free, timedelta(minutes=60)) == free
+    assert find_slots(free, timedelta(minutes=61)) == []
+
+
+def test_parse_days_off_accepts_names_and_dates():
+    weekdays, dates = parse_days_off(["Lundi", "sun", " ", "2024-12-25", "inconnu"])
+    assert weekdays == {0, 6}
+    assert dates == {date(2024, 12, 25)}
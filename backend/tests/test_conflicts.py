@@ -0,0 +1,63 @@
+import random
+from datetime import datetime, timedelta
+
+from app.services.conflicts import IntervalTree, _UserIndex
+
+BASE = datetime(2024, 1, 1)
+
+
+def test_interval_tree_matches_brute_force():
+    rng = random.Random(7)
+    tree = IntervalTree()
+    intervals = {}
+    for event_id in range(2000):
+        start = BASE + timedelta(minutes=rng.randrange(60 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice([15, 30, 60, 240]))
+        tree.insert(start, end, event_id)
+        intervals[event_id] = (start, end)
+    for event_id in rng.sample(sorted(intervals), 500):
+        tree.remove(event_id)
+        del intervals[event_id]
+    assert len(tree) == len(intervals)
+
+    for _ in range(200):
+        start = BASE + timedelta(minutes=rng.randrange(60 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice([1, 45, 600]))
+        expected = {i for i, (s, e) in intervals.items() if s < end and e > start}
+        assert set(tree.overlapping(start, end)) == expected
+
+
+def test_reinserting_an_event_moves_it():
+    tree = IntervalTree()
+    tree.insert(BASE, BASE + timedelta(hours=1), 1)
+    tree.insert(BASE + timedelta(hours=5), BASE + timedelta(hours=6), 1)
+    assert tree.overlapping(BASE, BASE + timedelta(hours=2)) == []
+    assert tree.overlapping(BASE + timedelta(hours=5), BASE + timedelta(hours=7)) == [1]
+
+
+def test_user_index_reports_series_occurrences_and_ignores_proposals():
+    index = _UserIndex()
+    index.add({"id": 1, "title": "Cours", "start": BASE + timedelta(hours=9), "end": BASE + timedelta(hours=10), "recurrence": "daily"})
+    index.add({"id": 2, "title": "Proposé", "start": BASE + timedelta(days=3, hours=9), "end": BASE + timedelta(days=3, hours=10), "kind": "propose"})
+
+    day = BASE + timedelta(days=3)
+    conflicts = list(index.conflicts(day + timedelta(hours=9, minutes=30), day + timedelta(hours=11), exclude_id=None))
+    assert [(c["id"], c["start"]) for c in conflicts] == [(1, day + timedelta(hours=9))]
+    assert list(index.conflicts(day + timedelta(hours=9), day + timedelta(hours=10), exclude_id=1)) == []
+
+
+def test_bulk_build_matches_incremental_inserts():
+    rng = random.Random(3)
+    items = []
+    for event_id in range(1000):
+        start = BASE + timedelta(minutes=rng.randrange(60 * 24 * 30))
+        items.append((start, start + timedelta(minutes=rng.choice([10, 90, 600])), event_id))
+    tree = IntervalTree.build(items)
+    tree.insert(BASE, BASE + timedelta(days=40), 5000)
+    tree.remove(10)
+
+    for _ in range(100):
+        start = BASE + timedelta(minutes=rng.randrange(60 * 24 * 30))
+        end = start + timedelta(minutes=30)
+        expected = {i for s, e, i in items if s < end and e > start and i != 10} | {5000}
+        assert set(tree.overlapping(start, end)) == expected
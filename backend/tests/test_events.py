@@ -1,3 +1,6 @@
+import asyncio
+import os
+
 import pytest
 
 from datetime import datetime, timedelta, timezone
@@ -45,3 +48,209 @@ async def test_event_crud(client):
 
     res = await client.delete(f"/api/events/{event_id}", headers=headers)
     assert res.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_event_list_streams_ndjson(client):
+    headers = await auth_headers(client)
+    for i in range(3):
+        payload = {"title": f"Flux {i}", "start": iso_in(10 + i), "end": iso_in(40 + i), "category": "stream"}
+        res = await client.post("/api/events/", json=payload, headers=headers)
+        assert res.status_code == 200
+
+    res = await client.get("/api/events/", params={"category": "stream", "stream": 1}, headers=headers)
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    streamed = [EventRead.model_validate_json(line) for line in res.text.splitlines()]
+    assert [e.title for e in streamed] == ["Flux 0", "Flux 1", "Flux 2"]
+
+    res = await client.get(
+        "/api/events/",
+        params={"category": "stream"},
+        headers={**headers, "Accept": "application/x-ndjson"},
+    )
+    assert len(res.text.splitlines()) == 3
+
+    # A stream always runs to the end: there is no page to continue.
+    res = await client.get("/api/events/", params={"category": "stream", "stream": 1, "limit": 2}, headers=headers)
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_event_window_returns_overlapping_events_only(client):
+    headers = await auth_headers(client)
+    base = datetime(2031, 5, 12, tzinfo=timezone.utc)
+
+    def at(hours: int) -> str:
+        return (base + timedelta(hours=hours)).isoformat()
+
+    fixtures = {
+        "Conférence (3 jours)": (-48, 30),
+        "Dans la fenêtre": (2, 3),
+        "Avant": (-10, -5),
+        "Après": (30, 31),
+    }
+    for title, (start, end) in fixtures.items():
+        res = await client.post(
+            "/api/events/",
+            json={"title": title, "start": at(start), "end": at(end), "category": "window"},
+            headers=headers,
+        )
+        assert res.status_code == 200
+
+    res = await client.get(
+        "/api/events/",
+        params={"from": at(0), "to": at(24), "category": "window"},
+        headers=headers,
+    )
+    assert res.status_code == 200
+    assert [e["title"] for e in res.json()] == ["Conférence (3 jours)", "Dans la fenêtre"]
+
+
+@pytest.mark.asyncio
+async def test_window_sees_long_events_stored_before_the_duration_hint(client, mongo_client):
+    email = "legacy-events@example.com"
+    await client.post("/api/auth/register", json={"email": email, "password": "secret123"})
+    res = await client.post("/api/auth/login", data={"username": email, "password": "secret123"})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+    owner_id = (await client.get("/api/auth/me", headers=headers)).json()["id"]
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    base = datetime(2034, 2, 1, tzinfo=timezone.utc)
+    await db["events"].insert_one(
+        {
+            "id": 10**9,
+            "owner_id": owner_id,
+            "title": "Séminaire historique",
+            "start": base - timedelta(days=5),
+            "end": base + timedelta(days=1),
+            "category": "legacy",
+            "version": 1,
+        }
+    )
+    assert await db["event_stats"].find_one({"owner_id": owner_id}) is None
+
+    # The first write after the upgrade must not seed the hint with its own short duration.
+    res = await client.post(
+        "/api/events/",
+        json={
+            "title": "Court",
+            "start": base.isoformat(),
+            "end": (base + timedelta(hours=1)).isoformat(),
+            "category": "legacy",
+        },
+        headers=headers,
+    )
+    assert res.status_code == 200
+
+    res = await client.get(
+        "/api/events/",
+        params={"from": base.isoformat(), "to": (base + timedelta(hours=2)).isoformat(), "category": "legacy"},
+        headers=headers,
+    )
+    assert [e["title"] for e in res.json()] == ["Séminaire historique", "Court"]
+
+
+@pytest.mark.asyncio
+async def test_recurring_event_occurrences(client):
+    headers = await auth_headers(client)
+    payload = {
+        "title": "Sport",
+        "start": "2032-01-05T18:00:00+00:00",
+        "end": "2032-01-05T19:00:00+00:00",
+        "recurrence": "weekly",
+        "recurrence_until": "2036-01-01T00:00:00+00:00",
+        "recurrence_exceptions": ["2033-03-14T18:00:00+00:00"],
+    }
+    res = await client.post("/api/events/", json=payload, headers=headers)
+    assert res.status_code == 200
+
+    res = await client.get(
+        "/api/events/occurrences",
+        params={"from": "2033-03-01T00:00:00+00:00", "to": "2033-04-01T00:00:00+00:00"},
+        headers=headers,
+    )
+    assert res.status_code == 200
+    sport = [o for o in res.json() if o["title"] == "Sport"]
+    assert [o["start"][:10] for o in sport] == ["2033-03-07", "2033-03-21", "2033-03-28"]
+
+    res = await client.get(
+        "/api/events/occurrences",
+        params={"from": "2033-01-01T00:00:00+00:00", "to": "2035-01-01T00:00:00+00:00"},
+        headers=headers,
+    )
+    assert res.status_code == 400
+
+
+def ics_feed(sequence: int, title: str) -> bytes:
+    events = "".join(
+        f"BEGIN:VEVENT\r\nUID:feed-{i}@example.com\r\nSEQUENCE:{sequence}\r\n"
+        f"DTSTART:20300301T0{i}0000\r\nDTEND:20300301T0{i}3000\r\nSUMMARY:{title} {i}\r\nEND:VEVENT\r\n"
+        for i in range(3)
+    )
+    return f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\n{events}END:VCALENDAR\r\n".encode()
+
+
+@pytest.mark.asyncio
+async def test_ics_reimport_upserts_on_uid_and_sequence(client):
+    headers = await auth_headers(client)
+
+    def upload(body: bytes):
+        return {"file": ("feed.ics", body, "text/calendar")}
+
+    res = await client.post("/api/events/import/ics", files=upload(ics_feed(0, "Cours")), headers=headers)
+    assert res.json()["imported"] == 3
+    res = await client.post("/api/events/import/ics", files=upload(ics_feed(0, "Cours")), headers=headers)
+    assert res.json() == {"imported": 0, "updated": 0, "unchanged": 3, "invalid": 0}
+    res = await client.post("/api/events/import/ics", files=upload(ics_feed(1, "Salle B")), headers=headers)
+    assert res.json()["updated"] == 3
+
+    res = await client.get(
+        "/api/events/", params={"from": "2030-03-01T00:00:00", "to": "2030-03-02T00:00:00"}, headers=headers
+    )
+    assert sorted(e["title"] for e in res.json()) == ["Salle B 0", "Salle B 1", "Salle B 2"]
+
+
+@pytest.mark.asyncio
+async def test_ics_background_import_reports_progress(client):
+    headers = await auth_headers(client)
+    res = await client.post(
+        "/api/events/import/ics",
+        params={"background": "true"},
+        files={"file": ("feed.ics", ics_feed(5, "Fond"), "text/calendar")},
+        headers=headers,
+    )
+    assert res.status_code == 202
+    job_id = res.json()["job_id"]
+
+    for _ in range(50):
+        job = (await client.get(f"/api/events/import/jobs/{job_id}", headers=headers)).json()
+        if job["status"] in ("done", "failed"):
+            break
+        await asyncio.sleep(0.05)
+    assert job["status"] == "done"
+    assert job["processed_bytes"] == job["total_bytes"]
+    assert job["imported"] + job["updated"] + job["unchanged"] == 3
+
+
+@pytest.mark.asyncio
+async def test_ics_export_streams_calendar_with_etag(client):
+    headers = await auth_headers(client)
+    await client.post(
+        "/api/events/",
+        json={"title": "Export", "start": iso_in(30), "end": iso_in(90), "category": "work"},
+        headers=headers,
+    )
+
+    res = await client.get("/api/events/export/ics", headers=headers)
+    assert res.status_code == 200
+    assert res.text.startswith("BEGIN:VCALENDAR") and res.text.rstrip().endswith("END:VCALENDAR")
+    assert "SUMMARY:Export" in res.text
+    etag = res.headers["etag"]
+
+    res = await client.get("/api/events/export/ics", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 304
+
+    await client.post("/api/events/", json={"title": "Encore", "start": iso_in(100), "end": iso_in(120)}, headers=headers)
+    res = await client.get("/api/events/export/ics", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
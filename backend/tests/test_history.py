@@ -1,6 +1,10 @@
+import os
+
 import pytest
 from datetime import datetime, timedelta, timezone
 
+from app.versioning import bump_version
+
 
 async def auth_headers(client):
     email = "history@example.com"
@@ -68,3 +72,23 @@ async def test_history_aggregates_data(client):
     first_log = history["agent_logs"][0]
     assert first_log["action"]
     assert first_log["created_at"]
+
+
+@pytest.mark.asyncio
+async def test_history_sees_writes_made_by_other_workers(client, mongo_client):
+    email = "history-workers@example.com"
+    await client.post("/api/auth/register", json={"email": email, "password": "secret123"})
+    res = await client.post("/api/auth/login", data={"username": email, "password": "secret123"})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+    owner_id = (await client.get("/api/auth/me", headers=headers)).json()["id"]
+
+    first = await client.get("/api/history", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert (await client.get("/api/history", headers={**headers, "If-None-Match": etag})).status_code == 304
+
+    # A write from another process bumps the counter without touching this process's cache.
+    await bump_version(mongo_client[os.environ["MONGODB_DB"]], owner_id, "tasks")
+    second = await client.get("/api/history", headers={**headers, "If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
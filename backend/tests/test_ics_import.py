@@ -0,0 +1,54 @@
+import io
+from datetime import datetime
+
+from app.services.ics_import import VEventReader
+
+
+def vevent(uid: str, day: int, extra: str = "") -> str:
+    return (
+        "BEGIN:VEVENT\r\n"
+        f"UID:{uid}\r\n"
+        f"DTSTART:202403{day:02d}T090000\r\n"
+        f"DTEND:202403{day:02d}T100000\r\n"
+        f"SUMMARY:Cours {uid}\r\n"
+        f"{extra}"
+        "END:VEVENT\r\n"
+    )
+
+
+def calendar(*events: str) -> io.BytesIO:
+    body = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\n" + "".join(events) + "END:VCALENDAR\r\n"
+    return io.BytesIO(body.encode())
+
+
+def test_reader_streams_vevents_in_chunks():
+    stream = calendar(*(vevent(f"u{i}", i + 1) for i in range(5)))
+    reader = VEventReader(stream)
+
+    docs, invalid = reader.read_chunk(2)
+    assert [d["ics_uid"] for d in docs] == ["u0", "u1"] and invalid == 0
+    assert not reader.done and reader.saw_calendar
+    assert docs[0]["start"] == datetime(2024, 3, 1, 9) and docs[0]["end"] == datetime(2024, 3, 1, 10)
+
+    rest = reader.read_chunk(2)[0] + reader.read_chunk(2)[0]
+    assert [d["ics_uid"] for d in rest] == ["u2", "u3", "u4"]
+    assert reader.done and reader.bytes_read == len(stream.getvalue())
+
+
+def test_reader_handles_alarms_folded_lines_and_invalid_blocks():
+    alarm = "BEGIN:VALARM\r\nACTION:DISPLAY\r\nTRIGGER:-PT15M\r\nEND:VALARM\r\n"
+    folded = "DESCRIPTION:Une description\r\n  repliée\r\nSEQUENCE:3\r\nCATEGORIES:Travail\r\n"
+    broken = "BEGIN:VEVENT\r\nUID:broken\r\nSUMMARY:Sans dates\r\nEND:VEVENT\r\n"
+    reader = VEventReader(calendar(vevent("a", 4, alarm), broken, vevent("b", 5, folded)))
+
+    docs, invalid = reader.read_chunk(10)
+    assert invalid == 1
+    assert [d["ics_uid"] for d in docs] == ["a", "b"]
+    assert docs[1]["description"] == "Une description repliée"
+    assert docs[1]["ics_sequence"] == 3 and docs[1]["category"] == "Travail"
+
+
+def test_reader_flags_non_calendar_input():
+    reader = VEventReader(io.BytesIO(b"not a calendar\n"))
+    assert reader.read_chunk(10) == ([], 0)
+    assert reader.done and not reader.saw_calendar
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from app.indexes import INDEXES, _plan_stages, ensure_indexes, find_collection_scans, router_query_shapes
+
+
+def test_plan_stages_walks_nested_plans():
+    plan = {
+        "stage": "FETCH",
+        "inputStage": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]},
+    }
+    assert list(_plan_stages(plan)) == ["FETCH", "OR", "IXSCAN", "COLLSCAN"]
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_is_idempotent_and_covers_router_queries(mongo_client):
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    first = await ensure_indexes(db)
+    second = await ensure_indexes(db)
+    assert first == second == [spec.name for spec in INDEXES]
+
+    offenders = await find_collection_scans(db, router_query_shapes())
+    assert offenders == []
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import LLMProviderConfig, Settings
+from app.services.llm_cache import LLMResponseCache, prompt_fingerprint
+
+
+class FakeCacheCollection:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    async def find_one(self, query):
+        self.reads += 1
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["expires_at"] <= query["expires_at"]["$gt"]:
+            return None
+        # Mongo hands back naive UTC datetimes.
+        return {**doc, "expires_at": doc["expires_at"].replace(tzinfo=None)}
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["_id"]] = dict(update["$set"])
+
+
+class FakeSession:
+    name = "llm-cache-test"
+
+    def __init__(self):
+        self.collection = FakeCacheCollection()
+
+    def __getitem__(self, name):
+        assert name == "llm_cache"
+        return self.collection
+
+
+def test_fingerprint_ignores_surrounding_whitespace_but_not_params():
+    settings = Settings()
+    messages = [{"role": "user", "content": "Explique la mitose"}]
+    same = prompt_fingerprint(settings, [{"role": "user", "content": " Explique la mitose\n"}], max_tokens=400)
+    assert prompt_fingerprint(settings, messages, max_tokens=400) == same
+    assert prompt_fingerprint(settings, messages, max_tokens=200) != same
+
+    # A fallback model may answer: its answers must not be served under the primary-only key.
+    with_fallback = Settings(llm_fallback_providers=[LLMProviderConfig(api_base="https://backup.example", model="m")])
+    assert prompt_fingerprint(with_fallback, messages, max_tokens=400) != same
+
+
+def test_fingerprint_ignores_a_primary_without_api_key():
+    backup = [LLMProviderConfig(api_base="https://backup.example", model="m")]
+    messages = [{"role": "user", "content": "Explique la mitose"}]
+    keyless = [
+        prompt_fingerprint(Settings(openai_api_key=None, llm_api_base=base, llm_fallback_providers=backup), messages)
+        for base in ("https://a.example", "https://b.example")
+    ]
+    # Only the fallback can answer: the unused primary must not split the cache.
+    assert keyless[0] == keyless[1]
+    keyed = Settings(openai_api_key="k", llm_api_base="https://a.example", llm_fallback_providers=backup)
+    assert prompt_fingerprint(keyed, messages) != keyless[0]
+
+
+@pytest.mark.asyncio
+async def test_memory_then_mongo_tier():
+    session = FakeSession()
+    cache = LLMResponseCache(max_entries=8)
+    calls = []
+
+    async def slow_llm():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "réponse"
+
+    assert await cache.get_or_call(session, "fp", slow_llm) == "réponse"
+
+    t0 = time.perf_counter()
+    assert await cache.get_or_call(session, "fp", slow_llm) == "réponse"
+    assert time.perf_counter() - t0 < 0.01
+    assert session.collection.reads == 1  # memory hit: Mongo not queried
+
+    cache.clear_memory()  # another worker: only the Mongo tier is warm
+    assert await cache.get_or_call(session, "fp", slow_llm) == "réponse"
+    assert await cache.get_or_call(session, "fp", slow_llm) == "réponse"
+    assert len(calls) == 1
+    snapshot = cache.snapshot()
+    assert (snapshot["misses"], snapshot["memory_hits"], snapshot["mongo_hits"], snapshot["stores"]) == (1, 2, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached_and_entries_expire():
+    session = FakeSession()
+    cache = LLMResponseCache(ttl_seconds=0)
+
+    async def failing():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_call(session, "fp", failing)
+    assert session.collection.docs == {}
+
+    await cache.put(session, "fp", "réponse")
+    assert session.collection.docs["fp"]["expires_at"] <= datetime.now(timezone.utc)
+    assert await cache.get(session, "fp") is None
+
+
+@pytest.mark.asyncio
+async def test_empty_answers_are_not_cached():
+    session = FakeSession()
+    cache = LLMResponseCache()
+
+    async def empty():
+        return "LLM réponse vide: {'choices': []}"
+
+    assert await cache.get_or_call(session, "fp", empty) == "LLM réponse vide: {'choices': []}"
+    await cache.put(session, "fp", "  ")
+    assert session.collection.docs == {}
+    assert await cache.get(session, "fp") is None
+    assert cache.stats.stores == 0
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.services import llm_client as llm_module
+from app.services.llm_client import LLMClient
+from tests.llm_stub import StubLLMServer
+
+
+@pytest.mark.asyncio
+async def test_shared_client_reuses_one_connection():
+    async with StubLLMServer() as server:
+        settings = server.settings()
+        await llm_module.open_shared_client(settings)
+        try:
+            client = LLMClient(settings)
+            replies = [await client.chat([{"role": "user", "content": f"q{i}"}]) for i in range(5)]
+        finally:
+            await llm_module.close_shared_client()
+        assert replies[-1] == "ok q4"
+        assert (server.requests, server.connections) == (5, 1)
+        assert llm_module._shared_client is None
+
+
+@pytest.mark.asyncio
+async def test_without_shared_client_each_call_connects():
+    async with StubLLMServer() as server:
+        client = LLMClient(server.settings())
+        for i in range(3):
+            await client.chat([{"role": "user", "content": f"q{i}"}])
+        assert (server.requests, server.connections) == (3, 3)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_respect_connection_limit():
+    async with StubLLMServer() as server:
+        settings = server.settings(llm_max_connections=2)
+        http_client = llm_module.build_http_client(settings)
+        try:
+            client = LLMClient(settings, http_client=http_client)
+            await asyncio.gather(*(client.chat([{"role": "user", "content": f"q{i}"}]) for i in range(10)))
+        finally:
+            await http_client.aclose()
+        assert server.requests == 10
+        assert server.connections <= 2
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_request():
+    async with StubLLMServer(delay=0.2) as server:
+        client = LLMClient(server.settings())
+        same = [{"role": "user", "content": "même question"}]
+        replies = await asyncio.gather(
+            *(client.chat(same) for _ in range(20)),
+            client.chat([{"role": "user", "content": "autre question"}]),
+        )
+        assert server.requests == 2
+        assert len(set(replies[:20])) == 1 and replies[20] != replies[0]
+
+        # Once finished, nothing is kept: the next identical call goes upstream.
+        await client.chat(same)
+        assert server.requests == 3
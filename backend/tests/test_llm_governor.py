@@ -0,0 +1,168 @@
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import httpx
+import pytest
+
+from app.services.llm_client import LLMClient
+from app.services.llm_governor import LLMGovernor, LLMRateLimitError, LLMUnavailableError, parse_retry_after
+from tests.llm_stub import StubLLMServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _client(server: StubLLMServer, governor: LLMGovernor) -> LLMClient:
+    return LLMClient(server.settings(), governor=governor)
+
+
+@pytest.mark.asyncio
+async def test_retries_throttling_and_outages_honouring_retry_after():
+    sleeps = []
+
+    async def record_sleep(delay):
+        sleeps.append(delay)
+
+    faults = [(429, {"Retry-After": "2"}), (503, {})]
+    async with StubLLMServer(faults) as server:
+        governor = LLMGovernor(max_retries=2, retry_base_delay=0.5, sleep=record_sleep, jitter=lambda: 0.5)
+        reply = await _client(server, governor).chat([{"role": "user", "content": "q"}])
+        assert reply == "ok q"
+        assert server.requests == 3
+        assert sleeps == [2.0, 0.5]
+        snapshot = governor.snapshot()
+        assert (snapshot["attempts"], snapshot["retries"], snapshot["failures"]) == (3, 2, 0)
+        assert all(b["state"] == "closed" for b in snapshot["breakers"].values())
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries_and_does_not_retry_client_errors():
+    async def no_sleep(delay):
+        pass
+
+    async with StubLLMServer(fail_with=(503, {})) as server:
+        governor = LLMGovernor(max_retries=2, sleep=no_sleep)
+        with pytest.raises(httpx.HTTPStatusError):
+            await _client(server, governor).chat([{"role": "user", "content": "q"}])
+        assert server.requests == 3
+
+    async with StubLLMServer(fail_with=(400, {})) as server:
+        governor = LLMGovernor(max_retries=2, sleep=no_sleep)
+        with pytest.raises(httpx.HTTPStatusError):
+            await _client(server, governor).chat([{"role": "user", "content": "q"}])
+        assert server.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_when_retry_after_exceeds_the_max_delay():
+    sleeps = []
+
+    async def record_sleep(delay):
+        sleeps.append(delay)
+
+    async with StubLLMServer([(503, {"Retry-After": "60"})]) as server:
+        governor = LLMGovernor(max_retries=2, retry_max_delay=8, sleep=record_sleep)
+        with pytest.raises(httpx.HTTPStatusError):
+            await _client(server, governor).chat([{"role": "user", "content": "q"}])
+        assert server.requests == 1
+        assert sleeps == []
+        assert (governor.stats.retries, governor.stats.failures) == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_open_the_circuit():
+    async with StubLLMServer(fail_with=(400, {})) as server:
+        governor = LLMGovernor(max_retries=0, breaker_threshold=2)
+        client = _client(server, governor)
+        for i in range(4):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.chat([{"role": "user", "content": f"q{i}"}])
+        assert server.requests == 4
+        assert governor.breaker(client.providers()[0].label).state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_then_probes_after_cooldown():
+    clock = FakeClock()
+
+    async with StubLLMServer(fail_with=(503, {})) as server:
+        governor = LLMGovernor(max_retries=0, breaker_threshold=3, breaker_cooldown=30, clock=clock)
+        client = _client(server, governor)
+        for i in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.chat([{"role": "user", "content": f"q{i}"}])
+        breaker_name = urlsplit(server.base_url).netloc
+        breaker = governor.breaker(breaker_name)
+        assert breaker.state == "open"
+
+        with pytest.raises(LLMUnavailableError):
+            await client.chat([{"role": "user", "content": "q3"}])
+        assert server.requests == 3
+
+        clock.now += 30
+        assert breaker.state == "half_open"
+        server.fail_with = None
+        assert await client.chat([{"role": "user", "content": "q4"}]) == "ok q4"
+        snapshot = governor.snapshot()
+        assert snapshot["breakers"] == {breaker_name: {"state": "closed", "opens": 1}}
+        assert snapshot["short_circuited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_queues_excess_calls():
+    async with StubLLMServer(delay=0.05) as server:
+        governor = LLMGovernor(max_concurrency=2)
+        client = _client(server, governor)
+        replies = await asyncio.gather(*(client.chat([{"role": "user", "content": f"q{i}"}]) for i in range(6)))
+        assert replies == [f"ok q{i}" for i in range(6)]
+        assert server.max_active == 2
+        snapshot = governor.snapshot()
+        assert snapshot["max_queue_depth"] == 4
+        assert (snapshot["queue_depth"], snapshot["in_flight"]) == (0, 0)
+        assert snapshot["max_wait_seconds"] >= 0.09
+
+
+def test_token_bucket_per_user():
+    clock = FakeClock()
+    governor = LLMGovernor(user_rate_per_minute=60, user_burst=2, clock=clock)
+    governor.admit(1)
+    governor.admit(1)
+    with pytest.raises(LLMRateLimitError) as exc:
+        governor.admit(1)
+    assert exc.value.retry_after == pytest.approx(1.0)
+    governor.admit(2)
+
+    clock.now += 1
+    governor.admit(1)
+    assert governor.snapshot()["rate_limited"] == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=120), usegmt=True)
+    assert 100 < parse_retry_after(later) <= 120
+
+
+def test_slots_work_across_event_loops():
+    governor = LLMGovernor(max_concurrency=1)
+
+    async def contend() -> None:
+        async def hold() -> None:
+            async with governor.slot():
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(hold(), hold())
+
+    # A semaphore that waited in one loop cannot be awaited from another.
+    asyncio.run(contend())
+    asyncio.run(contend())
+    assert governor.stats.waits == 4 and governor.stats.in_flight == 0
@@ -0,0 +1,136 @@
+import asyncio
+import math
+import time
+
+import pytest
+
+from app.config import LLMProviderConfig, Settings
+from app.services.llm_client import LLMClient
+from app.services.llm_governor import LLMGovernor
+from app.services.llm_hedging import HedgeStats, LatencyHistogram, first_success, provider_latencies
+from tests.llm_stub import StubLLMServer
+
+
+def _client(primary: StubLLMServer, backup: StubLLMServer, **settings) -> LLMClient:
+    return LLMClient(
+        Settings(
+            openai_api_key="test",
+            llm_api_base=primary.base_url,
+            llm_fallback_providers=[LLMProviderConfig(api_base=backup.base_url, model="backup")],
+            **settings,
+        ),
+        governor=LLMGovernor(max_retries=0),
+    )
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_once_past_its_percentile():
+    async with StubLLMServer(delay=0.02) as primary, StubLLMServer(delay=0.02) as backup:
+        client = _client(primary, backup, llm_hedge_min_samples=20, llm_hedge_percentile=0.95)
+        for i in range(20):
+            await client.chat([{"role": "user", "content": f"warm {i}"}])
+        assert (primary.requests, backup.requests) == (20, 0)
+        threshold = provider_latencies.histogram(client.providers()[0].label).percentile(0.95)
+        assert threshold < 0.2
+
+        before = provider_latencies.stats.hedges, provider_latencies.stats.wins_by_backup
+        primary.delay = 2.0
+        started = time.perf_counter()
+        reply = await client.chat([{"role": "user", "content": "tail"}])
+        elapsed = time.perf_counter() - started
+
+        assert reply == "ok tail"
+        assert elapsed < 0.5
+        assert (primary.requests, backup.requests) == (21, 1)
+        after = provider_latencies.stats.hedges, provider_latencies.stats.wins_by_backup
+        assert (after[0] - before[0], after[1] - before[1]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged():
+    async with StubLLMServer(delay=0.01) as primary, StubLLMServer() as backup:
+        client = _client(primary, backup, llm_hedge_default_delay_seconds=0.5)
+        for i in range(5):
+            assert await client.chat([{"role": "user", "content": f"q{i}"}]) == f"ok q{i}"
+        assert backup.requests == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_at_once():
+    async with StubLLMServer(fail_with=(503, {})) as primary, StubLLMServer() as backup:
+        client = _client(primary, backup, llm_hedge_default_delay_seconds=10)
+        started = time.perf_counter()
+        assert await client.chat([{"role": "user", "content": "q"}]) == "ok q"
+        assert time.perf_counter() - started < 1
+        assert (primary.requests, backup.requests) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_and_retry_backoff_do_not_trigger_hedges():
+    def client(primary, backup, governor):
+        return LLMClient(
+            Settings(
+                openai_api_key="test",
+                llm_api_base=primary.base_url,
+                llm_fallback_providers=[LLMProviderConfig(api_base=backup.base_url, model="backup")],
+                llm_hedge_default_delay_seconds=0.3,
+            ),
+            governor=governor,
+        )
+
+    before = provider_latencies.stats.hedges
+    async with StubLLMServer(delay=0.1) as primary, StubLLMServer() as backup:
+        queued = client(primary, backup, LLMGovernor(max_concurrency=1, max_retries=0))
+        replies = await asyncio.gather(*(queued.chat([{"role": "user", "content": f"file {i}"}]) for i in range(6)))
+        assert replies == [f"ok file {i}" for i in range(6)]
+        assert (primary.requests, backup.requests) == (6, 0)
+
+    async with StubLLMServer([(503, {"Retry-After": "0.6"})]) as primary, StubLLMServer() as backup:
+        retried = client(primary, backup, LLMGovernor(max_retries=1))
+        assert await retried.chat([{"role": "user", "content": "reprise"}]) == "ok reprise"
+        assert (primary.requests, backup.requests) == (2, 0)
+    assert provider_latencies.stats.hedges == before
+
+
+@pytest.mark.asyncio
+async def test_first_success_cancels_the_loser_and_raises_when_all_fail():
+    stats = HedgeStats()
+    cancelled = []
+
+    async def slow(sending):
+        sending(True)
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def fast(sending):
+        await asyncio.sleep(0.01)
+        return "fast"
+
+    async def broken(sending):
+        raise RuntimeError("down")
+
+    assert await first_success([slow, fast], lambda i: 0.01, stats) == "fast"
+    assert cancelled == ["slow"]
+    assert (stats.hedges, stats.wins_by_backup, stats.cancelled) == (1, 1, 1)
+
+    with pytest.raises(RuntimeError, match="down"):
+        await first_success([broken, broken], lambda i: math.inf, stats)
+    assert stats.fallbacks == 1
+
+
+def test_latency_histogram_percentiles_and_decay():
+    histogram = LatencyHistogram(max_count=100)
+    assert histogram.percentile(0.5) is None
+    for _ in range(95):
+        histogram.observe(0.05)
+    for _ in range(5):
+        histogram.observe(3.0)
+    assert 0.05 <= histogram.percentile(0.5) < 0.06
+    assert 0.05 <= histogram.percentile(0.95) < 0.06
+    assert 3.0 <= histogram.percentile(0.99) < 3.3
+
+    histogram.observe(0.05)
+    assert histogram.count == 50
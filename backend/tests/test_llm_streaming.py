@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.llm_client import LLMClient
+from app.streaming import iter_sse
+from tests.llm_stub import StubLLMServer
+
+
+def _events(raw: list[bytes]) -> list[tuple[str | None, dict]]:
+    parsed = []
+    for message in raw:
+        event, data = None, None
+        for line in message.decode().strip().split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        parsed.append((event, data))
+    return parsed
+
+
+@pytest.mark.asyncio
+async def test_deltas_are_relayed_as_server_sent_events():
+    completed = []
+
+    async def on_complete(text: str) -> None:
+        completed.append(text)
+
+    async with StubLLMServer(chunks=["Bon", "jour", " !"]) as llm:
+        client = LLMClient(llm.settings())
+        stream = iter_sse(client.stream_chat([{"role": "user", "content": "salut"}]), "reply", on_complete)
+        raw = [message async for message in stream]
+        assert llm.payloads[0]["stream"] is True
+
+    assert _events(raw) == [
+        (None, {"delta": "Bon"}),
+        (None, {"delta": "jour"}),
+        (None, {"delta": " !"}),
+        ("done", {"reply": "Bonjour !"}),
+    ]
+    assert completed == ["Bonjour !"]
+
+
+@pytest.mark.asyncio
+async def test_closing_the_stream_cancels_the_upstream_call():
+    completed = []
+
+    async def on_complete(text: str) -> None:
+        completed.append(text)
+
+    async with StubLLMServer(chunks=["x"], chunk_delay=0.01, endless=True) as llm:
+        client = LLMClient(llm.settings())
+        stream = iter_sse(client.stream_chat([{"role": "user", "content": "salut"}]), "reply", on_complete)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        await asyncio.wait_for(llm.disconnected.wait(), timeout=2)
+        sent = llm.sent
+
+    assert len(received) == 2
+    assert sent < 50
+    assert completed == []
@@ -0,0 +1,68 @@
+import asyncio
+import os
+
+import pytest
+
+from app.mongo_helpers import IdAllocator, reserve_id_range
+
+
+@pytest.mark.asyncio
+async def test_reserve_id_range_is_contiguous(mongo_client):
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    first = await reserve_id_range(db, "range_test", 5)
+    second = await reserve_id_range(db, "range_test", 3)
+    assert len(first) == 5
+    assert list(second) == [first[-1] + 1, first[-1] + 2, first[-1] + 3]
+
+
+@pytest.mark.asyncio
+async def test_allocators_from_several_workers_never_collide(mongo_client):
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    # Two allocators simulate two uvicorn workers sharing the same counters.
+    workers = [IdAllocator(block_size=7), IdAllocator(block_size=7)]
+
+    async def draw(allocator: IdAllocator) -> list[int]:
+        ids: list[int] = []
+        for _ in range(20):
+            ids.append(await allocator.next_id(db, "worker_test"))
+        ids.extend(await allocator.next_ids(db, "worker_test", 15))
+        return ids
+
+    results = await asyncio.gather(*(draw(w) for w in workers))
+    all_ids = [i for ids in results for i in ids]
+    assert len(all_ids) == 70
+    assert len(set(all_ids)) == 70
+
+
+@pytest.mark.asyncio
+async def test_bulk_allocation_uses_single_round_trip(mongo_client):
+    db = mongo_client[os.environ["MONGODB_DB"]]
+    allocator = IdAllocator(block_size=10)
+    before = await db["counters"].find_one({"_id": "bulk_test"})
+    ids = await allocator.next_ids(db, "bulk_test", 2000)
+    after = await db["counters"].find_one({"_id": "bulk_test"})
+
+    assert len(set(ids)) == 2000
+    assert ids == list(range(ids[0], ids[0] + 2000))
+    assert after["seq"] - (before or {}).get("seq", 0) == 2000
+
+
+class SlowCounters:
+    def __init__(self) -> None:
+        self.seq = 0
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        await asyncio.sleep(0.01)
+        self.seq += update["$inc"]["seq"]
+        return {"seq": self.seq}
+
+
+def test_allocator_locks_work_across_event_loops():
+    db = {"counters": SlowCounters()}
+    allocator = IdAllocator(block_size=1)
+
+    async def draw() -> list[int]:
+        return await asyncio.gather(*(allocator.next_id(db, "loops_test") for _ in range(3)))
+
+    # The lock contended in the first loop must not be reused by the second.
+    assert sorted(asyncio.run(draw()) + asyncio.run(draw())) == list(range(1, 7))
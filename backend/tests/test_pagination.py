@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import build_query, date_range, decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trip_keeps_datetimes():
+    when = datetime(2024, 3, 1, 9, 30)
+    assert decode_cursor(encode_cursor(when, 42)) == (when, 42)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("pas-un-curseur")
+    assert exc.value.status_code == 400
+
+
+def test_keyset_filter_breaks_ties_on_id():
+    assert keyset_filter("id", 5, 5) == {"id": {"$gt": 5}}
+    assert keyset_filter("start", 10, 3) == {"$or": [{"start": {"$gt": 10}}, {"start": 10, "id": {"$gt": 3}}]}
+
+
+def test_build_query_drops_unset_filters():
+    start = datetime(2024, 1, 1)
+    query = build_query(1, status="a_faire", project_id=None, deadline=date_range(start, None))
+    assert query == {"owner_id": 1, "status": "a_faire", "deadline": {"$gte": start}}
+    assert date_range(None, None) is None
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+from app.services.availability import working_intervals
+from app.services.planner import SESSION_BREAK, plan_tasks
+
+
+def dt(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2024, 3, day, hour, minute)
+
+
+def task(task_id: int, **fields):
+    return {"id": task_id, "title": f"T{task_id}", "status": "a_faire", "duration_minutes": 60, **fields}
+
+
+def test_plan_orders_by_deadline_then_priority_around_fixed_events():
+    tasks = [
+        task(1, priority="basse"),
+        task(2, priority="haute"),
+        task(3, priority="basse", deadline=dt(4, 12)),
+        task(4, status="terminee", priority="haute"),
+    ]
+    plan = plan_tasks(tasks, [(dt(4, 9), dt(4, 13))], [(dt(4, 10), dt(4, 11))])
+
+    assert [(b.task_id, b.start, b.end) for b in plan.blocks] == [
+        (3, dt(4, 9), dt(4, 10)),
+        (2, dt(4, 11), dt(4, 12)),
+        (1, dt(4, 12), dt(4, 13)),
+    ]
+    assert plan.unplaced == [] and plan.late == []
+
+
+def test_plan_splits_long_tasks_and_respects_daily_limit():
+    working = working_intervals(dt(4, 0), dt(6, 0), [{"start": "09:00", "end": "17:00"}])
+    plan = plan_tasks(
+        [task(1, duration_minutes=300)],
+        working,
+        session_duration=timedelta(minutes=90),
+        daily_limit=timedelta(hours=2),
+    )
+
+    assert [(b.start, b.end) for b in plan.blocks] == [
+        (dt(4, 9), dt(4, 10, 30)),
+        (dt(4, 10, 45), dt(4, 11, 15)),
+        (dt(5, 9), dt(5, 10, 30)),
+        (dt(5, 10, 45), dt(5, 11, 15)),
+    ]
+    assert plan.unplaced == [1]
+
+
+def test_plan_leaves_a_break_between_blocks_of_a_split_task():
+    plan = plan_tasks(
+        [task(1, priority="haute", duration_minutes=120), task(2, duration_minutes=30)],
+        [(dt(4, 9), dt(4, 12))],
+        session_duration=timedelta(minutes=45),
+    )
+
+    assert [(b.task_id, b.start, b.end) for b in plan.blocks] == [
+        (1, dt(4, 9), dt(4, 9, 45)),
+        (2, dt(4, 9, 45), dt(4, 10, 15)),
+        (1, dt(4, 10, 15), dt(4, 11)),
+        (1, dt(4, 11, 15), dt(4, 11, 45)),
+    ]
+    ones = [b for b in plan.blocks if b.task_id == 1]
+    assert all(later.start - earlier.end >= SESSION_BREAK for earlier, later in zip(ones, ones[1:]))
+
+
+def test_plan_waits_for_dependencies_and_reports_cycles():
+    tasks = [
+        task(1, priority="haute", dependencies=[2]),
+        task(2, priority="basse", dependencies=[99]),
+        task(3, dependencies=[4]),
+        task(4, dependencies=[3]),
+    ]
+    plan = plan_tasks(tasks, [(dt(4, 9), dt(4, 18))])
+
+    assert [b.task_id for b in plan.blocks] == [2, 1]
+    assert plan.blocks[1].start >= plan.blocks[0].end
+    assert plan.blocked == [3, 4]
+
+
+def test_plan_matches_energy_to_time_of_day_and_flags_late_tasks():
+    tasks = [
+        task(1, energy=2),
+        task(2, energy=9),
+        task(3, energy=8, deadline=dt(4, 8, 30)),
+    ]
+    morning = plan_tasks(tasks, [(dt(4, 8), dt(4, 12))])
+    assert [b.task_id for b in morning.blocks] == [3, 2, 1]
+    assert morning.late == [3]
+
+    # Same working day, but only the afternoon (after its midpoint) is free.
+    afternoon = plan_tasks(tasks[:2], [(dt(4, 8), dt(4, 18))], [(dt(4, 8), dt(4, 16))])
+    assert [b.task_id for b in afternoon.blocks] == [1, 2]
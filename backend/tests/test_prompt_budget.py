@@ -0,0 +1,103 @@
+from app.services.prompt_budget import (
+    ELLIPSIS,
+    MESSAGE_OVERHEAD,
+    PROMPT_OVERHEAD,
+    PromptBuilder,
+    TokenCounter,
+    estimate_tokens,
+    truncate,
+)
+
+
+def _total(counter: TokenCounter, messages) -> int:
+    return PROMPT_OVERHEAD + sum(counter.message(m) for m in messages)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("le chat") == 2
+    assert estimate_tokens("Réunion 2024-05-02, salle B.") == 13
+    assert estimate_tokens("anticonstitutionnellement") == 7
+
+
+def test_truncate_keeps_the_head_within_budget():
+    text = " ".join(f"mot{i}" for i in range(100))
+    cut = truncate(text, 20)
+    assert cut.startswith("mot0 mot1") and cut.endswith(ELLIPSIS)
+    assert estimate_tokens(cut) <= 20
+    assert truncate("court", 20) == "court"
+    assert truncate(text, 0) == ""
+
+
+def test_token_counts_are_cached_per_message():
+    counter = TokenCounter(max_entries=2)
+    counter.count("a b c")
+    counter.count("a b c")
+    counter.count("d")
+    counter.count("e")
+    counter.count("a b c")
+    assert (counter.hits, counter.misses) == (1, 4)
+
+
+def test_token_cache_stays_small_on_large_inputs():
+    counter = TokenCounter(max_entries=8)
+    for i in range(20):
+        text = f"{i} " + "mot " * 20_000
+        assert counter.count(text) == estimate_tokens(text)
+    assert counter.entries == 8
+    assert all(isinstance(key, bytes) and len(key) == 16 for key in counter._counts)
+    assert counter.count("19 " + "mot " * 20_000) and counter.hits == 1
+
+
+def test_fills_the_budget_by_priority():
+    builder = PromptBuilder(max_tokens=120)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"tour {i} " + "bla " * 8} for i in range(10)]
+    prompt = builder.build(
+        "chat",
+        "Assistant.",
+        "Question ?",
+        summary="Résumé : " + "fait " * 10,
+        retrieved=["- Tâche #1 « Rapport »", "- Projet #2 « Migration »", "- " + "long " * 40],
+        retrieved_header="Espace :",
+        retrieved_budget=30,
+        history=history,
+    )
+    roles = [m["role"] for m in prompt.messages]
+    assert roles[:3] == ["system", "system", "system"] and roles[-1] == "user"
+    assert prompt.messages[2]["content"] == "Espace :\n- Tâche #1 « Rapport »\n- Projet #2 « Migration »"
+    kept = prompt.messages[3:-1]
+    assert kept and kept == history[-len(kept):]
+    assert prompt.dropped == 1 + len(history) - len(kept)
+    assert prompt.tokens == _total(builder.counter, prompt.messages) <= 120
+    assert builder.snapshot()["purposes"]["chat"]["last_tokens"] == prompt.tokens
+
+
+def test_oversized_message_and_summary_are_cut():
+    builder = PromptBuilder(max_tokens=100)
+    prompt = builder.build("assist", "Tuteur.", "Sujet: maths.\nContexte:\n" + "cours " * 500, summary="ancien " * 50)
+    assert [m["role"] for m in prompt.messages] == ["system", "user"]
+    assert prompt.messages[-1]["content"].startswith("Sujet: maths.") and prompt.messages[-1]["content"].endswith(ELLIPSIS)
+    assert prompt.truncated and prompt.dropped == 1
+    assert prompt.tokens <= 100
+
+    # Without a budget problem nothing is touched.
+    prompt = builder.build("summary", "Résume.", history=[{"role": "user", "content": "salut"}])
+    assert prompt.messages[1] == {"role": "user", "content": "salut"}
+    assert (prompt.dropped, prompt.truncated) == (0, False)
+    assert prompt.tokens == PROMPT_OVERHEAD + 2 * MESSAGE_OVERHEAD + estimate_tokens("Résume.") + 2
+    stats = builder.snapshot()["purposes"]
+    assert (stats["assist"]["truncated"], stats["summary"]["prompts"]) == (1, 1)
+
+
+def test_oversized_system_prompt_is_sent_and_reported(caplog):
+    builder = PromptBuilder(max_tokens=20)
+    system = "Consignes " * 30
+    with caplog.at_level("WARNING", logger="app.services.prompt_budget"):
+        prompt = builder.build("chat", system, "Quelle heure ?", summary="Résumé.", history=[{"role": "user", "content": "salut"}])
+    assert prompt.messages == [{"role": "system", "content": system}, {"role": "user", "content": "Quelle heure ?"}]
+    assert prompt.dropped == 2 and not prompt.truncated
+    assert prompt.tokens == _total(builder.counter, prompt.messages) > prompt.budget
+    assert "au-delà du budget" in caplog.text
+    snapshot = builder.snapshot()
+    assert snapshot["purposes"]["chat"]["over_budget"] == 1
+    assert snapshot["token_cache"]["entries"] == builder.counter.entries > 0
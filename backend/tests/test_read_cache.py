@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.read_cache import ReadCache
+
+DB = SimpleNamespace(name="cache-test")
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_hits_after_first_load():
+    cache = ReadCache()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return {"done": 3}
+
+    for _ in range(5):
+        assert await cache.get_or_load(DB, 1, "progress", 7, load, depends_on=("study_sessions",)) == {"done": 3}
+    assert len(calls) == 1
+    assert (cache.stats.hits, cache.stats.misses) == (4, 1)
+    assert cache.snapshot()["hit_ratio"] == 0.8
+
+
+def test_ttl_lru_and_byte_bounds():
+    clock = Clock()
+    cache = ReadCache(max_entries=2, max_bytes=100, ttl_seconds=10, sizeof=len, clock=clock)
+    cache.put(DB, 1, "a", (), "x" * 10, depends_on=())
+    cache.put(DB, 1, "b", (), "x" * 10, depends_on=())
+    assert cache.get(DB, 1, "a")[0]
+    cache.put(DB, 1, "c", (), "x" * 10, depends_on=())  # evicts "b", the least recently used
+    assert not cache.get(DB, 1, "b")[0]
+    assert cache.stats.evictions == 1
+
+    cache.put(DB, 1, "d", (), "x" * 95, depends_on=())  # byte bound evicts the rest
+    assert len(cache) == 1 and cache.size_bytes == 95
+    cache.put(DB, 1, "e", (), "x" * 101, depends_on=())  # larger than the cache: not stored
+    assert not cache.get(DB, 1, "e")[0]
+
+    clock.now = 10
+    assert not cache.get(DB, 1, "d")[0]
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0 and cache.size_bytes == 0
+
+
+def test_invalidate_by_user_and_collection():
+    cache = ReadCache()
+    cache.put(DB, 1, "feedback", ("day",), 1, depends_on=("tasks", "events"))
+    cache.put(DB, 1, "progress", 3, 2, depends_on=("study_sessions",))
+    cache.put(DB, 2, "feedback", ("day",), 3, depends_on=("tasks", "events"))
+    cache.put(SimpleNamespace(name="other"), 1, "feedback", ("day",), 4, depends_on=("tasks",))
+
+    cache.invalidate(DB, 1, "events")
+    assert not cache.get(DB, 1, "feedback", ("day",))[0]
+    assert cache.get(DB, 1, "progress", 3) == (True, 2)
+    assert cache.get(DB, 2, "feedback", ("day",)) == (True, 3)
+    assert cache.get(SimpleNamespace(name="other"), 1, "feedback", ("day",)) == (True, 4)
+
+    cache.invalidate(DB, 1)
+    assert not cache.get(DB, 1, "progress", 3)[0]
+    assert cache.stats.invalidations == 2
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from app.services.recurrence import (
+    SeriesCache,
+    expand_events,
+    iter_occurrence_starts,
+    parse_custom_rule,
+    parse_rule,
+)
+
+
+def daily_event(**extra):
+    return {
+        "id": 1,
+        "owner_id": 1,
+        "version": 1,
+        "title": "Standup",
+        "start": datetime(2024, 1, 1, 9, 0),
+        "end": datetime(2024, 1, 1, 9, 15),
+        "recurrence": "daily",
+        **extra,
+    }
+
+
+def test_daily_series_expands_only_inside_window():
+    event = daily_event(recurrence_until=datetime(2029, 1, 1))
+    rule = parse_rule(event)
+    window_start = datetime(2027, 6, 7)
+    starts = list(
+        iter_occurrence_starts(rule, event["start"], timedelta(minutes=15), window_start, window_start + timedelta(days=7))
+    )
+    assert starts == [datetime(2027, 6, 7 + i, 9, 0) for i in range(7)]
+
+
+def test_until_interval_and_count_are_respected():
+    event = daily_event(recurrence_interval=2, recurrence_until=datetime(2024, 1, 6))
+    occurrences = expand_events([event], datetime(2024, 1, 1), datetime(2024, 2, 1), cache=SeriesCache())
+    assert [o["start"].day for o in occurrences] == [1, 3, 5]
+
+    custom = daily_event(recurrence="custom", recurrence_custom="RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=3")
+    occurrences = expand_events([custom], datetime(2024, 1, 1), datetime(2024, 3, 1), cache=SeriesCache())
+    assert [o["start"].date().isoformat() for o in occurrences] == ["2024-01-01", "2024-01-03", "2024-01-08"]
+
+
+def test_monthly_skips_missing_days():
+    event = daily_event(start=datetime(2024, 1, 31, 9), end=datetime(2024, 1, 31, 10), recurrence="monthly")
+    occurrences = expand_events([event], datetime(2024, 1, 1), datetime(2024, 6, 1), cache=SeriesCache())
+    assert [o["start"].month for o in occurrences] == [1, 3, 5]
+
+
+def test_exceptions_and_overrides():
+    event = daily_event(
+        recurrence_exceptions=[datetime(2024, 1, 2, 9, 0)],
+        recurrence_overrides=[
+            {"original_start": datetime(2024, 1, 3, 9, 0), "start": datetime(2024, 1, 3, 14, 0), "end": datetime(2024, 1, 3, 14, 30), "title": "Décalé"},
+            {"original_start": datetime(2024, 1, 10, 9, 0), "start": datetime(2024, 1, 4, 18, 0), "end": datetime(2024, 1, 4, 18, 30)},
+        ],
+    )
+    occurrences = expand_events([event], datetime(2024, 1, 1), datetime(2024, 1, 5), cache=SeriesCache())
+    summary = [(o["start"], o["title"], o["is_override"]) for o in occurrences]
+    assert summary == [
+        (datetime(2024, 1, 1, 9, 0), "Standup", False),
+        (datetime(2024, 1, 3, 14, 0), "Décalé", True),
+        (datetime(2024, 1, 4, 9, 0), "Standup", False),
+        (datetime(2024, 1, 4, 18, 0), "Standup", True),
+    ]
+
+
+def test_series_cache_is_keyed_on_version():
+    cache = SeriesCache()
+    event = daily_event()
+    assert cache.get(event) is cache.get(dict(event))
+    assert cache.get({**event, "version": 2}) is not cache.get(event)
+
+
+def test_invalid_custom_rule_is_ignored():
+    assert parse_custom_rule("FREQ=HOURLY") is None
+    assert parse_custom_rule("FREQ=WEEKLY;BYDAY=XX") is None
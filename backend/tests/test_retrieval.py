@@ -0,0 +1,144 @@
+import asyncio
+import math
+import random
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from app.services import retrieval
+from app.services.retrieval import B, K1, BM25Index, RetrievalIndex, tokenize
+
+
+def _exact(index: BM25Index, query: str, k: int) -> list[tuple[str, int]]:
+    """Brute-force BM25 over every indexed document."""
+    n = len(index)
+    docs = {key: index._terms[slot] for key, slot in index._slots.items()}
+    avgdl = sum(sum(t.values()) for t in docs.values()) / n
+    df = Counter(term for terms in docs.values() for term in terms)
+    scores = {}
+    for key, terms in docs.items():
+        length = sum(terms.values())
+        score = 0.0
+        for term in set(tokenize(query)):
+            tf = terms.get(term)
+            if tf:
+                idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avgdl))
+        if score:
+            scores[key] = score
+    return sorted(scores, key=lambda key: (-scores[key], key))[:k]
+
+
+def test_tokenize_folds_accents_and_drops_stop_words():
+    assert tokenize("Réviser l'Économie et les éléments de Maths 2") == ["reviser", "economie", "elements", "maths"]
+
+
+def test_ranks_by_relevance_across_collections():
+    index = BM25Index()
+    index.upsert("tasks", {"id": 1, "title": "Préparer la présentation budget", "status": "todo", "priority": "high"})
+    index.upsert("tasks", {"id": 2, "title": "Appeler le plombier"})
+    index.upsert("events", {"id": 1, "title": "Réunion budget", "start": datetime(2024, 5, 2, 9), "location": "Salle B"})
+    index.upsert("study_cards", {"id": 4, "front": "Théorème de Pythagore", "back": "a² + b² = c²"})
+    index.upsert("projects", {"id": 3, "name": "Migration", "description": "Budget serveurs", "progress": 40})
+
+    hits = index.search("présentation du budget", k=3)
+    assert [(h.collection, h.id) for h in hits][0] == ("tasks", 1)
+    assert {(h.collection, h.id) for h in hits} == {("tasks", 1), ("events", 1), ("projects", 3)}
+    assert hits[0].snippet == "Tâche #1 « Préparer la présentation budget » (todo, high)"
+    assert hits[1].score <= hits[0].score
+    assert index.search("pythagore")[0].snippet.startswith("Fiche #4 : Théorème de Pythagore")
+    assert index.search("inconnu") == []
+
+
+def test_upsert_replaces_and_remove_forgets():
+    index = BM25Index()
+    index.upsert("tasks", {"id": 1, "title": "Écrire le rapport"})
+    index.upsert("tasks", {"id": 1, "title": "Relire le contrat"})
+    assert index.search("rapport") == []
+    assert [h.id for h in index.search("contrat")] == [1]
+
+    # Cached term weights do not outlive a write.
+    index.upsert("tasks", {"id": 2, "title": "Signer le contrat du contrat"})
+    assert [h.id for h in index.search("contrat")] == [2, 1]
+    index.remove("tasks", 2)
+
+    index.remove("tasks", 1)
+    index.remove("tasks", 1)
+    assert len(index) == 0
+    assert index.search("contrat") == []
+
+
+def test_champion_lists_match_brute_force(monkeypatch):
+    monkeypatch.setattr(retrieval, "SCAN_BUDGET", 50)
+    rng = random.Random(7)
+    vocabulary = [f"mot{i}" for i in range(300)]
+    weights = [1 / (i + 1) for i in range(300)]
+    index = BM25Index(champions=40)
+    for i in range(600):
+        words = rng.choices(vocabulary, weights, k=rng.randint(3, 20))
+        index.upsert("tasks", {"id": i, "title": " ".join(words)})
+    for i in range(0, 600, 3):
+        index.remove("tasks", i)
+    assert index._champions
+
+    matches = 0
+    queries = [f"mot{rng.randrange(30)} mot{rng.randrange(300)}" for _ in range(50)]
+    for query in queries:
+        exact = _exact(index, query, 5)
+        matches += len({(h.collection, h.id) for h in index.search(query, 5)} & set(exact))
+    assert matches / (5 * len(queries)) >= 0.8
+
+    # A query that fits in the scan budget is exact.
+    query = "mot250 mot290"
+    assert [(h.collection, h.id) for h in index.search(query, 5)] == _exact(index, query, 5)
+
+
+@pytest.mark.asyncio
+async def test_retrieval_index_builds_in_the_background_and_applies_writes():
+    class Collection:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def find(self, query, projection):
+            async def cursor():
+                for doc in self.docs:
+                    await asyncio.sleep(0)
+                    if doc["owner_id"] == query["owner_id"]:
+                        yield {k: v for k, v in doc.items() if projection.get(k)}
+
+            return cursor()
+
+    class Session(dict):
+        name = "test"
+
+    session = Session(
+        tasks=Collection([{"id": 1, "owner_id": 1, "title": "Budget annuel"}, {"id": 2, "owner_id": 2, "title": "Budget"}]),
+        events=Collection([]),
+        projects=Collection([]),
+        study_cards=Collection([]),
+    )
+    cache = RetrievalIndex()
+
+    # Nothing is indexed yet: the search does not wait for the build.
+    cache.record(session, 1, "tasks", {"id": 9, "title": "ignoré"})
+    assert cache.search(session, 1, "budget") == []
+    # A write made while the build runs is replayed on the new index.
+    cache.record(session, 1, "tasks", {"id": 3, "title": "Budget du trimestre"})
+    await cache.ready(session, 1)
+    assert [h.id for h in cache.search(session, 1, "budget")] == [1, 3]
+    cache.discard(session, 1, "tasks", 1)
+    assert [h.id for h in cache.search(session, 1, "budget")] == [3]
+    assert cache.search(session, 1, "ignoré") == []
+
+    # An expired index keeps serving while it is rebuilt.
+    cache.ttl_seconds = 0
+    assert [h.id for h in cache.search(session, 1, "budget")] == [3]
+    cache.ttl_seconds = 600
+    await cache.ready(session, 1)
+    assert [h.id for h in cache.search(session, 1, "budget")] == [1]
+
+    cache.invalidate(session, 1)
+    assert cache.search(session, 1, "budget") == []
+    cache.invalidate(session, 1)
+    assert (await cache.ready(session, 1)).search("budget")[0].id == 1
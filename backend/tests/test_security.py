@@ -0,0 +1,23 @@
+import pytest
+from passlib.context import CryptContext
+
+from app.security import hash_password, settings, verify_and_update, verify_password
+
+
+@pytest.mark.asyncio
+async def test_hashing_runs_in_the_password_pool():
+    hashed = await hash_password("secret")
+    assert f"${settings.password_hash_rounds}$" in hashed
+    assert await verify_password("secret", hashed)
+    assert not await verify_password("wrong", hashed)
+    assert await verify_and_update("secret", hashed) == (True, None)
+
+
+@pytest.mark.asyncio
+async def test_hash_from_an_older_policy_is_upgraded():
+    old = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__default_rounds=1000).hash("secret")
+
+    valid, new_hash = await verify_and_update("secret", old)
+    assert valid
+    assert f"${settings.password_hash_rounds}$" in new_hash
+    assert await verify_and_update("wrong", old) == (False, None)
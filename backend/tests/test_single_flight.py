@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return value
+
+    results = await asyncio.gather(*(flights.do("k", lambda: slow(1)) for _ in range(10)), flights.do("other", lambda: slow(2)))
+    assert results == [1] * 10 + [2]
+    assert len(flights) == 0
+    assert await flights.do("k", lambda: slow(3)) == 3
+    assert calls == [1, 2, 3]
+    assert flights.snapshot() == {"calls": 3, "coalesced": 9, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_and_are_not_kept():
+    flights = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(*(flights.do("k", failing) for _ in range(5)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    with pytest.raises(RuntimeError):
+        await flights.do("k", failing)
+    assert len(attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_caller_keeps_the_call_for_the_others():
+    flights = SingleFlight()
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "ok"
+
+    first = asyncio.ensure_future(flights.do("k", slow))
+    second = asyncio.ensure_future(flights.do("k", slow))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert finished == [1]
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_when_every_caller_leaves():
+    flights = SingleFlight()
+
+    upstream_cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            upstream_cancelled.set()
+            raise
+
+    callers = [asyncio.ensure_future(flights.do("k", slow)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.wait_for(upstream_cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert len(flights) == 0
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from app.streaming import iter_ndjson
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.requested_batch_size = None
+
+    def batch_size(self, size):
+        self.requested_batch_size = size
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+@pytest.mark.asyncio
+async def test_iter_ndjson_writes_one_chunk_per_batch():
+    cursor = FakeCursor([{"id": i} for i in range(5)])
+    chunks = [chunk async for chunk in iter_ndjson(cursor, json.dumps, batch_size=2)]
+
+    assert cursor.requested_batch_size == 2
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [0, 1, 2, 3, 4]
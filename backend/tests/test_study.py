@@ -151,3 +151,29 @@ async def test_study_assist(client):
     )
     assert res.status_code == 200
     assert res.json().get("output")
+
+
+@pytest.mark.asyncio
+async def test_subject_progress_is_cached_until_a_session_changes(client):
+    from app.read_cache import read_cache
+
+    headers = await auth_headers(client)
+    subject_id = (await client.post("/api/study/subjects", json={"name": "Chimie"}, headers=headers)).json()["id"]
+    plan = (
+        await client.post(
+            "/api/study/plan/generate",
+            json={"subject_id": subject_id, "topics": ["Atomes"], "exam_date": in_days(2), "session_minutes": 30},
+            headers=headers,
+        )
+    ).json()
+
+    first = await client.get(f"/api/study/subjects/{subject_id}/progress", headers=headers)
+    hits = read_cache.stats.hits
+    again = await client.get(f"/api/study/subjects/{subject_id}/progress", headers=headers)
+    assert again.json() == first.json()
+    assert read_cache.stats.hits == hits + 1
+
+    session_id = plan["sessions"][0]["id"]
+    await client.patch(f"/api/study/sessions/{session_id}", json={"status": "done"}, headers=headers)
+    updated = await client.get(f"/api/study/subjects/{subject_id}/progress", headers=headers)
+    assert updated.json()["done"] == first.json()["done"] + 1
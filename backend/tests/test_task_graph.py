@@ -0,0 +1,66 @@
+import random
+
+from app.services.task_graph import TaskGraph
+
+
+def task(task_id: int, deps=(), minutes=0, status="a_faire", parent=None):
+    return {"id": task_id, "dependencies": list(deps), "duration_minutes": minutes, "status": status, "parent_task_id": parent}
+
+
+def test_graph_reports_order_cycles_critical_path_and_unblocked_tasks():
+    graph = TaskGraph.build(
+        [
+            task(1, minutes=30),
+            task(2, deps=[1], minutes=60),
+            task(3, deps=[1], minutes=10),
+            task(4, deps=[2, 3, 99], minutes=20),
+            task(5, deps=[6]),
+            task(6, deps=[5]),
+            task(7, minutes=15, parent=8),
+            task(8, minutes=5),
+        ]
+    )
+    view = graph.view()
+
+    assert view.order == [1, 2, 3, 4, 7, 8]
+    assert view.cycles == [[5, 6]]
+    assert view.critical_path == [1, 2, 4]
+    assert view.critical_path_minutes == 110
+    assert view.unblocked == [1, 7]
+
+
+def test_status_changes_update_unblocked_set_and_critical_path():
+    graph = TaskGraph.build([task(1, minutes=30), task(2, deps=[1], minutes=60), task(3, deps=[1, 2], minutes=5)])
+
+    graph.upsert(task(1, minutes=30, status="terminee"))
+    view = graph.view()
+    assert view.unblocked == [2]
+    assert view.critical_path == [2, 3] and view.critical_path_minutes == 65
+
+    graph.upsert(task(2, deps=[1], minutes=60, status="terminee"))
+    assert graph.unblocked() == [3]
+    graph.upsert(task(1, minutes=30))
+    assert graph.unblocked() == [1]
+
+
+def test_incremental_updates_match_a_full_rebuild():
+    rng = random.Random(11)
+    tasks: dict[int, dict] = {}
+    graph = TaskGraph.build([])
+    for step in range(400):
+        task_id = rng.randrange(1, 40)
+        if rng.random() < 0.15:
+            tasks.pop(task_id, None)
+            graph.remove(task_id)
+        else:
+            tasks[task_id] = task(
+                task_id,
+                deps=rng.sample(range(1, 45), k=rng.randrange(3)),
+                minutes=rng.randrange(0, 120, 15),
+                status=rng.choice(["a_faire", "en_cours", "terminee"]),
+                parent=rng.choice([None, None, rng.randrange(1, 45)]),
+            )
+            graph.upsert(tasks[task_id])
+        if step % 20 == 0:
+            assert graph.view() == TaskGraph.build(list(tasks.values())).view()
+    assert graph.view() == TaskGraph.build(list(tasks.values())).view()
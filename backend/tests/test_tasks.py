@@ -1,5 +1,7 @@
 import pytest
 
+from app import pagination
+
 
 async def register_and_login(client):
     email = "test@example.com"
@@ -60,3 +62,106 @@ async def test_task_dependencies_and_parent(client):
     child = child_res.json()
     assert child["parent_task_id"] == parent_id
     assert parent_id in child.get("dependencies", [])
+
+
+@pytest.mark.asyncio
+async def test_task_list_pagination_and_filters(client):
+    headers = await register_and_login(client)
+    project_res = await client.post("/api/projects/", json={"name": "Paginé"}, headers=headers)
+    project_id = project_res.json()["id"]
+    created = []
+    for i in range(5):
+        res = await client.post(
+            "/api/tasks/",
+            json={"title": f"Page {i}", "project_id": project_id, "category": "pagination"},
+            headers=headers,
+        )
+        created.append(res.json()["id"])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"project_id": project_id, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        res = await client.get("/api/tasks/", params=params, headers=headers)
+        assert res.status_code == 200
+        page = res.json()
+        assert len(page) <= 2
+        seen.extend(t["id"] for t in page)
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == sorted(created)
+
+    res = await client.get("/api/tasks/", params={"project_id": project_id, "status": "terminee"}, headers=headers)
+    assert res.json() == []
+
+    res = await client.get("/api/tasks/", params={"cursor": "invalide"}, headers=headers)
+    assert res.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_task_list_without_limit_is_paged_by_default(client, monkeypatch):
+    monkeypatch.setattr(pagination, "DEFAULT_PAGE_SIZE", 2)
+    headers = await register_and_login(client)
+    for i in range(3):
+        await client.post("/api/tasks/", json={"title": f"Défaut {i}", "category": "page-defaut"}, headers=headers)
+
+    res = await client.get("/api/tasks/", params={"category": "page-defaut"}, headers=headers)
+    assert len(res.json()) == 2
+    cursor = res.headers["X-Next-Cursor"]
+    res = await client.get("/api/tasks/", params={"category": "page-defaut", "cursor": cursor}, headers=headers)
+    assert len(res.json()) == 1
+    assert "X-Next-Cursor" not in res.headers
+
+
+@pytest.mark.asyncio
+async def test_task_graph_tracks_dependencies_and_status(client):
+    # Dedicated user: the graph covers every task of its owner.
+    await client.post("/api/auth/register", json={"email": "graph@example.com", "password": "secret123"})
+    res = await client.post("/api/auth/login", data={"username": "graph@example.com", "password": "secret123"})
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+    first = (await client.post("/api/tasks/", json={"title": "Plan", "duration_minutes": 30}, headers=headers)).json()
+    second = (
+        await client.post(
+            "/api/tasks/",
+            json={"title": "Build", "duration_minutes": 90, "dependencies": [first["id"]]},
+            headers=headers,
+        )
+    ).json()
+
+    res = await client.get("/api/tasks/graph", headers=headers)
+    assert res.status_code == 200
+    graph = res.json()
+    assert graph["order"] == [first["id"], second["id"]]
+    assert graph["critical_path"] == [first["id"], second["id"]]
+    assert graph["critical_path_minutes"] == 120
+    assert graph["unblocked"] == [first["id"]]
+
+    await client.patch(f"/api/tasks/{first['id']}", json={"status": "terminee"}, headers=headers)
+    graph = (await client.get("/api/tasks/graph", headers=headers)).json()
+    assert graph["unblocked"] == [second["id"]]
+
+    await client.patch(f"/api/tasks/{first['id']}", json={"dependencies": [second["id"]]}, headers=headers)
+    graph = (await client.get("/api/tasks/graph", headers=headers)).json()
+    assert graph["cycles"] == [sorted([first["id"], second["id"]])]
+
+
+@pytest.mark.asyncio
+async def test_task_list_conditional_get(client):
+    headers = await auth_headers(client)
+    res = await client.get("/api/tasks/", headers=headers)
+    etag = res.headers["etag"]
+    assert res.headers["last-modified"]
+
+    res = await client.get("/api/tasks/", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 304
+    # Another representation (filters) does not share the validator.
+    res = await client.get("/api/tasks/", params={"status": "a_faire"}, headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 200
+
+    await client.post("/api/tasks/", json={"title": "Nouvelle"}, headers=headers)
+    res = await client.get("/api/tasks/", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.deps import UserCache, get_current_user, user_cache
+from app.security import create_access_token
+
+
+class FakeUsers:
+    def __init__(self, users):
+        self.users = users
+        self.lookups = 0
+
+    async def find_one(self, query):
+        self.lookups += 1
+        await asyncio.sleep(0.01)
+        return self.users.get(query["email"])
+
+
+class FakeSession:
+    name = "user-cache-test"
+
+    def __init__(self, users):
+        self.collection = FakeUsers(users)
+
+    def __getitem__(self, name):
+        assert name == "users"
+        return self.collection
+
+
+@pytest.mark.asyncio
+async def test_burst_of_requests_issues_one_lookup():
+    session = FakeSession({"a@example.com": {"id": 1, "email": "a@example.com"}})
+    token = create_access_token("a@example.com")
+    user_cache.clear()
+
+    async def burst():
+        return await asyncio.gather(*(get_current_user(token=token, session=session) for _ in range(50)))
+
+    users = await burst()
+    assert all(u["id"] == 1 for u in users)
+    assert session.collection.lookups == 1
+
+    await burst()
+    assert session.collection.lookups == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_and_unknown_users():
+    session = FakeSession({"b@example.com": {"id": 2, "email": "b@example.com"}})
+    cache = UserCache(max_entries=1)
+    token = create_access_token("b@example.com")
+
+    await cache.get(session, token, "b@example.com", 2**40)
+    await cache.get(session, token, "b@example.com", 2**40)
+    cache.invalidate("b@example.com")
+    await cache.get(session, token, "b@example.com", 2**40)
+    # Unknown users are not cached: a later registration is seen at once.
+    assert await cache.get(session, "other", "c@example.com", 2**40) is None
+    assert await cache.get(session, "other", "c@example.com", 2**40) is None
+    assert session.collection.lookups == 4
+
+
+@pytest.mark.asyncio
+async def test_invalid_token_is_rejected_without_lookup():
+    session = FakeSession({})
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(token="not-a-jwt", session=session)
+    assert exc.value.status_code == 401
+    assert session.collection.lookups == 0
+
+
+@pytest.mark.asyncio
+async def test_tokens_older_than_the_token_version_are_rejected():
+    session = FakeSession({"d@example.com": {"id": 4, "email": "d@example.com", "token_version": 1}})
+    user_cache.clear()
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(token=create_access_token("d@example.com"), session=session)
+    assert exc.value.status_code == 401
+    user = await get_current_user(token=create_access_token("d@example.com", version=1), session=session)
+    assert user["id"] == 4
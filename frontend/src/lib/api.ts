@@ -270,12 +270,27 @@ async function authFetch<T>(path: string, token: string, init?: RequestInit): Pr
   return handleResponse<T>(res);
 }
 
+// Les listes sont paginées côté API (en-tête X-Next-Cursor) : on suit le curseur jusqu'à la dernière page.
+async function authFetchAll<T>(path: string, token: string): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const sep = path.includes("?") ? "&" : "?";
+    const res = await fetch(`${API_BASE}${path}${cursor ? `${sep}cursor=${encodeURIComponent(cursor)}` : ""}`, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    items.push(...(await handleResponse<T[]>(res)));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return items;
+}
+
 export async function apiMe(token: string): Promise<UserMe> {
   return authFetch<UserMe>("/auth/me", token);
 }
 
 export async function apiTasks(token: string): Promise<ApiTask[]> {
-  return authFetch<ApiTask[]>("/tasks", token);
+  return authFetchAll<ApiTask>("/tasks", token);
 }
 
 export async function apiCreateTask(token: string, payload: CreateTaskPayload): Promise<ApiTask> {
@@ -299,7 +314,7 @@ export async function apiDeleteTask(token: string, id: number): Promise<void> {
 }
 
 export async function apiEvents(token: string): Promise<ApiEvent[]> {
-  return authFetch<ApiEvent[]>("/events", token);
+  return authFetchAll<ApiEvent>("/events", token);
 }
 
 export async function apiCreateEvent(token: string, payload: CreateEventPayload): Promise<ApiEvent> {
@@ -323,7 +338,7 @@ export async function apiDeleteEvent(token: string, id: number): Promise<void> {
 }
 
 export async function apiProjects(token: string): Promise<ApiProject[]> {
-  return authFetch<ApiProject[]>("/projects", token);
+  return authFetchAll<ApiProject>("/projects", token);
 }
 
 export async function apiCreateProject(token: string, payload: CreateProjectPayload): Promise<ApiProject> {
@@ -472,7 +487,7 @@ export async function apiPushNotifications(token: string, payload: NotificationS
 
 // --- Study / learning ---
 export async function apiStudySubjects(token: string): Promise<ApiStudySubject[]> {
-  return authFetch<ApiStudySubject[]>("/study/subjects", token);
+  return authFetchAll<ApiStudySubject>("/study/subjects", token);
 }
 
 export async function apiStudySubjectCreate(token: string, payload: { name: string; description?: string; ue_code?: string }): Promise<ApiStudySubject> {
@@ -535,7 +550,7 @@ export async function apiStudyPlanDelete(token: string, planId: number): Promise
 }
 
 export async function apiStudySessionsDue(token: string): Promise<ApiStudySession[]> {
-  return authFetch<ApiStudySession[]>("/study/sessions/due", token);
+  return authFetchAll<ApiStudySession>("/study/sessions/due", token);
 }
 
 export async function apiStudySessionUpdate(token: string, sessionId: number, payload: Partial<ApiStudySession>): Promise<ApiStudySession> {
@@ -555,7 +570,7 @@ export async function apiStudyCardCreate(token: string, payload: { subject_id: n
 }
 
 export async function apiStudyCardsDue(token: string): Promise<ApiStudyCard[]> {
-  return authFetch<ApiStudyCard[]>("/study/cards/due", token);
+  return authFetchAll<ApiStudyCard>("/study/cards/due", token);
 }
 
 export async function apiStudyCardReview(token: string, cardId: number, score: number): Promise<ApiStudyCard> {